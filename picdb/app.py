@@ -43,7 +43,8 @@ from .uistatus import StatusPanel
 from .uipictures import PictureManagement
 from .uigroups import GroupManagement
 from .uitags import TagManagement
-from .persistence import create_db, DBParameters
+from .migrations import MigrationError
+from .persistence import create_db, DBParameters, get_db
 from .config import get_configuration
 
 
@@ -113,6 +114,12 @@ def _parse_arguments(args):
                         default=get_configuration('db.port'),
                         help='Port of database to use. Overrides '
                              'configuration file.')
+    parser.add_argument('--backend', action='store', dest='backend',
+                        default=get_configuration('db.backend', 'postgresql'),
+                        choices=('postgresql', 'sqlite'),
+                        help='Database engine. For sqlite --db is the path '
+                             'of the database file. Overrides '
+                             'configuration file.')
     parser.add_argument('--title', action='store', dest='title',
                         default='PicDB',
                         help='Window title.')
@@ -126,10 +133,12 @@ def _parse_arguments(args):
 def create_db_by_arguments(args):
     """ Create a database instance based on the given arguments.
 
-    :param args: args.db, args.user, args.passwd, args.port
+    :param args: args.db, args.user, args.passwd, args.port and optionally
+        args.backend, which defaults to postgresql.
     :type args: argParse.Namespace
     """
-    create_db(DBParameters(args.db, args.user, args.passwd, args.port))
+    create_db(DBParameters(args.db, args.user, args.passwd, args.port,
+                           getattr(args, 'backend', 'postgresql')))
 
 
 def setup():
@@ -159,10 +168,22 @@ def traceit(output_file, frame, event, arg):
 def main(args, root):
     """Start application. """
     create_db_by_arguments(args)
+    if get_configuration('db.migrate', True):
+        try:
+            get_db().migrate()
+        except MigrationError as error:
+            # Migrations tune the schema, the application works without.
+            logging.getLogger('picdb.db').error(str(error))
+    snapshot_file = get_configuration('cache.snapshot', '')
+    if snapshot_file:
+        snapshot_file = os.path.expanduser(snapshot_file)
+        get_db().load_cache_snapshot(snapshot_file)
     root.geometry(args.geometry)
     app = Application(root)
     app.set_title(args.title)
     app.mainloop()
+    if snapshot_file:
+        get_db().save_cache_snapshot(snapshot_file)
 
 
 def start_application(argv):
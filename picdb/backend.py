@@ -0,0 +1,97 @@
+# coding=utf-8
+"""
+Storage backends of Persistence.
+
+A backend opens connections to one database engine. Connections offer
+the subset of the py-postgresql API used by Persistence: prepare(),
+xact(), commit(), rollback(), execute() and close(). Statements use
+PostgreSQL syntax with $n placeholders; backends of other engines
+translate it.
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import importlib
+
+# Modules implementing backends by name, imported when used so that only
+# the driver of the configured engine needs to be installed.
+BACKENDS = {'postgresql': 'picdb.pgbackend',
+            'sqlite': 'picdb.sqlitebackend'}
+
+
+class Backend:
+    """Database engine used by Persistence."""
+
+    name = None
+    # Exceptions raised by connections of this backend.
+    Error = Exception
+    UniqueError = Exception
+    UndefinedTableError = Exception
+    # Whether changes of other processes are notified.
+    supports_listen = False
+
+    def __init__(self, db_params):
+        """Initialize backend.
+
+        :param db_params: database parameters
+        :type db_params: DBParameters
+        """
+        self.db_params = db_params
+
+    def connect(self):
+        """Open a new connection to the database.
+
+        :return: database connection.
+        """
+        raise NotImplementedError('Please override this method.')
+
+    def migrate(self, conn, target=None):
+        """Bring schema of database up to date.
+
+        :param conn: database connection
+        :param target: version to migrate to, None for latest.
+        :type target: int
+        :return: migrations applied.
+        :rtype: list
+        """
+        raise NotImplementedError('Please override this method.')
+
+
+def create_backend(db_params):
+    """Create backend given by database parameters.
+
+    :param db_params: database parameters
+    :type db_params: DBParameters
+    :return: backend
+    :rtype: Backend
+    :raises ValueError: if the backend is unknown.
+    """
+    try:
+        module = BACKENDS[db_params.backend]
+    except KeyError:
+        raise ValueError('Unknown backend: {}'.format(db_params.backend))
+    return importlib.import_module(module).BACKEND(db_params)
@@ -29,37 +29,321 @@ A simple LRU cache.
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
-from collections import deque
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+
+def object_size(obj):
+    """Estimate the memory footprint of an object in bytes.
+
+    Counts the object itself, its attribute dictionary and string
+    attribute values. Referenced containers and objects are not followed.
+
+    :param obj: object to estimate
+    :return: estimated size in bytes
+    :rtype: int
+    """
+    size = sys.getsizeof(obj)
+    attributes = getattr(obj, '__dict__', None)
+    if attributes is not None:
+        size += sys.getsizeof(attributes)
+        size += sum(sys.getsizeof(value) for value in attributes.values()
+                    if isinstance(value, str))
+    return size
+
+
+class LRUPolicy:
+    """Evict the least recently used entry."""
+
+    def __init__(self):
+        self._order = OrderedDict()
+
+    def insert(self, key):
+        """A key was put into the cache."""
+        self._order[key] = None
+        self._order.move_to_end(key)
+
+    def access(self, key):
+        """A cached key was hit."""
+        self._order.move_to_end(key)
+
+    def discard(self, key):
+        """A key was removed from the cache."""
+        self._order.pop(key, None)
+
+    def victim(self):
+        """Select and forget the key to evict next.
+
+        :return: key to evict.
+        """
+        key, _ = self._order.popitem(last=False)
+        return key
+
+    def clear(self):
+        """Forget all keys."""
+        self._order.clear()
+
+
+class TwoQueuePolicy:
+    """Scan resistant 2Q policy.
+
+    New keys enter a FIFO probation queue. Hits in probation do not promote
+    a key, so a single scan does not displace the working set. Keys evicted
+    from probation are remembered in a ghost queue; a key coming back while
+    remembered is put into the protected LRU queue.
+
+    See T. Johnson, D. Shasha: 2Q: A Low Overhead High Performance Buffer
+    Management Replacement Algorithm, VLDB 1994.
+    """
+
+    def __init__(self, probation_ratio=0.25, ghost_ratio=0.5):
+        """Initialize policy.
+
+        :param probation_ratio: share of entries kept in probation queue.
+        :type probation_ratio: float
+        :param ghost_ratio: number of remembered keys relative to entries.
+        :type ghost_ratio: float
+        """
+        self.probation_ratio = probation_ratio
+        self.ghost_ratio = ghost_ratio
+        self._probation = OrderedDict()
+        self._protected = OrderedDict()
+        self._ghosts = OrderedDict()
+
+    def insert(self, key):
+        """A key was put into the cache."""
+        if key in self._protected or key in self._probation:
+            self.access(key)
+        elif key in self._ghosts:
+            del self._ghosts[key]
+            self._protected[key] = None
+        else:
+            self._probation[key] = None
+
+    def access(self, key):
+        """A cached key was hit."""
+        if key in self._protected:
+            self._protected.move_to_end(key)
+
+    def discard(self, key):
+        """A key was removed from the cache."""
+        self._probation.pop(key, None)
+        self._protected.pop(key, None)
+
+    def victim(self):
+        """Select and forget the key to evict next.
+
+        :return: key to evict.
+        """
+        entries = len(self._probation) + len(self._protected)
+        if self._probation and (
+                not self._protected or
+                len(self._probation) > self.probation_ratio * entries):
+            key, _ = self._probation.popitem(last=False)
+            self._ghosts[key] = None
+            while len(self._ghosts) > max(1, self.ghost_ratio * entries):
+                self._ghosts.popitem(last=False)
+        else:
+            key, _ = self._protected.popitem(last=False)
+        return key
+
+    def clear(self):
+        """Forget all keys."""
+        self._probation.clear()
+        self._protected.clear()
+        self._ghosts.clear()
+
+
+# Eviction policies selectable by configuration.
+POLICIES = {'lru': LRUPolicy, '2q': TwoQueuePolicy}
+
+
+def create_policy(name):
+    """Create eviction policy by name.
+
+    :param name: name of policy, see POLICIES.
+    :type name: str
+    :return: policy instance
+    :raises: ValueError if policy is unknown.
+    """
+    try:
+        return POLICIES[name.lower()]()
+    except KeyError:
+        raise ValueError('Unknown cache policy: {}'.format(name))
 
 
 class LRUCache:
-    """LRU cache."""
-    def __init__(self, max_size):
+    """LRU cache.
+
+    Items are kept in a dictionary, the order of eviction is maintained by
+    an eviction policy. Least recently used is the default policy.
+    Promotion and eviction are constant time operations.
+
+    The cache may be bounded by number of entries, by total weight or both.
+    The weight of an entry is determined by the weigher function given,
+    e.g. its estimated size in bytes.
+
+    Secondary indexes allow to find cached items by other attributes than
+    their key, see add_index().
+
+    With identity_map set, evicted items are still tracked by weak reference
+    as long as they are referenced elsewhere, e.g. by the UI. Such an item
+    is returned again instead of being loaded as a second instance, while
+    unreferenced items can be garbage collected. Items must then support
+    weak references.
+
+    All operations are thread safe.
+    """
+    def __init__(self, max_size, max_weight=-1, weigher=None, policy=None,
+                 identity_map=False):
+        """Initialize cache.
+
+        :param max_size: maximum number of entries, negative for unlimited.
+        :type max_size: int
+        :param max_weight: maximum total weight, negative for unlimited.
+        :type max_weight: int
+        :param weigher: function providing the weight of an item.
+        :type weigher: f(item) -> int
+        :param policy: eviction policy, defaults to LRUPolicy.
+        :param identity_map: track evicted items still in use.
+        :type identity_map: bool
+        """
         self.max_size = max_size
-        self.lru_required = self.max_size >= 0
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self.policy = policy if policy is not None else LRUPolicy()
+        self.lru_required = self.max_size >= 0 or self.max_weight >= 0
         self.__cache = {}
-        self.__usage_list = deque()
+        self.__weights = {}
+        self.__alive = weakref.WeakValueDictionary() if identity_map else None
+        # index name -> (value function, value -> keys, key -> value)
+        self.__indexes = {}
+        self._weight = 0
+        self._generation = 0
         self._misses = 0
         self._hits = 0
+        self._lock = threading.Lock()
+
+    def add_index(self, name, value_func):
+        """Maintain a secondary index.
+
+        The index maps values provided by value_func to the keys of cached
+        items. Multiple items may share a value.
+
+        :param name: name of index
+        :type name: str
+        :param value_func: provides the value to index an item by.
+        :type value_func: f(item) -> hashable
+        """
+        with self._lock:
+            self.__indexes[name] = (value_func, {}, {})
+            for key, item in self.__cache.items():
+                self.__index(key, item)
+
+    def lookup(self, name, value):
+        """Find cached items by secondary index.
+
+        Since cached items are mutable, items whose value changed after
+        they were indexed are not returned. Found items count as hits.
+
+        :param name: name of index
+        :type name: str
+        :param value: value to look up
+        :return: cached items having given value.
+        :rtype: list
+        """
+        with self._lock:
+            value_func, keys_by_value, _ = self.__indexes[name]
+            found = [(key, self.__cache[key])
+                     for key in keys_by_value.get(value, ())]
+            found = [(key, item) for key, item in found
+                     if value_func(item) == value]
+            self._hits += len(found)
+            if self.lru_required:
+                for key, _ in found:
+                    self.policy.access(key)
+            return [item for _, item in found]
 
     def put(self, key, item):
         """Put item into __cache."""
-        self.__cache[key] = item
-        if self.lru_required:
-            self.__update_usage(key)
-            self.__keep_max_size()
+        with self._lock:
+            self.__put(key, item)
+
+    def reweigh(self, key):
+        """Weigh a cached item again after it changed in place.
+
+        Items exceeding limits are evicted. Keys not cached are ignored.
+
+        :param key: key of item
+        """
+        with self._lock:
+            if self.weigher is None or key not in self.__cache:
+                return
+            weight = self.weigher(self.__cache[key])
+            self._weight += weight - self.__weights.get(key, 0)
+            self.__weights[key] = weight
+            if self.lru_required:
+                self.__keep_max_size()
 
     def get(self, key):
         """Try to retrieve item """
-        try:
-            item = self.__cache[key]
-            self._hits += 1
-            if self.lru_required:
-                self.__update_usage(key)
-            return item
-        except KeyError:
-            self._misses += 1
-            raise
+        with self._lock:
+            try:
+                item = self.__cache[key]
+                self._hits += 1
+                if self.lru_required:
+                    self.policy.access(key)
+                return item
+            except KeyError:
+                item = self.__alive.get(key) if self.__alive else None
+                if item is None:
+                    self._misses += 1
+                    raise
+                self._hits += 1
+                self.__put(key, item)
+                return item
+
+    def peek(self, key, default=None):
+        """Retrieve item without affecting statistics and eviction order.
+
+        :param key: key of item
+        :param default: returned if key is not cached.
+        :return: cached item or default.
+        """
+        item = self.__cache.get(key)
+        if item is None and self.__alive is not None:
+            item = self.__alive.get(key)
+        return item if item is not None else default
+
+    def discard(self, key):
+        """Remove item from cache if present.
+
+        :param key: key of item
+        """
+        with self._lock:
+            if key in self.__cache:
+                self.__remove(key)
+                self.policy.discard(key)
+            if self.__alive is not None:
+                self.__alive.pop(key, None)
+
+    def values(self):
+        """Provide a snapshot of all cached items.
+
+        Includes evicted items still tracked by the identity map.
+
+        :return: cached items.
+        :rtype: list
+        """
+        with self._lock:
+            items = list(self.__cache.values())
+            if self.__alive is not None:
+                items.extend(item for key, item in list(self.__alive.items())
+                             if key not in self.__cache)
+            return items
 
     @property
     def size(self):
@@ -70,6 +354,17 @@ class LRUCache:
         """
         return len(self.__cache)
 
+    @property
+    def tracked(self):
+        """ Get number of items cached or still alive in the identity map.
+
+        :return: number of known items.
+        :rtype: int
+        """
+        if self.__alive is None:
+            return len(self.__cache)
+        return len(self.__alive)
+
     @property
     def misses(self):
         """ Get number of cache misses.
@@ -88,28 +383,180 @@ class LRUCache:
         """
         return self._hits
 
+    @property
+    def generation(self):
+        """ Get number of changes which removed items from cache.
+
+        Allows to detect whether items might have been removed since the
+        cache was known to be complete.
+
+        :return: generation
+        :rtype: int
+        """
+        return self._generation
+
+    @property
+    def weight(self):
+        """ Get total weight of cached items.
+
+        :return: sum of item weights, 0 if no weigher is given.
+        :rtype: int
+        """
+        return self._weight
+
     def clear(self):
         """Clear cache."""
-        self.__cache = {}
-        self.__usage_list.clear()
-        self._misses = 0
-        self._hits = 0
+        with self._lock:
+            self.__cache.clear()
+            self.__weights.clear()
+            if self.__alive is not None:
+                self.__alive.clear()
+            for _, keys_by_value, value_by_key in self.__indexes.values():
+                keys_by_value.clear()
+                value_by_key.clear()
+            self.policy.clear()
+            self._generation += 1
+            self._weight = 0
+            self._misses = 0
+            self._hits = 0
+
+    def __put(self, key, item):
+        """ Insert or replace item, evict items exceeding limits. """
+        if self.__indexes:
+            self.__unindex(key)
+            self.__index(key, item)
+        self.__cache[key] = item
+        if self.__alive is not None:
+            self.__alive[key] = item
+        if self.weigher is not None:
+            weight = self.weigher(item)
+            self._weight += weight - self.__weights.get(key, 0)
+            self.__weights[key] = weight
+        if self.lru_required:
+            self.policy.insert(key)
+            self.__keep_max_size()
 
-    def __update_usage(self, key):
-        """ Push key to top of cache.
+    def __keep_max_size(self):
+        """ Keep cache size and weight in required range.
 
-        :param key: key of cache item.
-        :type key: any hashable type
+        An entry is never evicted by its own weight if it is the only one.
         """
-        if key in self.__usage_list:
-            self.__usage_list.remove(key)
-        self.__usage_list.appendleft(key)
+        while self.__is_too_large():
+            self.__remove(self.policy.victim())
 
-    def __keep_max_size(self):
-        """ Keep cache size in required range. """
-        while len(self.__usage_list) > self.max_size:
-            key = self.__usage_list.pop()
-            self.__cache.pop(key)
+    def __remove(self, key):
+        """ Remove item and its index entries. """
+        del self.__cache[key]
+        self._weight -= self.__weights.pop(key, 0)
+        self._generation += 1
+        self.__unindex(key)
+
+    def __index(self, key, item):
+        """ Add item to secondary indexes. """
+        for value_func, keys_by_value, value_by_key in \
+                self.__indexes.values():
+            value = value_func(item)
+            keys_by_value.setdefault(value, set()).add(key)
+            value_by_key[key] = value
+
+    def __unindex(self, key):
+        """ Remove key from secondary indexes. """
+        for _, keys_by_value, value_by_key in self.__indexes.values():
+            if key in value_by_key:
+                value = value_by_key.pop(key)
+                keys = keys_by_value[value]
+                keys.discard(key)
+                if not keys:
+                    del keys_by_value[value]
+
+    def __is_too_large(self):
+        """ Check if cache exceeds one of its limits. """
+        if 0 <= self.max_size < len(self.__cache):
+            return True
+        return 0 <= self.max_weight < self._weight and len(self.__cache) > 1
+
+    def __contains__(self, key):
+        if key in self.__cache:
+            return True
+        return self.__alive is not None and key in self.__alive
 
     def __iter__(self):
-        return iter(self.__cache)
+        with self._lock:
+            keys = list(self.__cache)
+            if self.__alive is not None:
+                keys.extend(key for key in list(self.__alive)
+                            if key not in self.__cache)
+            return iter(keys)
+
+
+class NegativeCache:
+    """Remember keys known to be absent for a short time.
+
+    Bounded by number of keys; the oldest key is forgotten first.
+    All operations are thread safe.
+    """
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        """Initialize cache.
+
+        :param max_size: maximum number of keys.
+        :type max_size: int
+        :param ttl: seconds a key is remembered.
+        :type ttl: float
+        :param clock: provides current time in seconds.
+        :type clock: f() -> float
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.__expiry = OrderedDict()
+        self._hits = 0
+        self._lock = threading.Lock()
+
+    def add(self, key):
+        """Remember key as absent."""
+        with self._lock:
+            self.__expiry[key] = self.clock() + self.ttl
+            self.__expiry.move_to_end(key)
+            while len(self.__expiry) > self.max_size:
+                self.__expiry.popitem(last=False)
+
+    def discard(self, key):
+        """Forget key, e.g. because it was added."""
+        with self._lock:
+            self.__expiry.pop(key, None)
+
+    def clear(self):
+        """Forget all keys."""
+        with self._lock:
+            self.__expiry.clear()
+
+    @property
+    def hits(self):
+        """ Get number of lookups answered as absent.
+
+        :return: number of hits.
+        :rtype: int
+        """
+        return self._hits
+
+    @property
+    def size(self):
+        """ Get number of remembered keys.
+
+        :return: number of keys, including expired ones.
+        :rtype: int
+        """
+        return len(self.__expiry)
+
+    def __contains__(self, key):
+        """Check if key is known to be absent. Forgets expired keys."""
+        with self._lock:
+            expiry = self.__expiry.get(key)
+            if expiry is None:
+                return False
+            if expiry <= self.clock():
+                del self.__expiry[key]
+                return False
+            self._hits += 1
+            return True
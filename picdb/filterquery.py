@@ -0,0 +1,254 @@
+# coding=utf-8
+"""
+Parameterized SQL selecting pictures by path, groups and tags.
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import functools
+
+_COLUMNS = 'id, identifier, path, description'
+
+# Criteria on groups or tags: absent, matching keys or matching subtrees.
+NONE, KEYS, TREES = None, 'keys', 'trees'
+
+# Search modes: SQL pattern on path, substring of path, name or
+# description, or words of name and description ranked by relevance.
+PATTERN, SUBSTRING, WORDS = 'pattern', 'substring', 'words'
+SEARCH_MODES = (PATTERN, SUBSTRING, WORDS)
+
+# Served by the trigram indexes of migration 5.
+_SUBSTRING_CONDITION = \
+    '("path" ILIKE $1 OR identifier ILIKE $1 OR description ILIKE $1)'
+# Must match the expression of the full text index of migration 6.
+_WORDS_VECTOR = \
+    "to_tsvector('simple', identifier || ' ' || coalesce(description, ''))"
+_WORDS_QUERY = "plainto_tsquery('simple', $1)"
+
+# Pictures assigned to all entities of the array.
+_KEYS_CONDITION = \
+    'id IN (SELECT picture FROM {table} ' \
+    'WHERE {column} = ANY(${0}::integer[]) GROUP BY picture ' \
+    'HAVING count(*) = cardinality(${0}::integer[]))'
+# Pictures assigned to an entity of each subtree. The subtrees are given
+# as parallel arrays of root and member, and the number of roots.
+_TREES_CONDITION = \
+    'id IN (SELECT picture FROM {table} ' \
+    'JOIN unnest(${0}::integer[], ${1}::integer[]) ' \
+    'AS subtree(root, {column}) USING ({column}) GROUP BY picture ' \
+    'HAVING count(DISTINCT root) = ${2}::integer)'
+
+
+def _condition(table, column, mode, index):
+    """Provide condition on a picture assignment table.
+
+    :param table: assignment table
+    :type table: str
+    :param column: column referring to group or tag
+    :type column: str
+    :param mode: NONE, KEYS or TREES
+    :type mode: str
+    :param index: number of first parameter
+    :type index: int
+    :return: condition or None, and number of next parameter
+    :rtype: (str, int)
+    """
+    if mode == KEYS:
+        return (_KEYS_CONDITION.format(index, table=table, column=column),
+                index + 1)
+    if mode == TREES:
+        return (_TREES_CONDITION.format(index, index + 1, index + 2,
+                                        table=table, column=column),
+                index + 3)
+    return None, index
+
+
+@functools.lru_cache(maxsize=None)
+def _statement(groups_mode, tags_mode, after, search=PATTERN):
+    """Provide SQL for one combination of filter criteria.
+
+    Only the kind of criteria changes the text, not the number of groups
+    or tags, so there are few statements to prepare.
+
+    :param groups_mode: filter on groups: NONE, KEYS or TREES
+    :type groups_mode: str
+    :param tags_mode: filter on tags: NONE, KEYS or TREES
+    :type tags_mode: str
+    :param after: filter on a (path, id) key
+    :type after: bool
+    :param search: search mode: PATTERN, SUBSTRING or WORDS
+    :type search: str
+    :return: sql statement
+    :rtype: str
+    """
+    order = 'path, id'
+    if search == SUBSTRING:
+        conditions = [_SUBSTRING_CONDITION]
+    elif search == WORDS:
+        conditions = ['{} @@ {}'.format(_WORDS_VECTOR, _WORDS_QUERY)]
+        order = 'ts_rank({}, {}) DESC, path, id'.format(
+            _WORDS_VECTOR, _WORDS_QUERY)
+    else:
+        conditions = ['"path" LIKE $1']
+    index = 2
+    condition, index = _condition('picture2group', '"group"', groups_mode,
+                                  index)
+    if condition:
+        conditions.append(condition)
+    condition, index = _condition('picture2tag', 'tag', tags_mode, index)
+    if condition:
+        conditions.append(condition)
+    if after:
+        conditions.append(
+            '("path", id) > (${}, ${})'.format(index, index + 1))
+        index += 2
+    # LIMIT NULL selects all rows.
+    return 'SELECT {} FROM pictures WHERE {} ' \
+           'ORDER BY {} LIMIT ${}::bigint'.format(
+               _COLUMNS, ' AND '.join(conditions), order, index)
+
+
+def _escape_like(text):
+    """Escape wildcards of LIKE in text.
+
+    :rtype: str
+    """
+    for char in ('\\', '%', '_'):
+        text = text.replace(char, '\\' + char)
+    return text
+
+
+def _keys(entities):
+    """Provide distinct keys of entities in ascending order.
+
+    Duplicates would break the comparison of count and cardinality.
+
+    :rtype: [int]
+    """
+    return sorted({entity.key for entity in entities})
+
+
+def _criterion(keys, tree):
+    """Provide mode and parameters of a criterion on groups or tags.
+
+    :param keys: keys of selected groups or tags
+    :type keys: [int]
+    :param tree: keys of descendants including itself by key, or None
+    :type tree: dict
+    :return: mode and parameters
+    :rtype: (str, list)
+    """
+    if not keys:
+        return NONE, []
+    if tree is None:
+        return KEYS, [keys]
+    roots = []
+    members = []
+    for key in keys:
+        subtree = sorted(tree.get(key, (key,)))
+        roots.extend([key] * len(subtree))
+        members.extend(subtree)
+    return TREES, [roots, members, len(keys)]
+
+
+class PictureFilter:
+    """Select pictures by path pattern, groups, tags and page.
+
+    Groups and tags are passed as arrays, so the statement is the same for
+    any number of them and is prepared once per connection.
+
+    If trees of groups or tags are given, a selected group or tag is
+    matched by itself and all its descendants.
+
+    The search mode decides how path is applied: PATTERN matches it as
+    LIKE pattern against the path, SUBSTRING finds it anywhere in path,
+    name or description, and WORDS finds all its words in name and
+    description. WORDS orders by relevance and cannot be paged by key.
+    """
+
+    def __init__(self, path, groups=(), tags=(), after=None, limit=None,
+                 group_tree=None, tag_tree=None, search=PATTERN):
+        """Initialize filter.
+
+        :param path: path pattern, substring or words depending on search
+        :type path: str
+        :param groups: pictures shall be assigned to all groups
+        :type groups: [Group]
+        :param tags: pictures shall have all tags
+        :type tags: [Tag]
+        :param after: (path, id) of the last picture of the previous page
+        :type after: (str, int)
+        :param limit: maximum number of pictures, None for all
+        :type limit: int
+        :param group_tree: keys of descendants of groups by key
+        :type group_tree: dict
+        :param tag_tree: keys of descendants of tags by key
+        :type tag_tree: dict
+        :param search: search mode: PATTERN, SUBSTRING or WORDS
+        :type search: str
+        :raises ValueError: on unknown search mode or paging of WORDS
+        """
+        if search not in SEARCH_MODES:
+            raise ValueError('Unknown search mode: {}'.format(search))
+        if search == WORDS and after is not None:
+            raise ValueError('Search by words cannot be paged by key.')
+        self.search = search
+        self.path = path
+        self.group_keys = _keys(groups)
+        self.tag_keys = _keys(tags)
+        self.after = after
+        self.limit = limit
+        self.group_tree = group_tree
+        self.tag_tree = tag_tree
+
+    @property
+    def statement(self):
+        """SQL selecting the pictures ordered by path and id.
+
+        :rtype: str
+        """
+        groups_mode, _ = _criterion(self.group_keys, self.group_tree)
+        tags_mode, _ = _criterion(self.tag_keys, self.tag_tree)
+        return _statement(groups_mode, tags_mode, self.after is not None,
+                          self.search)
+
+    @property
+    def parameters(self):
+        """Parameters of statement in order.
+
+        :rtype: tuple
+        """
+        if self.search == SUBSTRING:
+            params = ['%' + _escape_like(self.path) + '%']
+        else:
+            params = [self.path]
+        params.extend(_criterion(self.group_keys, self.group_tree)[1])
+        params.extend(_criterion(self.tag_keys, self.tag_tree)[1])
+        if self.after is not None:
+            params.extend(self.after)
+        params.append(self.limit)
+        return tuple(params)
@@ -32,15 +32,21 @@ from .entity import Entity
 
 
 class Group(Entity):
-    """A series of pictures."""
+    """A series of pictures.
+
+    If a loader is given and no pictures, the pictures are fetched by the
+    loader on first access.
+    """
 
     def __init__(self, key, name, description,
-                 pictures=None, parent=None):  # noqa
+                 pictures=None, parent=None, loader=None):  # noqa
         super().__init__(key, name, description)
         self._parent = parent
         self._children = []
+        self._loader = loader
         # Currently assigned pictures. May not be saved yet.
-        if pictures is None:
+        # None until loaded.
+        if pictures is None and loader is None:
             self._pictures = []
         else:
             self._pictures = pictures
@@ -52,8 +58,18 @@ class Group(Entity):
         :return: pictures assigned to group.
         :rtype: [Picture]
         """
+        if self._pictures is None:
+            self._pictures = self._loader(self)
         return self._pictures
 
+    @property
+    def pictures_loaded(self):
+        """Check whether pictures are available without loading them.
+
+        :rtype: bool
+        """
+        return self._pictures is not None
+
     @pictures.setter
     def pictures(self, pictures_):
         """Replace the complete picture set of this group.
@@ -65,11 +81,11 @@ class Group(Entity):
 
     def __iter__(self):
         """Make Group iterable."""
-        return iter(self._pictures)
+        return iter(self.pictures)
 
     def __len__(self):
         """Determine number of pictures assigned to group."""
-        return len(self._pictures)
+        return len(self.pictures)
 
     @property
     def parent(self):
@@ -93,7 +109,7 @@ class Group(Entity):
         :param picture_: picture to remove
         :type picture_: Picture
         """
-        if picture_ not in self._pictures:
+        if picture_ not in self.pictures:
             self._pictures.append(picture_)
 
     def remove_picture(self, picture_):
@@ -105,7 +121,7 @@ class Group(Entity):
         :param picture_: picture to remove
         :type picture_: Picture
         """
-        if picture_ in self._pictures:
+        if picture_ in self.pictures:
             self._pictures.remove(picture_)
 
     @property
@@ -36,12 +36,14 @@ from .group import Group
 def save_group(group_):
     """Save group to database.
 
-    Add group if it is new or update in case of existing group."""
-    if group_.key is None:
-        __add_group(group_)
-    else:
-        update_group(group_)
-        __update_pictures(group_)
+    Add group if it is new or update in case of existing group.
+    Runs as one transaction."""
+    with get_db().transaction():
+        if group_.key is None:
+            __add_group(group_)
+        else:
+            update_group(group_)
+            __update_pictures(group_)
 
 
 def __add_group(group_):
@@ -52,7 +54,7 @@ def __add_group(group_):
 
 def __update_pictures(group_):
     """Remove and add pictures according to changes made during editing."""
-    if group_.pictures is not None:
+    if group_.pictures_loaded:
         saved_pics = set(retrieve_pictures_for_group(group_))
         _pictures = set(group_.pictures)
         pictures_to_add = _pictures.difference(saved_pics)
@@ -90,6 +92,17 @@ def retrieve_group_by_key(key):
     return group
 
 
+def retrieve_groups_by_keys(keys):
+    """Retrieve groups for given keys."""
+    data_base = get_db()
+    groups = data_base.retrieve_groups_by_keys(keys)
+    unknown = set(keys).difference(group.key for group in groups)
+    if unknown:
+        raise UnknownEntityException(
+            'Groups with keys {} are unknown.'.format(sorted(unknown)))
+    return groups
+
+
 def retrieve_groups_by_name(name):
     """Retrieve groups with given name"""
     return retrieve_groups_by_name_segment(name, None)
@@ -139,14 +152,25 @@ def add_pictures_to_group(group_, pictures_):
     :param pictures_: pictures to add
     :type pictures_: [Picture]
     """
-    for pic in pictures_:
-        add_picture_to_group(group_, pic)
+    add_pictures_to_groups(pictures_, [group_])
 
 
 def add_picture_to_set_of_groups(picture, groups):
     """Add given picture to groups."""
-    for item in groups:
-        add_picture_to_group(item, picture)
+    add_pictures_to_groups([picture], groups)
+
+
+def add_pictures_to_groups(pictures_, groups):
+    """Add each of the pictures to each of the groups.
+
+    :param pictures_: pictures to add
+    :type pictures_: [Picture]
+    :param groups: groups to add pictures to
+    :type groups: [Group]
+    """
+    data_base = get_db()
+    data_base.add_pictures_to_groups([(pic, group_) for pic in pictures_
+                                      for group_ in groups])
 
 
 def remove_picture_from_group(group_, picture):
@@ -163,14 +187,25 @@ def remove_pictures_from_group(group_, pictures_):
     :param pictures_: pictures to remove
     :type pictures_: [Picture]
     """
-    for pic in pictures_:
-        remove_picture_from_group(group_, pic)
+    remove_pictures_from_groups(pictures_, [group_])
 
 
 def remove_picture_from_set_of_groups(picture, groups):
     """Remove given picture from groups."""
-    for item in groups:
-        remove_picture_from_group(item, picture)
+    remove_pictures_from_groups([picture], groups)
+
+
+def remove_pictures_from_groups(pictures_, groups):
+    """Remove each of the pictures from each of the groups.
+
+    :param pictures_: pictures to remove
+    :type pictures_: [Picture]
+    :param groups: groups to remove pictures from
+    :type groups: [Group]
+    """
+    data_base = get_db()
+    data_base.remove_pictures_from_groups([(pic, group_) for pic in pictures_
+                                           for group_ in groups])
 
 
 def create_group(key=None, name='', description=''):
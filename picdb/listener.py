@@ -0,0 +1,165 @@
+# coding=utf-8
+"""
+Listen for change notifications of other PicDB instances.
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import threading
+import uuid
+
+import postgresql.driver.dbapi20 as dbapi
+
+# Channel the database triggers send change notifications on.
+CHANNEL = 'picdb_changes'
+# Table name of notifications sent by sync().
+SYNC = 'sync'
+
+
+class ChangeListener(threading.Thread):
+    """Receive change notifications from the database.
+
+    Runs on a dedicated connection in autocommit mode, since notifications
+    are delivered only between transactions. The payload of a notification
+    is <table>:<id>. Notifications caused by ignored backends, i.e. by our
+    own connections, are dropped.
+    """
+
+    def __init__(self, db_parameters, callback, ignore_backends=None,
+                 timeout=1.0):
+        """Initialize listener.
+
+        :param db_parameters: database parameters.
+        :type db_parameters: DBParameters
+        :param callback: called with table name and id for each change.
+        :type callback: f(str, int)
+        :param ignore_backends: ids of backends whose changes are ignored.
+        :type ignore_backends: set(int)
+        :param timeout: seconds to wait for notifications before checking
+        for stop request.
+        :type timeout: float
+        """
+        super().__init__(name='picdb-change-listener', daemon=True)
+        self.logger = logging.getLogger('picdb.db')
+        self.db_params = db_parameters
+        self.callback = callback
+        self.ignore_backends = ignore_backends if ignore_backends \
+            is not None else set()
+        self.timeout = timeout
+        self._stop_requested = threading.Event()
+        self._listening = threading.Event()
+        # True if notifications may have been lost by a reconnect.
+        self.interrupted = False
+        self._synced = threading.Condition()
+        self._sync_token = None
+        self._sync_seen = False
+
+    def stop(self):
+        """Request listener to stop."""
+        self._stop_requested.set()
+
+    def wait_listening(self, timeout=None):
+        """Wait until the listener listens on the channel.
+
+        :param timeout: seconds to wait, None for no limit.
+        :type timeout: float
+        :return: True if listening.
+        :rtype: bool
+        """
+        return self._listening.wait(timeout)
+
+    def sync(self, send, timeout=None):
+        """Wait until notifications sent so far are dispatched.
+
+        Notifications are delivered in order of commit, so all changes
+        committed before the notification sent are dispatched when it
+        arrives.
+
+        :param send: sends a notification with given payload on CHANNEL.
+        :type send: f(str)
+        :param timeout: seconds to wait, None for no limit.
+        :type timeout: float
+        :return: True if synchronized.
+        :rtype: bool
+        """
+        token = uuid.uuid4().hex
+        with self._synced:
+            self._sync_token = token
+            self._sync_seen = False
+        send('{}:{}'.format(SYNC, token))
+        with self._synced:
+            seen = self._synced.wait_for(lambda: self._sync_seen, timeout)
+            self._sync_token = None
+        return seen
+
+    def run(self):
+        """Listen until stop is requested. Reconnect on connection loss."""
+        while not self._stop_requested.is_set():
+            try:
+                self._listen()
+            except Exception as exc:  # noqa
+                self.logger.warning('change listener failed: %s', exc)
+                self._stop_requested.wait(self.timeout)
+
+    def _listen(self):
+        """Connect and dispatch notifications."""
+        conn = dbapi.connect(user=self.db_params.user,
+                             database=self.db_params.name,
+                             port=self.db_params.port,
+                             password=self.db_params.passwd)
+        try:
+            conn.autocommit = True
+            conn.listen(CHANNEL)
+            self.logger.debug('listening on channel %s', CHANNEL)
+            self._listening.set()
+            for notification in conn.iternotifies(self.timeout):
+                if self._stop_requested.is_set():
+                    break
+                if notification is not None:
+                    self._dispatch(*notification)
+        finally:
+            if self._listening.is_set() and \
+                    not self._stop_requested.is_set():
+                self.interrupted = True
+            conn.close()
+
+    def _dispatch(self, _, payload, backend):
+        """Handle a single notification."""
+        try:
+            table, key = payload.split(':')
+            if table == SYNC:
+                with self._synced:
+                    if key == self._sync_token:
+                        self._sync_seen = True
+                        self._synced.notify_all()
+                return
+            if backend in self.ignore_backends:
+                return
+            self.callback(table, int(key))
+        except ValueError:
+            self.logger.warning('invalid change notification: %s', payload)
@@ -0,0 +1,304 @@
+# coding=utf-8
+"""
+Versioned migrations of the database schema.
+
+Applied migrations are recorded in table schema_version. Pending ones are
+applied in order, each in a transaction of its own, on start of the
+application or from the command line:
+
+    python -m picdb.migrations [--status] [--target VERSION]
+
+Indexes are built within the transaction of their migration, not
+concurrently. The build locks its table against writes, which takes a
+while on large databases.
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import argparse
+import logging
+import sys
+
+from .config import get_configuration
+
+# Serializes migrations of concurrently starting instances.
+_LOCK_ID = 0x70696364
+
+_VERSION_TABLE = 'CREATE TABLE IF NOT EXISTS schema_version (' \
+                 'version integer PRIMARY KEY, ' \
+                 'description text NOT NULL, ' \
+                 'applied timestamp with time zone NOT NULL DEFAULT now())'
+
+
+class MigrationError(Exception):
+    """A migration failed and was rolled back."""
+
+    def __init__(self, migration, reason):
+        super().__init__(
+            'Migration {} failed: {}'.format(migration.version, reason))
+        self.migration = migration
+        self.reason = reason
+
+
+class Migration:
+    """A change of the schema."""
+
+    def __init__(self, version, description, statements, optional=False):
+        """Initialize migration.
+
+        :param version: version of schema after migration
+        :type version: int
+        :param description: what is changed
+        :type description: str
+        :param statements: idempotent SQL statements
+        :type statements: [str]
+        :param optional: the application works without the migration. If
+            it fails, later migrations are applied anyway and it is tried
+            again on the next run.
+        :type optional: bool
+        """
+        self.version = version
+        self.description = description
+        self.statements = statements
+        self.optional = optional
+
+    def __repr__(self):
+        return 'Migration({}, {})'.format(self.version,
+                                          repr(self.description))
+
+
+def _counter_statements(tables):
+    """Provide SQL maintaining the number of rows of tables.
+
+    Statement level triggers add the rows inserted and subtract the rows
+    deleted, so counting needs no scan. The triggers are created before
+    the counters are initialized and lock the tables until commit, so no
+    change gets lost.
+
+    :param tables: tables to count
+    :type tables: [str]
+    :rtype: [str]
+    """
+    statements = [
+        'CREATE TABLE IF NOT EXISTS picdb_counts ('
+        'name text PRIMARY KEY, count bigint NOT NULL)',
+        'CREATE OR REPLACE FUNCTION picdb_count_rows() RETURNS trigger AS '
+        '$BODY$ BEGIN '
+        "IF TG_OP = 'INSERT' THEN "
+        'UPDATE picdb_counts SET count = count + '
+        '(SELECT count(*) FROM new_rows) WHERE name = TG_TABLE_NAME; '
+        'ELSE '
+        'UPDATE picdb_counts SET count = count - '
+        '(SELECT count(*) FROM old_rows) WHERE name = TG_TABLE_NAME; '
+        'END IF; RETURN NULL; END $BODY$ LANGUAGE plpgsql']
+    for table in tables:
+        statements.extend([
+            'DROP TRIGGER IF EXISTS picdb_count_insert ON {}'.format(table),
+            'CREATE TRIGGER picdb_count_insert AFTER INSERT ON {} '
+            'REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT '
+            'EXECUTE PROCEDURE picdb_count_rows()'.format(table),
+            'DROP TRIGGER IF EXISTS picdb_count_delete ON {}'.format(table),
+            'CREATE TRIGGER picdb_count_delete AFTER DELETE ON {} '
+            'REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT '
+            'EXECUTE PROCEDURE picdb_count_rows()'.format(table),
+            "INSERT INTO picdb_counts SELECT '{0}', count(*) FROM {0} "
+            'ON CONFLICT (name) DO UPDATE SET count = excluded.count'.format(
+                table)])
+    return statements
+
+
+MIGRATIONS = [
+    # The primary keys of the assignment tables start with picture, so
+    # lookups of pictures by tag or group need indexes of their own.
+    Migration(1, 'index picture2tag by tag',
+              ['CREATE INDEX IF NOT EXISTS p2t_tag '
+               'ON picture2tag (tag, picture)']),
+    Migration(2, 'index picture2group by group',
+              ['CREATE INDEX IF NOT EXISTS p2g_group '
+               'ON picture2group ("group", picture)']),
+    # The unique index on path serves LIKE 'prefix%' only under collation
+    # C, text_pattern_ops under any collation.
+    Migration(3, 'index path for prefix patterns',
+              ['CREATE INDEX IF NOT EXISTS pictures_path_pattern '
+               'ON pictures (path text_pattern_ops)']),
+    Migration(4, 'index pictures by path and id for paging',
+              ['CREATE INDEX IF NOT EXISTS pictures_path_id '
+               'ON pictures (path, id)']),
+    # Substring search by ILIKE '%text%' on path, name and description.
+    # Without the extension pg_trgm from contrib, or the right to create
+    # it, ILIKE scans the table.
+    Migration(5, 'trigram indexes for substring search',
+              ['CREATE EXTENSION IF NOT EXISTS pg_trgm',
+               'CREATE INDEX IF NOT EXISTS pictures_path_trgm '
+               'ON pictures USING gin (path gin_trgm_ops)',
+               'CREATE INDEX IF NOT EXISTS pictures_identifier_trgm '
+               'ON pictures USING gin (identifier gin_trgm_ops)',
+               'CREATE INDEX IF NOT EXISTS pictures_description_trgm '
+               'ON pictures USING gin (description gin_trgm_ops)'],
+              optional=True),
+    # Word search on name and description. The expression must match the
+    # one used by picdb.filterquery.
+    Migration(6, 'full text index for word search',
+              ["CREATE INDEX IF NOT EXISTS pictures_words "
+               "ON pictures USING gin (to_tsvector('simple', "
+               "identifier || ' ' || coalesce(description, '')))"]),
+    Migration(7, 'row counters of pictures, groups and tags',
+              _counter_statements(('pictures', 'groups', 'tags'))),
+]
+
+
+def latest_version():
+    """Provide version of schema after all migrations.
+
+    :rtype: int
+    """
+    return max(migration.version for migration in MIGRATIONS)
+
+
+def current_version(conn):
+    """Provide version of schema, 0 if no migration was applied.
+
+    :param conn: database connection
+    :return: version
+    :rtype: int
+    """
+    conn.execute(_VERSION_TABLE)
+    version = conn.prepare(
+        'SELECT coalesce(max(version), 0) FROM schema_version').first()
+    conn.commit()
+    return version
+
+
+def migrate(conn, target=None):
+    """Apply pending migrations up to target version.
+
+    :param conn: database connection
+    :param target: version to migrate to, None for latest
+    :type target: int
+    :return: migrations applied
+    :rtype: [Migration]
+    :raises MigrationError: if a migration fails, unless it is optional.
+    """
+    logger = logging.getLogger('picdb.db')
+    if target is None:
+        target = latest_version()
+    conn.execute(_VERSION_TABLE)
+    conn.commit()
+    applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version > target:
+            break
+        try:
+            conn.prepare('SELECT pg_advisory_xact_lock($1)').first(_LOCK_ID)
+            # Another instance may have applied it while we waited.
+            done = conn.prepare('SELECT version FROM schema_version '
+                                'WHERE version=$1').first(migration.version)
+            if done is None:
+                logger.info('Applying %s', repr(migration))
+                for stmt in migration.statements:
+                    conn.execute(stmt)
+                conn.prepare('INSERT INTO schema_version '
+                             '(version, description) VALUES ($1, $2)')(
+                                 migration.version, migration.description)
+                applied.append(migration)
+            conn.commit()
+        except Exception as error:  # noqa
+            conn.rollback()
+            if migration.optional:
+                logger.warning('%s skipped: %s', repr(migration), str(error))
+                continue
+            logger.error('%s failed: %s', repr(migration), str(error))
+            raise MigrationError(migration, error)
+    return applied
+
+
+def _parse_arguments(args):
+    """Parse command line arguments.
+
+    :param args: given arguments, e.g. sys.argv[1:]
+    :type args: [str]
+    :return: configuration namespace
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(
+        description='Migrate PicDB database schema.')
+    parser.add_argument('--db', action='store', dest='db',
+                        default=get_configuration('db.name'),
+                        help='Name of database to use. Overrides '
+                             'configuration file.')
+    parser.add_argument('--user', action='store', dest='user',
+                        default=get_configuration('db.user'),
+                        help='Database user. Overrides '
+                             'configuration file.')
+    parser.add_argument('--passwd', action='store', dest='passwd',
+                        default=get_configuration('db.passwd'),
+                        help='Password of database user. Overrides '
+                             'configuration file.')
+    parser.add_argument('--port', action='store', dest='port',
+                        default=get_configuration('db.port'),
+                        help='Port of database to use. Overrides '
+                             'configuration file.')
+    parser.add_argument('--target', action='store', dest='target',
+                        type=int, default=None,
+                        help='Version to migrate to. Default is latest.')
+    parser.add_argument('--status', action='store_true', dest='status',
+                        help='Show version of schema only.')
+    return parser.parse_args(args)
+
+
+def main(argv):
+    """Migrate database given on command line.
+
+    :param argv: command line arguments
+    :type argv: [str]
+    :return: exit code
+    :rtype: int
+    """
+    # Only the command line needs the driver, the application passes
+    # connections of its backend.
+    import postgresql.driver.dbapi20 as dbapi
+    args = _parse_arguments(argv)
+    conn = dbapi.connect(user=args.user, database=args.db, port=args.port,
+                         password=args.passwd)
+    try:
+        if not args.status:
+            try:
+                for migration in migrate(conn, args.target):
+                    print('applied {} {}'.format(migration.version,
+                                                 migration.description))
+            except MigrationError as error:
+                print(error, file=sys.stderr)
+                return 1
+        print('schema version {} of {}'.format(current_version(conn),
+                                               latest_version()))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -29,21 +29,137 @@ Persistence.
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import functools
 import logging
+import os
+import sys
+import threading
+from contextlib import contextmanager
 from tkinter import messagebox
 
-import postgresql.driver.dbapi20 as dbapi
-from postgresql.exceptions import UniqueError
-
-from .cache import LRUCache
+from .backend import create_backend
+from .cache import LRUCache, NegativeCache, object_size, create_policy
 from .config import get_configuration
+from .filterquery import PictureFilter, PATTERN
 from .group import Group
 from .picture import Picture
+from .pool import ConnectionPool
+from . import snapshot
 from .tag import Tag
 
-_TAG_CACHE = LRUCache(get_configuration('cache.tags', 1000))
-_PICTURE_CACHE = LRUCache(get_configuration('cache.pictures', 20000))
-_GROUP_CACHE = LRUCache(get_configuration('cache.groups', 1000))
+
+def _tag_weight(tag):
+    """Estimate memory used by a tag in bytes."""
+    return object_size(tag)
+
+
+def _picture_weight(picture):
+    """Estimate memory used by a picture in bytes.
+
+    Assigned tags are accounted for by the tag cache.
+    """
+    return object_size(picture) + sys.getsizeof(picture.tags)
+
+
+def _group_weight(group_):
+    """Estimate memory used by a group in bytes.
+
+    Includes the assigned pictures since the group keeps them alive.
+    """
+    if not group_.pictures_loaded:
+        return object_size(group_)
+    return object_size(group_) + sys.getsizeof(group_.pictures) + sum(
+        _picture_weight(pic) for pic in group_.pictures)
+
+
+def _budget(key):
+    """Read a cache budget in MB from configuration and convert it to bytes.
+
+    :param key: configuration key
+    :type key: str
+    :return: budget in bytes or -1 if unlimited.
+    :rtype: int
+    """
+    budget = get_configuration(key, -1)
+    return int(budget * 1024 * 1024) if budget > 0 else -1
+
+
+def _policy(key):
+    """Create the eviction policy configured for key."""
+    return create_policy(get_configuration(key, 'lru'))
+
+
+_TAG_CACHE = LRUCache(get_configuration('cache.tags', 1000),
+                      _budget('cache.tags_mb'), _tag_weight,
+                      _policy('cache.tags_policy'),
+                      identity_map=True)
+_PICTURE_CACHE = LRUCache(get_configuration('cache.pictures', 20000),
+                          _budget('cache.pictures_mb'), _picture_weight,
+                          _policy('cache.pictures_policy'),
+                          identity_map=True)
+_GROUP_CACHE = LRUCache(get_configuration('cache.groups', 1000),
+                        _budget('cache.groups_mb'), _group_weight,
+                        _policy('cache.groups_policy'),
+                        identity_map=True)
+_TAG_CACHE.add_index('name', lambda tag: tag.name)
+_PICTURE_CACHE.add_index('path', lambda picture: picture.path)
+_GROUP_CACHE.add_index('name', lambda group_: group_.name)
+# Tables of the entities held by the caches.
+_TABLE_BY_CACHE = {_TAG_CACHE: 'tags', _PICTURE_CACHE: 'pictures',
+                   _GROUP_CACHE: 'groups'}
+
+
+def _replace_instance(items, old, new):
+    """Replace all occurrences of instance old in list items by new."""
+    for idx, item in enumerate(items):
+        if item is old:
+            items[idx] = new
+
+
+def _remove_key(items, key):
+    """Remove all entities with given key from list items.
+
+    :return: True if entities were removed.
+    :rtype: bool
+    """
+    kept = [item for item in items if item.key != key]
+    removed = len(kept) < len(items)
+    items[:] = kept
+    return removed
+
+
+# Kinds of lookups remembered by the negative cache.
+_NEGATIVE_KINDS = ('picture', 'path', 'tag', 'tag_name', 'group', 'group_name')
+# Negative cache kinds affected by a change of a table.
+_NEGATIVE_KINDS_BY_TABLE = {'pictures': ('picture', 'path'),
+                            'tags': ('tag', 'tag_name'),
+                            'groups': ('group', 'group_name')}
+
+
+def _connected(method):
+    """Run a Persistence method with a pooled connection.
+
+    The connection is bound to the current thread for the duration of the
+    call. Calls made while a connection is bound, e.g. within a
+    transaction or by another method, use that connection.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self._local, 'pooled', None) is not None:
+            return method(self, *args, **kwargs)
+        with self.pool.connection() as pooled:
+            self._local.pooled = pooled
+            try:
+                return method(self, *args, **kwargs)
+            except Exception:
+                # Do not hand out a connection in an aborted transaction.
+                if not pooled.conn.closed:
+                    pooled.conn.rollback()
+                raise
+            finally:
+                self._local.pooled = None
+    return wrapper
+
 
 # This module global variable will hold the Persistence instance.
 _DB = None
@@ -68,13 +184,18 @@ class DuplicateException(Exception):
 
 
 class DBParameters:
-    """Parameters describing database."""
+    """Parameters describing database.
+
+    For backend sqlite the name is the path of the database file.
+    """
 
-    def __init__(self, db_name, db_user, db_passwd, db_port):
+    def __init__(self, db_name, db_user, db_passwd, db_port,
+                 backend='postgresql'):
         self.name = db_name
         self.user = db_user
         self.passwd = db_passwd
         self.port = db_port
+        self.backend = backend
 
     @classmethod
     def from_configuration(cls):
@@ -83,7 +204,8 @@ class DBParameters:
         user = get_configuration('db_user')
         passwd = get_configuration('db_passwd')
         port = get_configuration('db_port')
-        return DBParameters(name, user, passwd, port)
+        backend = get_configuration('db.backend', 'postgresql')
+        return DBParameters(name, user, passwd, port, backend)
 
 
 def db_params():
@@ -130,31 +252,394 @@ class Persistence:
         """
         self.logger = logging.getLogger('picdb.db')
         self.db_params = db_parameters
-        self.conn = None
-        self.connect()
+        self.backend = create_backend(db_parameters)
+        # Backends of our own connections. Their changes are applied to the
+        # caches already, so the listener shall ignore them.
+        self._own_backends = set()
+        self.listener = None
+        # True if the listener may have missed changes since start.
+        self._listener_gap = False
+        # Connection and open transaction scopes of the current thread.
+        self._local = threading.local()
+        # Generation of group cache when it was known to contain all groups.
+        self._all_groups_generation = None
+        # Keys of descendants including itself by key, by table.
+        self._trees = {}
+        # Keys of cached groups by key of pictures assigned to them. May
+        # name groups evicted meanwhile or no longer containing a picture.
+        self._groups_by_picture = {}
+        self._groups_by_picture_lock = threading.Lock()
+        # Lookups which found nothing, by kind of lookup.
+        self._unknown = {
+            kind: NegativeCache(get_configuration('cache.negative_size', 1000),
+                                get_configuration('cache.negative_ttl', 10))
+            for kind in _NEGATIVE_KINDS}
+        self.pool = ConnectionPool(
+            self.connect, get_configuration('db.pool_size', 4),
+            get_configuration('cache.statements', 200))
+        self._marker_at_start = None
+        if get_configuration('cache.listen', False):
+            self.start_listener()
+        # Change marker the current cache content is known to be valid for.
+        # Read after the listener listens, so it sees all later changes.
+        self._marker_at_start = self.change_marker()
 
     def connect(self):
-        """Connect to database."""
-        self.logger.debug('connecting to database ...')
-        self.conn = dbapi.connect(user=self.db_params.user,
-                                  database=self.db_params.name,
-                                  port=self.db_params.port,
-                                  password=self.db_params.passwd)
+        """Open a new connection to the database.
+
+        :return: database connection.
+        """
+        self.logger.debug('connecting to %s database ...',
+                          self.backend.name)
+        conn = self.backend.connect()
+        self._own_backends.add(conn.backend_id)
+        return conn
+
+    @property
+    def conn(self):
+        """Get the connection bound to the current thread.
+
+        Only available within methods decorated by _connected and within
+        transactions.
+        """
+        return self._local.pooled.conn
+
+    @property
+    def _transactions(self):
+        """Open transaction scopes of the current thread, innermost last.
+
+        Each scope is a pair of its savepoint, None for the outermost one,
+        and the set of (table, key) of entities cached within the scope.
+        """
+        try:
+            return self._local.transactions
+        except AttributeError:
+            self._local.transactions = []
+            return self._local.transactions
+
+    def _prepare(self, sql):
+        """Provide prepared statement for sql.
+
+        Statements are prepared once per connection and reused afterwards.
+
+        :param sql: sql statement
+        :type sql: str
+        :return: prepared statement
+        """
+        return self._local.pooled.prepare(sql)
+
+    @property
+    def prepare_hits(self):
+        """Get number of statements served from the statement caches.
+
+        :rtype: int
+        """
+        return sum(pooled.statements.hits
+                   for pooled in list(self.pool.connections))
+
+    @property
+    def prepare_misses(self):
+        """Get number of statements prepared on the database.
+
+        :rtype: int
+        """
+        return sum(pooled.statements.misses
+                   for pooled in list(self.pool.connections))
 
     def close(self):
         """Close database."""
-        self.conn.close()
-        self.logger.debug('database connection closed.')
+        self.stop_listener()
+        self.pool.close()
+        self.logger.debug('database connections closed.')
+
+    def start_listener(self, timeout=10.0):
+        """Start listening for changes made by other processes.
+
+        Waits until the listener listens. Changes made before are not seen
+        by it.
 
+        Requires the triggers from scripts/notify_triggers.sql.
+
+        :param timeout: seconds to wait for the listener.
+        :type timeout: float
+        """
+        if not self.backend.supports_listen:
+            self.logger.info('%s does not notify changes.',
+                             self.backend.name)
+            return
+        if self.listener is None:
+            from .listener import ChangeListener
+            self.listener = ChangeListener(self.db_params, self.invalidate,
+                                           self._own_backends)
+            self.listener.start()
+            if not self.listener.wait_listening(timeout):
+                self.logger.warning('Change listener not listening yet.')
+                self._listener_gap = True
+            elif self._marker_at_start is not None and \
+                    self.change_marker() != self._marker_at_start:
+                # Started late, changes since start were missed.
+                self._listener_gap = True
+
+    def stop_listener(self):
+        """Stop listening for changes made by other processes."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+    def _drain_listener(self, timeout=5.0):
+        """Wait until the listener dispatched all changes committed so far.
+
+        :param timeout: seconds to wait for the listener.
+        :type timeout: float
+        :return: True if the listener saw all changes since start.
+        :rtype: bool
+        """
+        if self.listener is None or self._listener_gap or \
+                self.listener.interrupted:
+            return False
+        try:
+            synced = self.listener.sync(self._notify, timeout)
+        except self.backend.Error as exc:
+            self.logger.warning('Change listener not synchronized: %s', exc)
+            return False
+        return synced and not self.listener.interrupted
+
+    @_connected
+    def _notify(self, payload):
+        """Send a notification on the channel of the change listener.
+
+        :param payload: payload of notification.
+        :type payload: str
+        """
+        from .listener import CHANNEL
+        self._prepare('SELECT pg_notify($1, $2)').first(CHANNEL, payload)
+        self.conn.commit()
+
+    @_connected
+    def change_marker(self):
+        """Provide a marker which changes with every change of data.
+
+        Requires the sequence from scripts/notify_triggers.sql.
+
+        :return: marker or None if not available.
+        :rtype: int
+        """
+        stmt = 'SELECT last_value FROM picdb_change_seq'
+        try:
+            return self._prepare(stmt).first()
+        except self.backend.UndefinedTableError:
+            self.conn.rollback()
+            return None
+
+    def migrate(self, target=None):
+        """Apply pending schema migrations.
+
+        :param target: version to migrate to, None for latest.
+        :type target: int
+        :return: migrations applied.
+        :rtype: [Migration]
+        :raises MigrationError: if a migration fails.
+        """
+        with self.pool.connection() as pooled:
+            return self.backend.migrate(pooled.conn, target)
+
+    def save_cache_snapshot(self, path):
+        """Write cached entities to snapshot file.
+
+        The snapshot is valid for the current change marker if the listener
+        kept the caches up to date since start, otherwise for the marker at
+        start. The listener dispatches all changes committed before the
+        current marker was taken and is stopped then.
+
+        :param path: snapshot file
+        :type path: str
+        """
+        marker = self._marker_at_start
+        if self.listener is not None:
+            current = self.change_marker()
+            if self._drain_listener():
+                marker = current
+            else:
+                self.logger.info('Changes may be missed. Snapshot is valid '
+                                 'for marker at start.')
+            self.stop_listener()
+        if marker is None:
+            self.logger.info('No change marker. Snapshot not written.')
+            return
+        snapshot.dump(path, marker, _TAG_CACHE.values(),
+                      _PICTURE_CACHE.values(), _GROUP_CACHE.values())
+
+    def load_cache_snapshot(self, path):
+        """Fill caches from snapshot file.
+
+        A snapshot not matching the current change marker is stale and
+        will be deleted.
+
+        :param path: snapshot file
+        :type path: str
+        :return: True if snapshot was loaded.
+        :rtype: bool
+        """
+        marker, data = snapshot.read_marker(path)
+        if data is None:
+            return False
+        if marker is None or marker != self._marker_at_start:
+            self.logger.info('Stale snapshot %s dropped.', path)
+            os.remove(path)
+            return False
+        tags, pictures, groups = snapshot.restore(
+            data, self._load_pictures_for_group)
+        for cache, entities in ((_TAG_CACHE, tags),
+                                (_PICTURE_CACHE, pictures),
+                                (_GROUP_CACHE, groups)):
+            for entity in entities:
+                cache.put(entity.key, entity)
+        for group_ in groups:
+            self._index_group(group_)
+        self.logger.info('Snapshot %s loaded.', path)
+        return True
+
+    def invalidate(self, table, key):
+        """Evict a changed entity and cached entities referring to it.
+
+        Called by the change listener for changes of other processes.
+
+        :param table: name of table: pictures, tags or groups.
+        :type table: str
+        :param key: id of the changed entity.
+        :type key: int
+        """
+        self.logger.debug('invalidate(%s, %s)', table, str(key))
+        for kind in _NEGATIVE_KINDS_BY_TABLE.get(table, ()):
+            self._unknown[kind].clear()
+        self._trees.pop(table, None)
+        if table == 'pictures':
+            _PICTURE_CACHE.discard(key)
+            # Only the groups holding the picture are stale, their children
+            # are not.
+            with self._groups_by_picture_lock:
+                group_keys = self._groups_by_picture.pop(key, ())
+            for group_key in group_keys:
+                _GROUP_CACHE.discard(group_key)
+            if group_keys:
+                self._all_groups_generation = None
+        elif table == 'tags':
+            _TAG_CACHE.discard(key)
+            for picture in _PICTURE_CACHE.values():
+                if any(tag.key == key for tag in picture.tags):
+                    _PICTURE_CACHE.discard(picture.key)
+            for child in _TAG_CACHE.values():
+                if child.parent is not None and child.parent.key == key:
+                    self.invalidate('tags', child.key)
+        elif table == 'groups':
+            self._all_groups_generation = None
+            _GROUP_CACHE.discard(key)
+            for child in _GROUP_CACHE.values():
+                if child.parent is not None and child.parent.key == key:
+                    self.invalidate('groups', child.key)
+
+    @contextmanager
+    def transaction(self):
+        """Run a block of statements as one atomic unit of work.
+
+        Statements executed within the block are committed at its end.
+        Nested blocks are savepoints of the enclosing one. On an exception
+        the block is rolled back and entities cached within the block are
+        evicted since they may contain changes which are undone. The
+        outermost block reports database errors and propagates all other
+        exceptions.
+
+        The block holds one pooled connection for the current thread.
+
+        Usage:
+            with db.transaction():
+                db.update_picture(picture)
+                db.add_tags_to_pictures(pairs)
+        """
+        if getattr(self._local, 'pooled', None) is not None:
+            with self._transaction():
+                yield self
+            return
+        with self.pool.connection() as pooled:
+            self._local.pooled = pooled
+            try:
+                with self._transaction():
+                    yield self
+            finally:
+                self._local.pooled = None
+
+    @contextmanager
+    def _transaction(self):
+        """Transaction scope on the connection bound to current thread."""
+        nested = bool(self._transactions)
+        xact = self.conn.xact() if nested else None
+        if nested:
+            xact.start()
+        touched = set()
+        self._transactions.append((xact, touched))
+        try:
+            yield self
+        except Exception as exc:  # noqa
+            self._transactions.pop()
+            if nested:
+                xact.rollback()
+            else:
+                self.conn.rollback()
+            for table, key in touched:
+                self.invalidate(table, key)
+            if nested or isinstance(exc, self.backend.UniqueError) or \
+                    not isinstance(exc, self.backend.Error):
+                raise
+            messagebox.showerror(title='Database Error',
+                                 message='{}'.format(exc))
+        else:
+            self._transactions.pop()
+            if nested:
+                xact.commit()
+                self._transactions[-1][1].update(touched)
+            else:
+                self.conn.commit()
+
+    def _touch(self, table, key):
+        """Remember an entity cached within the current transaction.
+
+        :param table: name of table: pictures, tags or groups.
+        :type table: str
+        :param key: id of the entity.
+        :type key: int
+        """
+        if self._transactions:
+            self._transactions[-1][1].add((table, key))
+
+    def clear_caches(self):
+        """Forget all cached entities and absent keys."""
+        for cache in (_TAG_CACHE, _PICTURE_CACHE, _GROUP_CACHE):
+            cache.clear()
+        for unknown in self._unknown.values():
+            unknown.clear()
+        self._all_groups_generation = None
+        self._trees.clear()
+        with self._groups_by_picture_lock:
+            self._groups_by_picture.clear()
+
+    @_connected
     def execute_sql(self, stmt_, *args):
-        """Execute the given SQL statement with arguments."""
+        """Execute the given SQL statement with arguments.
+
+        Outside of a transaction block the statement is committed
+        immediately and errors are reported to the user. Within a
+        transaction block errors are raised to abort the block.
+        """
+        if self._transactions:
+            self._prepare(stmt_)(*args)
+            return True
         try:
-            stmt = self.conn.prepare(stmt_)
+            stmt = self._prepare(stmt_)
             try:
                 stmt(*args)
                 self.conn.commit()
                 return True
-            except UniqueError as uq_err:
+            except self.backend.UniqueError as uq_err:
                 self.conn.rollback()
                 self.logger.debug('duplicate: %s', stmt)
                 raise uq_err
@@ -164,8 +649,123 @@ class Persistence:
                                  message='{}'.format(exc))
             return False
 
+    def _create_hierarchy(self, rows, table, cache, create_entity):
+        """Create entities of a hierarchy from raw database records.
+
+        Ancestors neither cached nor part of rows are loaded before, one
+        query per level of the hierarchy. Parents are created before
+        their children.
+
+        :param rows: records of id, identifier, description, parent.
+        :param table: table of entities, tags or groups.
+        :type table: str
+        :param cache: cache of entities.
+        :type cache: LRUCache
+        :param create_entity: creates a single entity from a record.
+        :return: entities in order of rows.
+        :rtype: list
+        """
+        pending = {row[0]: row for row in rows}
+        missing = {row[3] for row in rows}
+        while True:
+            missing = {key for key in missing
+                       if key is not None and key not in pending and
+                       key not in cache}
+            if not missing:
+                break
+            self.logger.debug("_create_hierarchy(%s, %d ancestors)",
+                              table, len(missing))
+            stmt = 'SELECT id, identifier, description, parent ' \
+                   'FROM {} WHERE id=ANY($1)'.format(table)
+            stmt_ = self._prepare(stmt)
+            level = stmt_(list(missing))
+            if not level:
+                break
+            pending.update((row[0], row) for row in level)
+            missing = {row[3] for row in level}
+        # Created entities are kept referenced until all children exist.
+        created = {}
+
+        def create(row):
+            """Create entity of row after its parent."""
+            if row[0] not in created:
+                if row[3] in pending:
+                    create(pending[row[3]])
+                created[row[0]] = create_entity(*row)
+            return created[row[0]]
+
+        return [create(row) for row in rows]
+
+    def _tree(self, table):
+        """Provide keys of all descendants of each entity of a hierarchy.
+
+        The closure of the whole hierarchy is resolved by one recursive
+        query and kept until an entity of the table changes.
+
+        :param table: table of hierarchy: tags or groups.
+        :type table: str
+        :return: keys of descendants including itself by key.
+        :rtype: dict(int, frozenset(int))
+        """
+        tree = self._trees.get(table)
+        if tree is None:
+            self.logger.debug("_tree(%s)", table)
+            stmt = 'WITH RECURSIVE closure(ancestor, descendant) AS (' \
+                   'SELECT id, id FROM {0} UNION ' \
+                   'SELECT closure.ancestor, child.id FROM closure ' \
+                   'JOIN {0} child ON child.parent=closure.descendant) ' \
+                   'SELECT ancestor, descendant FROM closure'.format(table)
+            stmt_ = self._prepare(stmt)
+            tree = {}
+            for ancestor, descendant in stmt_():
+                tree.setdefault(ancestor, set()).add(descendant)
+            tree = {key: frozenset(keys) for key, keys in tree.items()}
+            self._trees[table] = tree
+        return tree
+
+    def _retrieve_by_keys(self, keys, table, columns, cache, kind, create):
+        """Retrieve entities by keys.
+
+        Cached entities are served from memory, all others are fetched by
+        one query. Unknown keys are skipped.
+
+        :param keys: keys of entities.
+        :type keys: [int]
+        :param table: table of entities.
+        :type table: str
+        :param columns: columns of the records required by create.
+        :type columns: str
+        :param cache: cache of entities.
+        :type cache: LRUCache
+        :param kind: kind of lookup in negative cache.
+        :type kind: str
+        :param create: creates entities from a list of records.
+        :return: entities in order of keys.
+        :rtype: list
+        """
+        found = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            try:
+                found[key] = cache.get(key)
+            except KeyError:
+                if key not in self._unknown[kind]:
+                    missing.append(key)
+        if missing:
+            self.logger.debug("_retrieve_by_keys(%s, %d missing)",
+                              table, len(missing))
+            stmt = 'SELECT {} FROM {} WHERE id=ANY($1)'.format(columns, table)
+            stmt_ = self._prepare(stmt)
+            for entity in create(stmt_(missing)):
+                found[entity.key] = entity
+            for key in missing:
+                if key not in found:
+                    self._unknown[kind].add(key)
+        return [found[key] for key in keys if key in found]
+
     # -------- group related
 
+    @_connected
     def add_group(self, group):
         """Add a new group.
 
@@ -176,30 +776,44 @@ class Persistence:
         stmt = '''INSERT INTO groups (identifier, description, parent)
         VALUES ($1, $2, $3)'''
         parent = group.parent.key if group.parent is not None else None
+        self._all_groups_generation = None
+        self._trees.pop('groups', None)
         try:
             self.execute_sql(stmt, group.name, group.description, parent)
-        except UniqueError as uq_err:
+        except self.backend.UniqueError as uq_err:
             raise DuplicateException(group, uq_err)
+        self._unknown['group'].clear()
+        self._unknown['group_name'].discard(group.name)
 
+    @_connected
     def update_group(self, series):
         """Update group record."""
         self.logger.debug("Update series: %s", series.name)
         stmt = "UPDATE groups SET identifier=$1, description=$2, " \
                "parent=$3 " \
                "WHERE id=$4"
-        self.execute_sql(stmt, series.name,
-                         series.description,
-                         series.parent.key if series.parent is not None else
-                         None,
-                         series.key)
-
+        if self.execute_sql(stmt, series.name,
+                            series.description,
+                            series.parent.key if series.parent is not None
+                            else None,
+                            series.key):
+            self._unknown['group_name'].discard(series.name)
+            self._trees.pop('groups', None)
+            self._cache_group(series)
+            self._index_group(series)
+
+    @_connected
     def delete_group(self, group_):
         """Delete group and picture assignments."""
         stmt_pics = """DELETE FROM picture2group WHERE "group"=$1"""
         stmt_grp = "DELETE FROM groups WHERE id=$1"
-        self.execute_sql(stmt_pics, group_.key)
-        self.execute_sql(stmt_grp, group_.key)
+        with self.transaction():
+            self.execute_sql(stmt_pics, group_.key)
+            self.execute_sql(stmt_grp, group_.key)
+            self._uncache_group(group_.key)
+            self._trees.pop('groups', None)
 
+    @_connected
     def add_picture_to_group(self, picture, group_):
         """Add picture to a group.
 
@@ -211,8 +825,14 @@ class Persistence:
         self.logger.debug(
             "Adding picture %s to group_ %s.", str(picture), str(group_))
         stmt = '''INSERT INTO picture2group VALUES($1, $2)'''
-        self.execute_sql(stmt, picture.key, group_.key)
-
+        if self.execute_sql(stmt, picture.key, group_.key):
+            cached = _GROUP_CACHE.peek(group_.key)
+            if cached is not None and cached.pictures_loaded:
+                cached.assign_picture(picture)
+                self._index_pictures(group_.key, [picture])
+                self._changed(_GROUP_CACHE, group_.key)
+
+    @_connected
     def remove_picture_from_group(self, picture, group):
         """Remove picture from a series.
 
@@ -224,8 +844,59 @@ class Persistence:
         self.logger.debug(
             "Removing picture %s from series %s.", str(picture), str(group))
         stmt = '''DELETE FROM picture2group WHERE picture=$1 AND "group"=$2'''
-        self.execute_sql(stmt, picture.key, group.key)
+        if self.execute_sql(stmt, picture.key, group.key):
+            cached = _GROUP_CACHE.peek(group.key)
+            if cached is not None and cached.pictures_loaded:
+                cached.remove_picture(picture)
+                self._changed(_GROUP_CACHE, group.key)
+
+    @_connected
+    def add_pictures_to_groups(self, pairs):
+        """Add pictures to groups by a single statement.
 
+        Pairs already assigned are ignored.
+
+        :param pairs: pictures and the groups to add them to.
+        :type pairs: [(Picture, Group)]
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return
+        self.logger.debug("add_pictures_to_groups(%d pairs)", len(pairs))
+        stmt = 'INSERT INTO picture2group (picture, "group") ' \
+               'SELECT * FROM unnest($1::integer[], $2::integer[]) ' \
+               'ON CONFLICT DO NOTHING'
+        if self.execute_sql(stmt, [pic.key for pic, _ in pairs],
+                            [grp.key for _, grp in pairs]):
+            for picture, group_ in pairs:
+                cached = _GROUP_CACHE.peek(group_.key)
+                if cached is not None and cached.pictures_loaded:
+                    cached.assign_picture(picture)
+                    self._index_pictures(group_.key, [picture])
+                    self._changed(_GROUP_CACHE, group_.key)
+
+    @_connected
+    def remove_pictures_from_groups(self, pairs):
+        """Remove pictures from groups by a single statement.
+
+        :param pairs: pictures and the groups to remove them from.
+        :type pairs: [(Picture, Group)]
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return
+        self.logger.debug("remove_pictures_from_groups(%d pairs)", len(pairs))
+        stmt = 'DELETE FROM picture2group WHERE (picture, "group") IN ' \
+               '(SELECT * FROM unnest($1::integer[], $2::integer[]))'
+        if self.execute_sql(stmt, [pic.key for pic, _ in pairs],
+                            [grp.key for _, grp in pairs]):
+            for picture, group_ in pairs:
+                cached = _GROUP_CACHE.peek(group_.key)
+                if cached is not None and cached.pictures_loaded:
+                    cached.remove_picture(picture)
+                    self._changed(_GROUP_CACHE, group_.key)
+
+    @_connected
     def retrieve_group_by_key(self, key):
         """Retrieve series by key.
 
@@ -235,33 +906,62 @@ class Persistence:
         :rtype: Group
         """
         if key in _GROUP_CACHE:
-            return _GROUP_CACHE.get(key)
+            try:
+                return _GROUP_CACHE.get(key)
+            except KeyError:
+                pass  # invalidated concurrently
+        if key in self._unknown['group']:
+            return None
         self.logger.debug("retrieve_group_by_key(%s)", str(key))
         stmt = 'SELECT id, identifier, description, parent  ' \
                'FROM groups WHERE "id"=$1'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(key)
-        if result is None:
+        if not result:
+            self._unknown['group'].add(key)
             return None
         row = result[0]
         return self._create_group(*(list(row)))
 
+    @_connected
+    def retrieve_groups_by_keys(self, keys):
+        """Retrieve groups by keys.
+
+        :param keys: the ids of the groups
+        :type keys: [int]
+        :return: known groups in order of keys.
+        :rtype: [Group]
+        """
+        return self._retrieve_by_keys(
+            keys, 'groups', 'id, identifier, description, parent',
+            _GROUP_CACHE, 'group', self._create_groups)
+
+    @_connected
     def retrieve_groups_by_name(self, name):
         """Retrieve groups by name.
 
+        Served from cache if it is known to contain all groups.
+
         :param name: the name of the group
         :type name: str
         :return: groups.
         :rtype: [Group]
         """
+        if self._all_groups_generation == _GROUP_CACHE.generation:
+            return _GROUP_CACHE.lookup('name', name)
+        if name in self._unknown['group_name']:
+            return []
         self.logger.debug("retrieve_groups_by_name(%s)", name)
         stmt = 'SELECT id, identifier, description, parent ' \
                'FROM groups WHERE "identifier"=$1'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(name)
-        records = [self._create_group(*row) for row in result]
+        if not result:
+            self._unknown['group_name'].add(name)
+        records = self._create_groups(result)
         return list(records)
 
+    @_connected
     def retrieve_groups_by_name_segment(self, name):
         """Retrieve groups by name segment using wildcards.
 
@@ -275,11 +975,12 @@ class Persistence:
         self.logger.debug("retrieve_groups_by_name_segment(%s)", name)
         stmt = 'SELECT id, identifier, description, parent ' \
                'FROM groups WHERE "identifier"LIKE $1'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(name)
-        records = [self._create_group(*row) for row in result]
+        records = self._create_groups(result)
         return list(records)
 
+    @_connected
     def retrieve_all_groups(self):
         """Get all groups from database.
 
@@ -288,11 +989,15 @@ class Persistence:
         """
         self.logger.debug("retrieve_all_groups()")
         stmt = 'SELECT id, identifier, description, parent FROM groups'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_()
-        records = [self._create_group(*row) for row in result]
+        generation = _GROUP_CACHE.generation
+        records = self._create_groups(result)
+        if generation == _GROUP_CACHE.generation:
+            self._all_groups_generation = generation
         return list(records)
 
+    @_connected
     def retrieve_pictures_for_group(self, group_):
         """Retrieve pictures assigned to given group.
 
@@ -305,11 +1010,53 @@ class Persistence:
         stmt = 'SELECT id, identifier, path, description FROM pictures ' \
                'WHERE id IN (SELECT ' \
                'picture FROM picture2group WHERE "group"=$1)'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(group_.key)
-        records = [self._create_picture(*row) for row in result]
-        return list(records)
+        return self._create_pictures(result)
+
+    def _load_pictures_for_group(self, group_):
+        """Load pictures of a group on first access.
+
+        The group was weighed by the cache without its pictures, so it is
+        weighed again once they are loaded.
+
+        :param group_: group to load pictures for.
+        :type group_: Group
+        :return: pictures assigned to group
+        :rtype: [Picture]
+        """
+        pictures = self.retrieve_pictures_for_group(group_)
+        group_.pictures = pictures
+        if _GROUP_CACHE.peek(group_.key) is group_:
+            self._changed(_GROUP_CACHE, group_.key)
+        self._index_pictures(group_.key, pictures)
+        return pictures
+
+    def _index_group(self, group_):
+        """Remember the loaded pictures of a cached group.
+
+        :param group_: group to remember pictures of.
+        :type group_: Group
+        """
+        if group_.pictures_loaded:
+            self._index_pictures(group_.key, group_.pictures)
+
+    def _index_pictures(self, group_key, pictures):
+        """Remember that pictures are assigned to a cached group.
+
+        Changes of these pictures by other processes invalidate the group.
 
+        :param group_key: key of group.
+        :type group_key: int
+        :param pictures: pictures assigned to group.
+        :type pictures: [Picture]
+        """
+        with self._groups_by_picture_lock:
+            for picture in pictures:
+                self._groups_by_picture.setdefault(
+                    picture.key, set()).add(group_key)
+
+    @_connected
     def retrieve_groups_for_picture(self, picture):
         """Retrieve all groups for given picture.
 
@@ -321,16 +1068,27 @@ class Persistence:
         stmt = 'SELECT id, identifier, description, parent FROM groups ' \
                'WHERE id IN (SELECT ' \
                '"group" FROM picture2group WHERE picture=$1)'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(picture.key)
-        records = [self._create_group(*row) for row in result]
+        records = self._create_groups(result)
         return list(records)
 
+    @_connected
     def number_of_groups(self):
         """Provide number of groups currently in database."""
         self.logger.debug("number_of_groups()")
         stmt = 'SELECT count(*) FROM groups'
-        return self.conn.query.first(stmt)
+        return self._prepare(stmt).first()
+
+    def _create_groups(self, rows):
+        """Create Group instances from raw database records.
+
+        :param rows: records of id, identifier, description, parent.
+        :return: groups in order of rows.
+        :rtype: [Group]
+        """
+        return self._create_hierarchy(rows, 'groups', _GROUP_CACHE,
+                                      self._create_group)
 
     def _create_group(self, key, identifier, description, parent_id):
         """Create a Group instance from raw database record info.
@@ -346,14 +1104,37 @@ class Persistence:
                 parent = self.retrieve_group_by_key(parent_id)
             else:
                 parent = None
-            group = Group(key, identifier, description, parent=parent)
-            pictures = self.retrieve_pictures_for_group(group)
-            group.pictures = pictures
+            group = Group(key, identifier, description, parent=parent,
+                          loader=self._load_pictures_for_group)
             _GROUP_CACHE.put(key, group)
+            self._touch('groups', key)
             return group
 
+    def _cache_group(self, group_):
+        """Write updated group through to cache.
+
+        Children referring to an outdated instance of the group are
+        updated to refer to the given one.
+        """
+        old = _GROUP_CACHE.peek(group_.key)
+        if old is not None and old is not group_:
+            for child in _GROUP_CACHE.values():
+                if child.parent is old:
+                    child.parent = group_
+        _GROUP_CACHE.put(group_.key, group_)
+        self._touch('groups', group_.key)
+
+    def _uncache_group(self, key):
+        """Remove deleted group and its children from cache."""
+        _GROUP_CACHE.discard(key)
+        self._touch('groups', key)
+        for child in _GROUP_CACHE.values():
+            if child.parent is not None and child.parent.key == key:
+                _GROUP_CACHE.discard(child.key)
+
     # ------ picture related
 
+    @_connected
     def add_picture(self, picture):
         """Add a new picture.
 
@@ -366,27 +1147,43 @@ class Persistence:
         try:
             self.execute_sql(stmt, picture.name,
                              picture.path, picture.description)
-        except UniqueError as uq_err:
+        except self.backend.UniqueError as uq_err:
             raise DuplicateException(picture, uq_err)
+        self._unknown['picture'].clear()
+        self._unknown['path'].discard(picture.path)
 
+    @_connected
     def update_picture(self, picture):
         """Update picture record."""
         self.logger.debug("update_picture(%s)", str(picture))
         stmt = "UPDATE pictures SET identifier=$1, path=$2, " \
                "description=$3 WHERE id=$4"
-        self.execute_sql(stmt, picture.name,
-                         picture.path,
-                         picture.description,
-                         picture.key)
+        try:
+            done = self.execute_sql(stmt, picture.name,
+                                    picture.path,
+                                    picture.description,
+                                    picture.key)
+        except self.backend.UniqueError as uq_err:
+            raise DuplicateException(picture, uq_err)
+        if done:
+            self._unknown['path'].discard(picture.path)
+            self._cache_picture(picture)
 
+    @_connected
     def delete_picture(self, picture):
-        """Delete given picture. Does also remove tag assignments."""
+        """Delete given picture. Does also remove tag and group
+        assignments."""
         self.logger.debug("delete_picture(%s)", str(picture))
         stmt_tags = "DELETE FROM picture2tag WHERE picture=$1"
+        stmt_groups = "DELETE FROM picture2group WHERE picture=$1"
         stmt_pic = "DELETE FROM pictures WHERE id=$1"
-        self.execute_sql(stmt_tags, picture.key)
-        self.execute_sql(stmt_pic, picture.key)
+        with self.transaction():
+            self.execute_sql(stmt_tags, picture.key)
+            self.execute_sql(stmt_groups, picture.key)
+            self.execute_sql(stmt_pic, picture.key)
+            self._uncache_picture(picture.key)
 
+    @_connected
     def add_tag_to_picture(self, picture, tag):
         """Add tag to a picture.
 
@@ -398,8 +1195,13 @@ class Persistence:
         self.logger.debug(
             "add_tag_to_picture(%s, %s)", repr(picture), repr(tag))
         stmt = '''INSERT INTO picture2tag VALUES($1, $2)'''
-        self.execute_sql(stmt, picture.key, tag.key)
+        if self.execute_sql(stmt, picture.key, tag.key):
+            cached = _PICTURE_CACHE.peek(picture.key)
+            if cached is not None:
+                cached.assign_tag(tag)
+                self._changed(_PICTURE_CACHE, picture.key)
 
+    @_connected
     def remove_tag_from_picture(self, picture, tag):
         """Remove tag from given picture.
 
@@ -411,8 +1213,58 @@ class Persistence:
         self.logger.debug(
             "remove_tag_from_picture(%s, %s)", repr(picture), repr(tag))
         stmt = '''DELETE FROM picture2tag WHERE picture=$1 AND tag=$2'''
-        self.execute_sql(stmt, picture.key, tag.key)
+        if self.execute_sql(stmt, picture.key, tag.key):
+            cached = _PICTURE_CACHE.peek(picture.key)
+            if cached is not None:
+                cached.remove_tag(tag)
+                self._changed(_PICTURE_CACHE, picture.key)
+
+    @_connected
+    def add_tags_to_pictures(self, pairs):
+        """Add tags to pictures by a single statement.
 
+        Pairs already assigned are ignored.
+
+        :param pairs: pictures and the tags to add to them.
+        :type pairs: [(Picture, Tag)]
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return
+        self.logger.debug("add_tags_to_pictures(%d pairs)", len(pairs))
+        stmt = 'INSERT INTO picture2tag (picture, tag) ' \
+               'SELECT * FROM unnest($1::integer[], $2::integer[]) ' \
+               'ON CONFLICT DO NOTHING'
+        if self.execute_sql(stmt, [pic.key for pic, _ in pairs],
+                            [tag.key for _, tag in pairs]):
+            for picture, tag in pairs:
+                cached = _PICTURE_CACHE.peek(picture.key)
+                if cached is not None:
+                    cached.assign_tag(tag)
+                    self._changed(_PICTURE_CACHE, picture.key)
+
+    @_connected
+    def remove_tags_from_pictures(self, pairs):
+        """Remove tags from pictures by a single statement.
+
+        :param pairs: pictures and the tags to remove from them.
+        :type pairs: [(Picture, Tag)]
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return
+        self.logger.debug("remove_tags_from_pictures(%d pairs)", len(pairs))
+        stmt = 'DELETE FROM picture2tag WHERE (picture, tag) IN ' \
+               '(SELECT * FROM unnest($1::integer[], $2::integer[]))'
+        if self.execute_sql(stmt, [pic.key for pic, _ in pairs],
+                            [tag.key for _, tag in pairs]):
+            for picture, tag in pairs:
+                cached = _PICTURE_CACHE.peek(picture.key)
+                if cached is not None:
+                    cached.remove_tag(tag)
+                    self._changed(_PICTURE_CACHE, picture.key)
+
+    @_connected
     def retrieve_picture_by_key(self, key):
         """Retrieve picture by key.
 
@@ -422,17 +1274,37 @@ class Persistence:
         :rtype: Picture
         """
         if key in _PICTURE_CACHE:
-            return _PICTURE_CACHE.get(key)
+            try:
+                return _PICTURE_CACHE.get(key)
+            except KeyError:
+                pass  # invalidated concurrently
+        if key in self._unknown['picture']:
+            return None
         self.logger.debug("retrieve_picture_by_key(%s)", repr(key))
         stmt = 'SELECT id, identifier, path, description ' \
                'FROM pictures WHERE "id"=$1'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(key)
-        if result is None:
+        if not result:
+            self._unknown['picture'].add(key)
             return None
         row = result[0]
         return self._create_picture(*(list(row)))
 
+    @_connected
+    def retrieve_pictures_by_keys(self, keys):
+        """Retrieve pictures by keys.
+
+        :param keys: the ids of the pictures
+        :type keys: [int]
+        :return: known pictures in order of keys.
+        :rtype: [Picture]
+        """
+        return self._retrieve_by_keys(
+            keys, 'pictures', 'id, identifier, path, description',
+            _PICTURE_CACHE, 'picture', self._create_pictures)
+
+    @_connected
     def retrieve_picture_by_path(self, path):
         """Retrieve picture by path.
 
@@ -441,22 +1313,42 @@ class Persistence:
         :return: picture.
         :rtype: Picture
         """
+        pictures = _PICTURE_CACHE.lookup('path', path)
+        if pictures:
+            return pictures[0]
+        if path in self._unknown['path']:
+            return None
         self.logger.debug('retrieve_picture_by_path(%s)', path)
         stmt = 'SELECT id, identifier, path, description ' \
                'FROM pictures WHERE "path"=$1'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(path)
-        if result is None:
+        if not result:
+            self._unknown['path'].add(path)
             return None
         row = result[0]
         return self._create_picture(*(list(row)))
 
-    def retrieve_filtered_pictures(self, path, limit, groups, tags):
+    @_connected
+    def retrieve_filtered_pictures(self, path, limit, groups, tags,
+                                   after=None, include_descendants=False,
+                                   search=PATTERN):
         """Retrieve picture by path segment using wildcards.
 
         Example: Path: '%jpg'
 
-        :param path: the path to the picture
+        Pictures are ordered by path and id. To page through the result
+        pass the (path, id) of the last picture of the previous page as
+        after. The page then starts behind that key using the index on
+        (path, id), so each page costs the same no matter how deep it is.
+
+        With include_descendants a group or tag is matched by itself and
+        all its descendants.
+
+        The search mode decides how path is applied, see PictureFilter.
+        Search by words orders pictures by relevance and cannot be paged.
+
+        :param path: the path to the picture, a substring or words
         :type path: str
         :param limit: maximum number of records to retrieve
         :type limit: int
@@ -464,35 +1356,95 @@ class Persistence:
         :type groups: [Group]
         :param tags: limit result set based on given list of tags
         :type tags: [Tag]
+        :param after: (path, id) of the last picture of the previous page
+        :type after: (str, int)
+        :param include_descendants: match descendants of groups and tags
+        :type include_descendants: bool
+        :param search: search mode: pattern, substring or words
+        :type search: str
         :return: pictures matching given path.
         :rtype: [Picture]
         """
         self.logger.debug(
-            "retrieve_filtered_pictures(%s, %s, ...)", path, str(limit))
-        stmt_p = 'SELECT DISTINCT id, identifier, path, description ' \
-                 'FROM pictures WHERE ' \
-                 '"path" LIKE $1'
-        stmt_s = 'SELECT DISTINCT id, identifier, path, description ' \
-                 'FROM pictures, picture2group WHERE ' \
-                 'pictures.id=picture2group.picture AND ' \
-                 'picture2group.group={}'
-        stmt_t = 'SELECT DISTINCT id, identifier, path, description ' \
-                 'FROM pictures, picture2tag WHERE ' \
-                 'pictures.id=picture2tag.picture AND picture2tag.tag={}'
-        stmt = stmt_p
-        for item in groups:
-            stmt += ' INTERSECT ' + stmt_s.format(str(item.key))
-        for item in tags:
-            stmt += ' INTERSECT ' + stmt_t.format(str(item.key))
-        if limit is not None:
-            stmt += ' LIMIT {}'.format(limit)
-        self.logger.debug(stmt)
-        stmt_ = self.conn.prepare(stmt)
-        result = stmt_(path)
-        records = [self._create_picture(*row) for row in result]
-        records.sort()
-        return list(records)
-
+            "retrieve_filtered_pictures(%s, %s, ..., %s, %s)", path,
+            str(limit), repr(after), search)
+        query = self._picture_filter(path, groups, tags, after, limit,
+                                     include_descendants, search)
+        self.logger.debug(query.statement)
+        stmt_ = self._prepare(query.statement)
+        result = stmt_(*query.parameters)
+        return self._create_pictures(result)
+
+    def iter_filtered_pictures(self, path, groups, tags, chunk_size=1000,
+                               include_descendants=False):
+        """Iterate over pictures matching path segment, groups and tags.
+
+        Pictures are read by a server-side cursor in chunks of chunk_size,
+        so memory does not depend on the size of the result, and the first
+        pictures are available before the query has finished. The cursor
+        holds a pooled connection of its own until the iteration ends.
+        Changes made while iterating use other connections and do not
+        affect the cursor.
+
+        :param path: the path to the picture, may contain wildcards
+        :type path: str
+        :param groups: limit result to pictures assigned to all groups
+        :type groups: [Group]
+        :param tags: limit result to pictures having all tags
+        :type tags: [Tag]
+        :param chunk_size: number of pictures read at once
+        :type chunk_size: int
+        :param include_descendants: match descendants of groups and tags
+        :type include_descendants: bool
+        :return: pictures ordered by path.
+        :rtype: iterator of Picture
+        """
+        self.logger.debug("iter_filtered_pictures(%s, ...)", path)
+        query = self._picture_filter(path, groups, tags,
+                                     include_descendants=include_descendants)
+        with self.pool.connection() as pooled:
+            cursor = pooled.prepare(query.statement).declare(
+                *query.parameters)
+            try:
+                while True:
+                    rows = cursor.read(chunk_size)
+                    if not rows:
+                        break
+                    # Hydrate on the cursor's connection.
+                    bound = getattr(self._local, 'pooled', None)
+                    self._local.pooled = pooled
+                    try:
+                        pictures = self._create_pictures(rows)
+                    finally:
+                        self._local.pooled = bound
+                    yield from pictures
+            finally:
+                cursor.close()
+                # End the read only transaction the cursor lives in.
+                pooled.conn.rollback()
+
+    @_connected
+    def _picture_filter(self, path, groups, tags, after=None, limit=None,
+                        include_descendants=False, search=PATTERN):
+        """Provide filter selecting pictures.
+
+        :param include_descendants: match descendants of groups and tags
+        :type include_descendants: bool
+        :param search: search mode: pattern, substring or words
+        :type search: str
+        :rtype: PictureFilter
+        """
+        group_tree = None
+        tag_tree = None
+        if include_descendants:
+            if groups:
+                group_tree = self._tree('groups')
+            if tags:
+                tag_tree = self._tree('tags')
+        return PictureFilter(path, groups, tags, after, limit,
+                             group_tree, tag_tree, search)
+
+    @_connected
     def retrieve_tags_for_picture(self, picture):
         """Retrieve all tags for given picture.
 
@@ -505,11 +1457,11 @@ class Persistence:
         stmt = 'SELECT id, identifier, description, parent ' \
                'FROM tags WHERE id IN (SELECT tag ' \
                'FROM picture2tag WHERE picture=$1)'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(picture.key)
-        records = [self._create_tag(*row) for row in result]
-        return list(records)
+        return self._create_tags(result)
 
+    @_connected
     def retrieve_pictures_by_tag(self, tag_):
         """Retrieve pictures which have tag assigned.
 
@@ -522,35 +1474,135 @@ class Persistence:
         stmt = 'SELECT id, identifier, path, description FROM pictures ' \
                'WHERE id IN (SELECT ' \
                'picture FROM picture2tag WHERE tag=$1)'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(tag_.key)
-        records = [self._create_picture(*row) for row in result]
-        return list(records)
+        return self._create_pictures(result)
 
+    @_connected
     def number_of_pictures(self):
         """Provide number of pictures currently in database."""
         self.logger.debug('number_of_pictures()')
         stmt = 'SELECT count(*) FROM pictures'
-        return self.conn.query.first(stmt)
+        return self._prepare(stmt).first()
+
+    @_connected
+    def retrieve_counts(self, exact=False):
+        """Provide number of pictures, groups and tags.
+
+        Counts are read from the counters maintained by triggers, see
+        migrations. Without counters or if exact is set the rows are
+        counted, which scans the tables.
+
+        :param exact: count rows of tables.
+        :type exact: bool
+        :return: number of rows by table name.
+        :rtype: dict(str, int)
+        """
+        if not exact:
+            stmt = 'SELECT name, count FROM picdb_counts'
+            try:
+                counts = dict(self._prepare(stmt)())
+            except self.backend.UndefinedTableError:
+                self.conn.rollback()
+                counts = {}
+            if counts:
+                return counts
+        self.logger.debug('retrieve_counts(exact)')
+        return {'pictures': self.number_of_pictures(),
+                'groups': self.number_of_groups(),
+                'tags': self.number_of_tags()}
 
     def _create_picture(self, key, identifier, path, description):
         """Create a Picture instance from raw database record info.
 
-        Creates parent object if required.
+        Provides the cached instance if there is one, loading the tags of
+        the picture otherwise.
         """
-        try:
-            return _PICTURE_CACHE.get(key)
-        except KeyError:
-            self.logger.debug(
-                "_create_picture(%s, %s, ...)", str(key), identifier)
-            picture = Picture(key, identifier, path, description)
-            tags = self.retrieve_tags_for_picture(picture)
-            picture.tags = tags
-            _PICTURE_CACHE.put(key, picture)
-            return picture
+        return self._create_pictures([(key, identifier, path, description)])[0]
+
+    def _create_pictures(self, rows):
+        """Create Picture instances from raw database records.
+
+        The tags of all pictures not cached yet are loaded by one query.
+
+        :param rows: records of id, identifier, path, description.
+        :return: pictures in order of rows.
+        :rtype: [Picture]
+        """
+        pictures = []
+        loaded = {}
+        for key, identifier, path, description in rows:
+            picture = loaded.get(key)
+            if picture is None:
+                try:
+                    picture = _PICTURE_CACHE.get(key)
+                except KeyError:
+                    picture = Picture(key, identifier, path, description)
+                    loaded[key] = picture
+            pictures.append(picture)
+        if loaded:
+            self.logger.debug("_create_pictures(%d new)", len(loaded))
+            tags = self._retrieve_tags_for_pictures(list(loaded))
+            for key, picture in loaded.items():
+                picture.tags = tags.get(key, [])
+                _PICTURE_CACHE.put(key, picture)
+                self._touch('pictures', key)
+        return pictures
+
+    def _retrieve_tags_for_pictures(self, keys):
+        """Retrieve tags of several pictures by one query.
+
+        :param keys: keys of pictures.
+        :type keys: [int]
+        :return: tags by picture key, pictures without tags are missing.
+        :rtype: dict
+        """
+        stmt = 'SELECT picture2tag.picture, id, identifier, description, ' \
+               'parent FROM tags, picture2tag ' \
+               'WHERE tags.id=picture2tag.tag AND picture2tag.picture=ANY($1)'
+        stmt_ = self._prepare(stmt)
+        result = stmt_(keys)
+        tags = self._create_tags([row[1:] for row in result])
+        tags_by_picture = {}
+        for row, tag in zip(result, tags):
+            tags_by_picture.setdefault(row[0], []).append(tag)
+        return tags_by_picture
+
+    def _cache_picture(self, picture):
+        """Write updated picture through to cache.
+
+        Cached groups referring to an outdated instance of the picture are
+        updated to refer to the given one.
+        """
+        old = _PICTURE_CACHE.peek(picture.key)
+        if old is not None and old is not picture:
+            for group_ in _GROUP_CACHE.values():
+                if group_.pictures_loaded:
+                    _replace_instance(group_.pictures, old, picture)
+        _PICTURE_CACHE.put(picture.key, picture)
+        self._touch('pictures', picture.key)
+
+    def _uncache_picture(self, key):
+        """Remove deleted picture from cache and from cached groups."""
+        _PICTURE_CACHE.discard(key)
+        self._touch('pictures', key)
+        for group_ in _GROUP_CACHE.values():
+            if group_.pictures_loaded and _remove_key(group_.pictures, key):
+                self._changed(_GROUP_CACHE, group_.key)
+
+    def _changed(self, cache, key):
+        """Account for a cached entity whose contents changed in place.
+
+        :param cache: cache holding the entity.
+        :type cache: LRUCache
+        :param key: key of the entity.
+        """
+        cache.reweigh(key)
+        self._touch(_TABLE_BY_CACHE[cache], key)
 
     # ------ tag related
 
+    @_connected
     def add_tag(self, tag):
         """Add a new tag.
 
@@ -563,32 +1615,47 @@ class Persistence:
         parent = tag.parent.key if tag.parent is not None else None
         try:
             self.execute_sql(stmt, tag.name, tag.description, parent)
-        except UniqueError as uq_err:
+        except self.backend.UniqueError as uq_err:
             raise DuplicateException(tag, uq_err)
+        self._unknown['tag'].clear()
+        self._unknown['tag_name'].discard(tag.name)
+        self._trees.pop('tags', None)
 
+    @_connected
     def update_tag(self, tag):
         """Update tag record."""
         self.logger.debug("update_tag(%s)", repr(tag))
         stmt = "UPDATE tags SET identifier=$1, description=$2, parent=$3 " \
                "WHERE id=$4"
-        self.execute_sql(stmt, tag.name,
-                         tag.description,
-                         tag.parent.key if tag.parent is not None
-                         else None,
-                         tag.key)
-
+        if self.execute_sql(stmt, tag.name,
+                            tag.description,
+                            tag.parent.key if tag.parent is not None
+                            else None,
+                            tag.key):
+            self._unknown['tag_name'].discard(tag.name)
+            self._trees.pop('tags', None)
+            self._cache_tag(tag)
+
+    @_connected
     def delete_tag(self, tag_):
         """Delete given tag and all its assignments."""
         self.logger.debug("delete_tag(%s)", repr(tag_))
+        stmt_pics = "DELETE FROM picture2tag WHERE tag=$1"
         stmt = "DELETE FROM tags WHERE id=$1"
-        self.execute_sql(stmt, tag_.key)
+        with self.transaction():
+            self.execute_sql(stmt_pics, tag_.key)
+            self.execute_sql(stmt, tag_.key)
+            self._uncache_tag(tag_.key)
+            self._trees.pop('tags', None)
 
+    @_connected
     def number_of_tags(self):
         """Provide number of tags currently in database."""
         self.logger.debug("number_of_tags()")
         stmt = 'SELECT count(*) FROM tags'
-        return self.conn.query.first(stmt)
+        return self._prepare(stmt).first()
 
+    @_connected
     def retrieve_all_tags(self):
         """Get all tags from database.
 
@@ -597,10 +1664,10 @@ class Persistence:
         """
         self.logger.debug("retrieve_all_tags()")
         stmt = 'SELECT id, identifier, description, parent FROM tags'
-        stmt_ = self.conn.prepare(stmt)
-        records = [self._create_tag(*row) for row in stmt_()]
-        return list(records)
+        stmt_ = self._prepare(stmt)
+        return self._create_tags(stmt_())
 
+    @_connected
     def retrieve_tag_by_name(self, name):
         """Retrieve tag by name.
 
@@ -609,15 +1676,22 @@ class Persistence:
         :return: tag or None if name is unknown.
         :rtype: Tag
         """
+        tags = _TAG_CACHE.lookup('name', name)
+        if tags:
+            return tags[0]
+        if name in self._unknown['tag_name']:
+            return None
         self.logger.debug("retrieve_tag_by_name(%s)", name)
         stmt = 'SELECT id, identifier, description, parent ' \
                'FROM tags WHERE "identifier"=$1'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(name)
-        if result is None:
+        if not result:
+            self._unknown['tag_name'].add(name)
             return None
         return self._create_tag(*(list(result[0])))
 
+    @_connected
     def retrieve_tags_by_name_segment(self, name):
         """Retrieve tags by name segment using wildcards.
 
@@ -631,11 +1705,11 @@ class Persistence:
         self.logger.debug("retrieve_tags_by_name_segment(%s)", name)
         stmt = 'SELECT id, identifier, description, parent ' \
                'FROM tags WHERE "identifier"LIKE $1'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(name)
-        records = [self._create_tag(*row) for row in result]
-        return list(records)
+        return self._create_tags(result)
 
+    @_connected
     def retrieve_tag_by_key(self, key):
         """Retrieve tag by key.
 
@@ -645,17 +1719,46 @@ class Persistence:
         :rtype: Tag
         """
         if key in _TAG_CACHE:
-            return _TAG_CACHE.get(key)
+            try:
+                return _TAG_CACHE.get(key)
+            except KeyError:
+                pass  # invalidated concurrently
+        if key in self._unknown['tag']:
+            return None
         self.logger.debug("retrieve_tag_by_key(%s)", str(key))
         stmt = 'SELECT id, identifier, description, parent FROM tags WHERE ' \
                '"id"=$1'
-        stmt_ = self.conn.prepare(stmt)
+        stmt_ = self._prepare(stmt)
         result = stmt_(key)
-        if result is None:
+        if not result:
+            self._unknown['tag'].add(key)
             return None
         row = result[0]
         return self._create_tag(*(list(row)))
 
+    @_connected
+    def retrieve_tags_by_keys(self, keys):
+        """Retrieve tags by keys.
+
+        :param keys: the ids of the tags
+        :type keys: [int]
+        :return: known tags in order of keys.
+        :rtype: [Tag]
+        """
+        return self._retrieve_by_keys(
+            keys, 'tags', 'id, identifier, description, parent',
+            _TAG_CACHE, 'tag', self._create_tags)
+
+    def _create_tags(self, rows):
+        """Create Tag instances from raw database records.
+
+        :param rows: records of id, identifier, description, parent.
+        :return: tags in order of rows.
+        :rtype: [Tag]
+        """
+        return self._create_hierarchy(rows, 'tags', _TAG_CACHE,
+                                      self._create_tag)
+
     def _create_tag(self, key, identifier, description, parent_id):
         """Create a Tag instance from raw database record info.
 
@@ -672,4 +1775,33 @@ class Persistence:
                 parent = None
             tag = Tag(key, identifier, description, parent=parent)
             _TAG_CACHE.put(key, tag)
+            self._touch('tags', key)
             return tag
+
+    def _cache_tag(self, tag):
+        """Write updated tag through to cache.
+
+        Cached pictures and child tags referring to an outdated instance of
+        the tag are updated to refer to the given one.
+        """
+        old = _TAG_CACHE.peek(tag.key)
+        if old is not None and old is not tag:
+            for picture in _PICTURE_CACHE.values():
+                _replace_instance(picture.tags, old, tag)
+            for child in _TAG_CACHE.values():
+                if child.parent is old:
+                    child.parent = tag
+        _TAG_CACHE.put(tag.key, tag)
+        self._touch('tags', tag.key)
+
+    def _uncache_tag(self, key):
+        """Remove deleted tag and its children from cache. Remove the tag
+        from cached pictures."""
+        _TAG_CACHE.discard(key)
+        self._touch('tags', key)
+        for picture in _PICTURE_CACHE.values():
+            if _remove_key(picture.tags, key):
+                self._changed(_PICTURE_CACHE, picture.key)
+        for child in _TAG_CACHE.values():
+            if child.parent is not None and child.parent.key == key:
+                _TAG_CACHE.discard(child.key)
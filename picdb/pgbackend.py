@@ -0,0 +1,71 @@
+# coding=utf-8
+"""
+PostgreSQL backend based on py-postgresql.
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import postgresql.driver.dbapi20 as dbapi
+from postgresql.exceptions import Error, UniqueError, UndefinedTableError
+
+from .backend import Backend
+from . import migrations
+
+
+class PostgresBackend(Backend):
+    """Backend storing data in a PostgreSQL server."""
+
+    name = 'postgresql'
+    Error = Error
+    UniqueError = UniqueError
+    UndefinedTableError = UndefinedTableError
+    supports_listen = True
+
+    def connect(self):
+        """Open a new connection to the database server.
+
+        :return: database connection.
+        """
+        return dbapi.connect(user=self.db_params.user,
+                             database=self.db_params.name,
+                             port=self.db_params.port,
+                             password=self.db_params.passwd)
+
+    def migrate(self, conn, target=None):
+        """Apply pending schema migrations.
+
+        :param conn: database connection
+        :param target: version to migrate to, None for latest.
+        :type target: int
+        :return: migrations applied.
+        :rtype: [Migration]
+        :raises MigrationError: if a migration fails.
+        """
+        return migrations.migrate(conn, target)
+
+
+BACKEND = PostgresBackend
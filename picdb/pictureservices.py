@@ -32,16 +32,25 @@ Service functions for pictures.
 from .persistence import get_db
 
 
+def transaction():
+    """Provide a scope running all database changes as one transaction.
+
+    See Persistence.transaction().
+    """
+    return get_db().transaction()
+
+
 def save_picture(picture):
     """Save given picture to database.
 
-    Takes care for assigned tags.
+    Takes care for assigned tags. Runs as one transaction.
     """
-    if picture.key is None:
-        _add_picture(picture)
-    else:
-        _update_picture(picture)
-        _update_tags(picture)
+    with get_db().transaction():
+        if picture.key is None:
+            _add_picture(picture)
+        else:
+            _update_picture(picture)
+            _update_tags(picture)
 
 
 def _update_tags(picture):
@@ -87,6 +96,19 @@ def retrieve_picture_by_key(key):
     return picture
 
 
+def retrieve_pictures_by_keys(keys):
+    """Retrieve pictures.
+
+    :param keys: keys of pictures
+    :type keys: [int]
+    :return: known pictures in order of keys
+    :rtype: [Picture]
+    """
+    database = get_db()
+    pictures = database.retrieve_pictures_by_keys(keys)
+    return pictures
+
+
 def retrieve_picture_by_path(path):
     """Retrieve picture.
 
@@ -100,10 +122,15 @@ def retrieve_picture_by_path(path):
     return picture
 
 
-def retrieve_filtered_pictures(path, limit, groups, tags):
+def retrieve_filtered_pictures(path, limit, groups, tags, after=None,
+                               include_descendants=False, search='pattern'):
     """Retrieve pictures applying filter.
 
-    :param path: path to picture, may include SQL wildcards
+    Pictures are ordered by path and id. Pass the (path, id) of the last
+    picture of a page as after to retrieve the next page.
+
+    :param path: path to picture, may include SQL wildcards, or a
+        substring or words to search for depending on search.
     :type path: str
     :param limit: maximum number of records.
     :type limit: int
@@ -111,14 +138,48 @@ def retrieve_filtered_pictures(path, limit, groups, tags):
     :type groups: [Group]
     :param tags: tags which shall be assigned to the pictures.
     :type tags: [Tag]
+    :param after: (path, id) of the last picture of the previous page.
+    :type after: (str, int)
+    :param include_descendants: match descendants of groups and tags too.
+    :type include_descendants: bool
+    :param search: pattern matches path, substring finds text in path,
+        name or description, words searches name and description ranked
+        by relevance.
+    :type search: str
     :return: pictures matching given criteria.
     :rtype: [Picture]
     """
     database = get_db()
-    pictures = database.retrieve_filtered_pictures(path, limit, groups, tags)
+    pictures = database.retrieve_filtered_pictures(path, limit, groups, tags,
+                                                   after, include_descendants,
+                                                   search)
     return pictures
 
 
+def iter_filtered_pictures(path, groups, tags, chunk_size=1000,
+                           include_descendants=False):
+    """Iterate over pictures applying filter.
+
+    Pictures are streamed from the database in chunks, ordered by path.
+
+    :param path: path to picture, may include SQL wildcards
+    :type path: str
+    :param groups: groups the pictures shall be assigned to.
+    :type groups: [Group]
+    :param tags: tags which shall be assigned to the pictures.
+    :type tags: [Tag]
+    :param chunk_size: number of pictures read at once.
+    :type chunk_size: int
+    :param include_descendants: match descendants of groups and tags too.
+    :type include_descendants: bool
+    :return: pictures matching given criteria.
+    :rtype: iterator of Picture
+    """
+    database = get_db()
+    return database.iter_filtered_pictures(path, groups, tags, chunk_size,
+                                           include_descendants)
+
+
 def add_tag_to_picture(picture, tag):
     """Tag oicture."""
     database = get_db()
@@ -127,8 +188,20 @@ def add_tag_to_picture(picture, tag):
 
 def add_tags_to_picture(picture, tags):
     """Add set of tags to picture."""
-    for tag in tags:
-        add_tag_to_picture(picture, tag)
+    add_tags_to_pictures([picture], tags)
+
+
+def add_tags_to_pictures(pictures, tags):
+    """Add each of the tags to each of the pictures.
+
+    :param pictures: pictures to tag
+    :type pictures: [Picture]
+    :param tags: tags to add
+    :type tags: [Tag]
+    """
+    database = get_db()
+    database.add_tags_to_pictures([(picture, tag) for picture in pictures
+                                   for tag in tags])
 
 
 def remove_tag_from_picture(picture, tag):
@@ -139,8 +212,20 @@ def remove_tag_from_picture(picture, tag):
 
 def remove_tags_from_picture(picture, tags):
     """Remove given tags from picture."""
-    for tag in tags:
-        remove_tag_from_picture(picture, tag)
+    remove_tags_from_pictures([picture], tags)
+
+
+def remove_tags_from_pictures(pictures, tags):
+    """Remove each of the tags from each of the pictures.
+
+    :param pictures: pictures to untag
+    :type pictures: [Picture]
+    :param tags: tags to remove
+    :type tags: [Tag]
+    """
+    database = get_db()
+    database.remove_tags_from_pictures([(picture, tag) for picture in pictures
+                                        for tag in tags])
 
 
 def retrieve_tags_for_picture(picture):
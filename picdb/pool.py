@@ -0,0 +1,230 @@
+# coding=utf-8
+"""
+A bounded pool of database connections.
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from .cache import LRUCache
+
+
+class PoolTimeoutError(Exception):
+    """No connection became available in time."""
+    pass
+
+
+class PooledConnection:
+    """A connection of the pool with its prepared statements."""
+
+    def __init__(self, conn, max_statements):
+        """Initialize pooled connection.
+
+        :param conn: database connection
+        :param max_statements: maximum number of prepared statements kept.
+        :type max_statements: int
+        """
+        self.conn = conn
+        # Statements prepared on this connection by SQL text.
+        self.statements = LRUCache(max_statements)
+        self.last_used = time.monotonic()
+
+    def prepare(self, sql):
+        """Provide prepared statement for sql.
+
+        Statements are prepared once per connection and reused afterwards.
+
+        :param sql: sql statement
+        :type sql: str
+        :return: prepared statement
+        """
+        try:
+            return self.statements.get(sql)
+        except KeyError:
+            stmt = self.conn.prepare(sql)
+            self.statements.put(sql, stmt)
+            return stmt
+
+    def is_alive(self):
+        """Check connection by a trivial query.
+
+        :rtype: bool
+        """
+        try:
+            self.prepare('SELECT 1').first()
+            return True
+        except Exception:  # noqa
+            return False
+
+    def close(self):
+        """Close connection, ignoring errors of broken connections."""
+        try:
+            self.conn.close()
+        except Exception:  # noqa
+            pass
+
+
+class ConnectionPool:
+    """Bounded pool of database connections.
+
+    Connections are created on demand up to max_size. A connection idle
+    for longer than check_after seconds is checked before it is handed out
+    again and replaced if it is broken. All operations are thread safe.
+    """
+
+    def __init__(self, connect, max_size, max_statements=200,
+                 check_after=30.0, timeout=None):
+        """Initialize pool.
+
+        :param connect: creates a new database connection.
+        :type connect: f() -> connection
+        :param max_size: maximum number of connections.
+        :type max_size: int
+        :param max_statements: prepared statements kept per connection.
+        :type max_statements: int
+        :param check_after: idle seconds after which a connection is checked.
+        :type check_after: float
+        :param timeout: seconds to wait for a connection, None for no limit.
+        :type timeout: float
+        """
+        self.logger = logging.getLogger('picdb.db')
+        self.connect = connect
+        self.max_size = max(1, max_size)
+        self.max_statements = max_statements
+        self.check_after = check_after
+        self.timeout = timeout
+        self._idle = []
+        self._size = 0
+        self._closed = False
+        self._available = threading.Condition(threading.Lock())
+        # Open connections, for statistics.
+        self.connections = []
+
+    @property
+    def size(self):
+        """Get number of open connections.
+
+        :rtype: int
+        """
+        return self._size
+
+    def acquire(self):
+        """Take a connection from the pool.
+
+        Waits until a connection is released if max_size connections are
+        in use.
+
+        :return: connection for exclusive use until released.
+        :rtype: PooledConnection
+        :raises PoolTimeoutError: if no connection became available in time.
+        """
+        with self._available:
+            if self._closed:
+                raise PoolTimeoutError('Connection pool is closed.')
+            while not self._idle and self._size >= self.max_size:
+                if self._closed:
+                    raise PoolTimeoutError('Connection pool is closed.')
+                if not self._available.wait(self.timeout):
+                    raise PoolTimeoutError(
+                        'No connection available within {}s.'.format(
+                            self.timeout))
+            if self._idle:
+                pooled = self._idle.pop()
+            else:
+                pooled = None
+                self._size += 1
+        if pooled is not None and \
+                time.monotonic() - pooled.last_used > self.check_after and \
+                not pooled.is_alive():
+            self.logger.info('Replacing broken database connection.')
+            pooled.close()
+            with self._available:
+                self.connections.remove(pooled)
+            pooled = None
+        if pooled is None:
+            try:
+                pooled = PooledConnection(self.connect(), self.max_statements)
+            except Exception:
+                with self._available:
+                    self._size -= 1
+                    self._available.notify()
+                raise
+            with self._available:
+                self.connections.append(pooled)
+        return pooled
+
+    def release(self, pooled, broken=False):
+        """Return a connection to the pool.
+
+        :param pooled: connection taken by acquire()
+        :type pooled: PooledConnection
+        :param broken: close the connection instead of reusing it.
+        :type broken: bool
+        """
+        pooled.last_used = time.monotonic()
+        if broken or self._closed:
+            pooled.close()
+        with self._available:
+            if broken or self._closed:
+                if pooled in self.connections:
+                    self.connections.remove(pooled)
+                self._size -= 1
+            else:
+                self._idle.append(pooled)
+            self._available.notify()
+
+    @contextmanager
+    def connection(self):
+        """Provide a connection for the duration of a block.
+
+        A connection whose block fails with a lost connection is not
+        reused.
+        """
+        pooled = self.acquire()
+        broken = False
+        try:
+            yield pooled
+        except Exception:
+            broken = pooled.conn.closed
+            raise
+        finally:
+            self.release(pooled, broken)
+
+    def close(self):
+        """Close idle connections. Connections in use are closed when they
+        are released."""
+        with self._available:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._available.notify_all()
+        for pooled in idle:
+            pooled.close()
@@ -34,6 +34,7 @@ from tkinter import ttk
 import logging
 
 from .uicommon import Observable
+from .uiexecutor import TkExecutor, BusyIndicator
 
 
 class Selector(ttk.LabelFrame, Observable):
@@ -67,7 +68,10 @@ class Selector(ttk.LabelFrame, Observable):
         self.control_frame = None
         self.add_button = None
         self.remove_button = None
+        self.progress = None
         self._create_widgets()
+        self.executor = TkExecutor(self.after, self.progress.show)
+        self.bind('<Destroy>', lambda _: self.executor.cancel())
 
     def _create_widgets(self):
         self.rowconfigure(0, weight=1)
@@ -80,6 +84,8 @@ class Selector(ttk.LabelFrame, Observable):
         self.right.grid(row=0, column=2, sticky=(tk.N, tk.S, tk.E, tk.W))
         self.control_frame = self._create_control_frame()
         self.control_frame.grid(row=0, column=1)
+        self.progress = BusyIndicator(self)
+        self.progress.grid(row=1, column=0, columnspan=3, sticky=(tk.W, tk.E))
 
     def _create_control_frame(self):
         frame = ttk.Frame(self)
@@ -111,28 +117,70 @@ class Selector(ttk.LabelFrame, Observable):
             self.right.delete(item.key)
         self._call_listeners(self.EVT_ITEM_UNASSIGNED, items)
 
-    def init_trees(self, all_entities, right_entities):
-        """Write given entities into left tree."""
-        self.clear()
-        left_entities = all_entities
-        for entity in left_entities:
-            self.left.add_item(entity)
-        for entity in right_entities:
-            self.right.add_item(entity)
-
     def clear(self):
         """Clear selector."""
         self.left.clear()
         self.right.clear()
 
+    def selected_keys(self):
+        """Return the keys of the selected items.
+
+        :rtype: [int]
+        """
+        return [int(item) for item in self.right.get_all_items()]
+
     def selected_items(self):
-        """Return the selected items."""
-        raise NotImplementedError
+        """Return the selected items.
+
+        :rtype: [Entity]
+        """
+        return self._retrieve_by_keys(self.selected_keys())
 
     def load_items(self, items):
         """Load initial items into tree views.
 
+        The given items are displayed in the right tree at once, so
+        selected_items() provides them even before the left tree is
+        loaded in the background.
+
         :param items: entities to display in right tree.
         :type items: [Entity]
         """
+        self.clear()
+        for entity in items:
+            self.right.add_item(entity)
+        self.reload_items()
+
+    def reload_items(self):
+        """Load all entities into left tree again.
+
+        Entities are retrieved in the background, superseding a load
+        still pending. The right tree is left alone.
+        """
+        self.executor.submit('items', self._retrieve_all, self._show_all)
+
+    def _show_all(self, all_entities):
+        """Replace entities in left tree.
+
+        :param all_entities: entities to display in left tree.
+        :type all_entities: [Entity]
+        """
+        self.left.clear()
+        for entity in all_entities:
+            self.left.add_item(entity)
+
+    def _retrieve_all(self):
+        """Retrieve all entities. Called on a worker thread.
+
+        :rtype: [Entity]
+        """
+        raise NotImplementedError
+
+    def _retrieve_by_keys(self, keys):
+        """Retrieve entities by given keys.
+
+        :param keys: keys of entities.
+        :type keys: [int]
+        :rtype: [Entity]
+        """
         raise NotImplementedError
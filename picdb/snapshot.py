@@ -0,0 +1,158 @@
+# coding=utf-8
+"""
+Snapshots of cached entities for a warm start.
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import os
+import pickle
+import zlib
+
+from .group import Group
+from .picture import Picture
+from .tag import Tag
+
+LOGGER = logging.getLogger('picdb.snapshot')
+
+# Identifies snapshot files and their format version.
+MAGIC = b'PICDB-SNAPSHOT-1\n'
+
+
+def _closure(tags, pictures, groups):
+    """Collect all entities reachable from the given ones.
+
+    :return: tags, pictures and groups by key
+    :rtype: (dict, dict, dict)
+    """
+    all_groups = {}
+    for group_ in groups:
+        while group_ is not None and group_.key not in all_groups:
+            all_groups[group_.key] = group_
+            group_ = group_.parent
+    all_pictures = {pic.key: pic for pic in pictures}
+    for group_ in all_groups.values():
+        if group_.pictures_loaded:
+            all_pictures.update((pic.key, pic) for pic in group_.pictures)
+    all_tags = {}
+    for tag in list(tags) + [tag for pic in all_pictures.values()
+                             for tag in pic.tags]:
+        while tag is not None and tag.key not in all_tags:
+            all_tags[tag.key] = tag
+            tag = tag.parent
+    return all_tags, all_pictures, all_groups
+
+
+def _key(entity):
+    """Provide key of entity or None."""
+    return entity.key if entity is not None else None
+
+
+def dump(path, marker, tags, pictures, groups):
+    """Write snapshot of entities to file.
+
+    Entities are stored as tuples of plain values referring to each other
+    by key, pickled and compressed. The file is replaced atomically.
+
+    :param path: snapshot file
+    :type path: str
+    :param marker: database change marker the entities are valid for.
+    :param tags: tags to store
+    :type tags: [Tag]
+    :param pictures: pictures to store
+    :type pictures: [Picture]
+    :param groups: groups to store
+    :type groups: [Group]
+    """
+    all_tags, all_pictures, all_groups = _closure(tags, pictures, groups)
+    data = (marker,
+            [(t.key, t.name, t.description, _key(t.parent))
+             for t in all_tags.values()],
+            [(p.key, p.name, p.path, p.description,
+              tuple(t.key for t in p.tags))
+             for p in all_pictures.values()],
+            [(g.key, g.name, g.description, _key(g.parent),
+              tuple(p.key for p in g.pictures) if g.pictures_loaded
+              else None)
+             for g in all_groups.values()])
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as snapshot_file:
+        snapshot_file.write(MAGIC)
+        snapshot_file.write(zlib.compress(
+            pickle.dumps(data, pickle.HIGHEST_PROTOCOL)))
+    os.replace(tmp_path, path)
+    LOGGER.info('Snapshot written: %d tags, %d pictures, %d groups',
+                len(all_tags), len(all_pictures), len(all_groups))
+
+
+def read_marker(path):
+    """Read change marker of snapshot.
+
+    :param path: snapshot file
+    :type path: str
+    :return: marker and raw data or (None, None) if file is missing or
+    invalid.
+    """
+    try:
+        with open(path, 'rb') as snapshot_file:
+            if snapshot_file.read(len(MAGIC)) != MAGIC:
+                return None, None
+            data = pickle.loads(zlib.decompress(snapshot_file.read()))
+    except (OSError, zlib.error, pickle.UnpicklingError, EOFError) as exc:
+        LOGGER.warning('Cannot read snapshot %s: %s', path, exc)
+        return None, None
+    return data[0], data
+
+
+def restore(data, group_loader=None):
+    """Recreate entities from raw snapshot data.
+
+    :param data: raw data as provided by read_marker()
+    :param group_loader: loads pictures of groups stored without them.
+    :type group_loader: f(Group) -> [Picture]
+    :return: tags, pictures and groups
+    :rtype: ([Tag], [Picture], [Group])
+    """
+    _, tag_rows, picture_rows, group_rows = data
+    tags = {key: Tag(key, name, description)
+            for key, name, description, _ in tag_rows}
+    for key, _, _, parent in tag_rows:
+        tags[key].parent = tags.get(parent)
+    pictures = {}
+    for key, name, path, description, tag_keys in picture_rows:
+        picture = Picture(key, name, path, description)
+        picture.tags = [tags[tag_key] for tag_key in tag_keys]
+        pictures[key] = picture
+    groups = {key: Group(key, name, description,
+                         pictures=[pictures[pic] for pic in pic_keys]
+                         if pic_keys is not None else None,
+                         loader=group_loader)
+              for key, name, description, _, pic_keys in group_rows}
+    for key, _, _, parent, _ in group_rows:
+        groups[key].parent = groups.get(parent)
+    return list(tags.values()), list(pictures.values()), list(groups.values())
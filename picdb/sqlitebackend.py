@@ -0,0 +1,403 @@
+# coding=utf-8
+"""
+Embedded SQLite backend based on the standard library.
+
+The database is a single file in WAL mode, so readers do not block the
+writer. SQL written for PostgreSQL is translated: $n placeholders,
+arrays passed as JSON and expanded by json_each(), and casts dropped.
+Word search and change notification are not available.
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import functools
+import json
+import re
+import sqlite3
+
+from .backend import Backend
+
+# Same tables and indexes as scripts/setup_db.sql and the migrations.
+_SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS tags ('
+    'id INTEGER PRIMARY KEY, identifier TEXT NOT NULL, description TEXT, '
+    'parent INTEGER REFERENCES tags (id) ON DELETE RESTRICT, '
+    'CONSTRAINT tags_uq UNIQUE (identifier, parent))',
+    'CREATE TABLE IF NOT EXISTS pictures ('
+    'id INTEGER PRIMARY KEY, description TEXT, identifier TEXT NOT NULL, '
+    'path TEXT NOT NULL, CONSTRAINT pictures_uq UNIQUE (path))',
+    'CREATE TABLE IF NOT EXISTS groups ('
+    'id INTEGER PRIMARY KEY, identifier TEXT NOT NULL, description TEXT, '
+    'parent INTEGER REFERENCES groups (id) ON DELETE RESTRICT, '
+    'CONSTRAINT groups_uq UNIQUE (identifier, parent))',
+    'CREATE TABLE IF NOT EXISTS picture2group ('
+    'picture INTEGER NOT NULL, "group" INTEGER NOT NULL, '
+    'CONSTRAINT p2g_primary_key PRIMARY KEY (picture, "group"))',
+    'CREATE TABLE IF NOT EXISTS picture2tag ('
+    'picture INTEGER NOT NULL, tag INTEGER NOT NULL, '
+    'CONSTRAINT p2t_primary_key PRIMARY KEY (picture, tag))',
+    'CREATE INDEX IF NOT EXISTS p2t_tag ON picture2tag (tag, picture)',
+    'CREATE INDEX IF NOT EXISTS p2g_group ON picture2group ("group", picture)',
+    'CREATE INDEX IF NOT EXISTS pictures_path_id ON pictures (path, id)',
+    'CREATE TABLE IF NOT EXISTS picdb_counts ('
+    'name TEXT PRIMARY KEY, count INTEGER NOT NULL)',
+]
+for _table in ('pictures', 'groups', 'tags'):
+    # Row counters maintained by triggers, initialized once.
+    _SCHEMA.extend([
+        'CREATE TRIGGER IF NOT EXISTS picdb_count_{0}_insert '
+        'AFTER INSERT ON {0} BEGIN UPDATE picdb_counts '
+        "SET count = count + 1 WHERE name = '{0}'; END".format(_table),
+        'CREATE TRIGGER IF NOT EXISTS picdb_count_{0}_delete '
+        'AFTER DELETE ON {0} BEGIN UPDATE picdb_counts '
+        "SET count = count - 1 WHERE name = '{0}'; END".format(_table),
+        "INSERT OR IGNORE INTO picdb_counts SELECT '{0}', count(*) "
+        'FROM {0}'.format(_table)])
+
+_CAST = re.compile(r'::\w+(\[\])?')
+_UNNEST = re.compile(r'unnest\(\$(\d+), \$(\d+)\)'
+                     r'(?: AS (\w+)\(([\w"]+), ([\w"]+)\))?')
+_ANY = re.compile(r'\s*=\s*ANY\(\$(\d+)\)')
+_CARDINALITY = re.compile(r'cardinality\(\$(\d+)\)')
+_LIMIT = re.compile(r'LIMIT \$(\d+)')
+_ILIKE = re.compile(r'ILIKE (\$\d+)')
+_PARAMETER = re.compile(r'\$(\d+)')
+_WORDS_MATCH = re.compile(r'(to_tsvector\(.+?\)) @@ (plainto_tsquery\(.+?\))')
+_WORD = re.compile(r'\w+')
+
+
+def _words(config, text):
+    """Split text into lower case words like the simple text search
+    configuration of PostgreSQL.
+
+    :param config: text search configuration, ignored
+    :param text: text to split, may be None
+    :return: words separated by blanks
+    :rtype: str
+    """
+    return ' '.join(_WORD.findall((text or '').lower()))
+
+
+def _words_match(vector, query):
+    """Check whether text contains all words of the query.
+
+    :param vector: words of the text as provided by _words
+    :param query: words of the query as provided by _words
+    :rtype: bool
+    """
+    words = set(vector.split())
+    return all(word in words for word in query.split())
+
+
+def _words_rank(vector, query):
+    """Rank text by the share of its words found in the query.
+
+    :param vector: words of the text as provided by _words
+    :param query: words of the query as provided by _words
+    :rtype: float
+    """
+    words = vector.split()
+    if not words:
+        return 0.0
+    wanted = set(query.split())
+    return sum(word in wanted for word in words) / len(words)
+
+
+def _unnest(match):
+    """Provide pairs of two arrays as subquery."""
+    alias = match.group(3) or 'unnest'
+    first = match.group(4) or 'unnest_1'
+    second = match.group(5) or 'unnest_2'
+    return '(SELECT a.value AS {}, b.value AS {} ' \
+           'FROM json_each(${}) AS a JOIN json_each(${}) AS b ' \
+           'ON a.key=b.key) AS {}'.format(first, second, match.group(1),
+                                          match.group(2), alias)
+
+
+@functools.lru_cache(maxsize=1000)
+def translate(sql):
+    """Translate SQL for PostgreSQL to SQLite.
+
+    Covers the constructs used by Persistence only.
+
+    :param sql: statement for PostgreSQL
+    :type sql: str
+    :return: statement for SQLite
+    :rtype: str
+    """
+    sql = _CAST.sub('', sql)
+    sql = _UNNEST.sub(_unnest, sql)
+    sql = _ANY.sub(r' IN (SELECT value FROM json_each($\1))', sql)
+    sql = _CARDINALITY.sub(r'json_array_length($\1)', sql)
+    sql = _LIMIT.sub(r'LIMIT coalesce($\1, -1)', sql)
+    sql = _ILIKE.sub(r"LIKE \1 ESCAPE '\\'", sql)
+    sql = _WORDS_MATCH.sub(r'ts_match(\1, \2)', sql)
+    if 'ON CONFLICT' in sql and sql.startswith('INSERT') and \
+            ' WHERE ' not in sql:
+        # Resolves ambiguity of ON after INSERT ... SELECT.
+        sql = sql.replace(' ON CONFLICT', ' WHERE true ON CONFLICT')
+    return _PARAMETER.sub(r'?\1', sql)
+
+
+class UniqueError(sqlite3.IntegrityError):
+    """A unique or primary key constraint was violated."""
+    pass
+
+
+def _is_unique_violation(exc):
+    """Check whether an integrity error violates a unique constraint.
+
+    :rtype: bool
+    """
+    name = getattr(exc, 'sqlite_errorname', None)
+    if name is not None:
+        return name in ('SQLITE_CONSTRAINT_UNIQUE',
+                        'SQLITE_CONSTRAINT_PRIMARYKEY')
+    return str(exc).startswith('UNIQUE constraint failed')
+
+
+def _is_read(sql):
+    """Check whether sql only reads."""
+    return sql.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+def _adapt(value):
+    """Pass arrays as JSON."""
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return json.dumps(list(value))
+    return value
+
+
+class Cursor:
+    """Rows of a statement read in chunks."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def read(self, quantity):
+        """Read up to quantity rows.
+
+        :rtype: list
+        """
+        return self._cursor.fetchmany(quantity)
+
+    def close(self):
+        """Release cursor."""
+        self._cursor.close()
+
+
+class Statement:
+    """A statement of a connection."""
+
+    def __init__(self, conn, sql):
+        self.conn = conn
+        self.sql = translate(sql)
+        self._read = _is_read(sql)
+
+    def _execute(self, args):
+        if not self._read:
+            self.conn.begin()
+        try:
+            return self.conn.sqlite.execute(self.sql,
+                                            [_adapt(arg) for arg in args])
+        except sqlite3.IntegrityError as exc:
+            if _is_unique_violation(exc):
+                raise UniqueError(*exc.args) from exc
+            raise
+
+    def __call__(self, *args):
+        """Execute statement.
+
+        :return: rows of result.
+        :rtype: list
+        """
+        cursor = self._execute(args)
+        if cursor.description is None:
+            return []
+        return cursor.fetchall()
+
+    def first(self, *args):
+        """Execute statement and provide first row.
+
+        :return: value of single column, row or number of rows changed.
+        """
+        cursor = self._execute(args)
+        if cursor.description is None:
+            return cursor.rowcount
+        row = cursor.fetchone()
+        if row is not None and len(cursor.description) == 1:
+            return row[0]
+        return row
+
+    def declare(self, *args):
+        """Execute statement for reading rows in chunks.
+
+        :rtype: Cursor
+        """
+        return Cursor(self._execute(args))
+
+
+class Savepoint:
+    """Nested transaction."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.name = None
+
+    def start(self):
+        """Start nested transaction."""
+        self.conn.begin()
+        self.name = self.conn.next_savepoint()
+        self.conn.sqlite.execute('SAVEPOINT ' + self.name)
+
+    def commit(self):
+        """Keep changes of nested transaction."""
+        self.conn.sqlite.execute('RELEASE ' + self.name)
+
+    def rollback(self):
+        """Undo changes of nested transaction."""
+        self.conn.sqlite.execute('ROLLBACK TO ' + self.name)
+        self.conn.sqlite.execute('RELEASE ' + self.name)
+
+
+class Connection:
+    """Connection to a SQLite database file.
+
+    Reads outside of a transaction see the latest committed state, like
+    the read committed isolation of PostgreSQL. Writes start a
+    transaction, which lasts until commit() or rollback().
+    """
+
+    backend_id = None
+
+    def __init__(self, path, timeout=30.0):
+        """Open connection.
+
+        :param path: database file
+        :type path: str
+        :param timeout: seconds to wait for a lock held by another writer
+        :type timeout: float
+        """
+        # Transactions are handled explicitly. The pool hands connections
+        # to one thread at a time.
+        self.sqlite = sqlite3.connect(path, timeout=timeout,
+                                      isolation_level=None,
+                                      check_same_thread=False)
+        self.sqlite.execute('PRAGMA journal_mode=WAL')
+        self.sqlite.execute('PRAGMA foreign_keys=ON')
+        # Full text search of PostgreSQL by scanning the rows.
+        for name, nargs, function in (('to_tsvector', 2, _words),
+                                      ('plainto_tsquery', 2, _words),
+                                      ('ts_match', 2, _words_match),
+                                      ('ts_rank', 2, _words_rank)):
+            self.sqlite.create_function(name, nargs, function,
+                                        deterministic=True)
+        self.closed = False
+        self._savepoints = 0
+
+    def begin(self):
+        """Start transaction unless one is open."""
+        if not self.sqlite.in_transaction:
+            self.sqlite.execute('BEGIN IMMEDIATE')
+
+    def next_savepoint(self):
+        """Provide unique name of savepoint.
+
+        :rtype: str
+        """
+        self._savepoints += 1
+        return 'sp{}'.format(self._savepoints)
+
+    def prepare(self, sql):
+        """Prepare statement given in PostgreSQL syntax.
+
+        :rtype: Statement
+        """
+        return Statement(self, sql)
+
+    def execute(self, sql):
+        """Execute statement without parameters."""
+        self.prepare(sql)()
+
+    def xact(self):
+        """Provide nested transaction.
+
+        :rtype: Savepoint
+        """
+        return Savepoint(self)
+
+    def commit(self):
+        """Commit open transaction."""
+        if self.sqlite.in_transaction:
+            self.sqlite.execute('COMMIT')
+
+    def rollback(self):
+        """Roll back open transaction."""
+        if self.sqlite.in_transaction:
+            self.sqlite.execute('ROLLBACK')
+
+    def close(self):
+        """Close connection."""
+        self.sqlite.close()
+        self.closed = True
+
+
+class SQLiteBackend(Backend):
+    """Backend storing data in a SQLite database file.
+
+    The name of the database parameters is the path of the file.
+    """
+
+    name = 'sqlite'
+    Error = sqlite3.Error
+    UniqueError = UniqueError
+    UndefinedTableError = sqlite3.OperationalError
+
+    def connect(self):
+        """Open a new connection to the database file.
+
+        :rtype: Connection
+        """
+        return Connection(self.db_params.name)
+
+    def migrate(self, conn, target=None):
+        """Create tables and indexes missing.
+
+        The schema is created as a whole, there are no versions.
+
+        :param conn: database connection
+        :param target: ignored
+        :return: no migrations
+        :rtype: list
+        """
+        for stmt in _SCHEMA:
+            conn.execute(stmt)
+        conn.commit()
+        return []
+
+
+BACKEND = SQLiteBackend
@@ -0,0 +1,110 @@
+# coding=utf-8
+"""
+Numbers of pictures, groups and tags collected in the background.
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import logging
+import threading
+
+from .persistence import get_db
+
+
+class StatisticsCollector(threading.Thread):
+    """Refresh counts of entities periodically on a thread of its own.
+
+    The UI reads the latest counts without touching the database and
+    updates its display only if the generation changed.
+    """
+
+    def __init__(self, interval=5.0, count=None):
+        """Initialize collector.
+
+        :param interval: seconds between refreshes.
+        :type interval: float
+        :param count: provides counts by table name, with argument exact.
+            Defaults to counts of the current database.
+        """
+        super().__init__(name='picdb-statistics', daemon=True)
+        self.logger = logging.getLogger('picdb.db')
+        self.interval = interval
+        self._count = count if count is not None else \
+            (lambda exact: get_db().retrieve_counts(exact))
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._generation = 0
+        self._exact_requested = False
+        self._wakeup = threading.Event()
+        self._stop_requested = threading.Event()
+
+    @property
+    def counts(self):
+        """Latest counts by table name.
+
+        :rtype: dict(str, int)
+        """
+        with self._lock:
+            return dict(self._counts)
+
+    @property
+    def generation(self):
+        """Number of changes of the counts.
+
+        :rtype: int
+        """
+        return self._generation
+
+    def request_exact(self):
+        """Count rows of tables on next refresh, which is done at once."""
+        self._exact_requested = True
+        self._wakeup.set()
+
+    def stop(self):
+        """Request collector to stop."""
+        self._stop_requested.set()
+        self._wakeup.set()
+
+    def refresh(self):
+        """Retrieve counts and publish them if they changed."""
+        exact = self._exact_requested
+        self._exact_requested = False
+        counts = self._count(exact)
+        with self._lock:
+            if counts != self._counts:
+                self._counts = counts
+                self._generation += 1
+
+    def run(self):
+        """Refresh until stop is requested."""
+        while not self._stop_requested.is_set():
+            try:
+                self.refresh()
+            except Exception as exc:  # noqa
+                self.logger.warning('statistics refresh failed: %s', exc)
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
@@ -75,6 +75,17 @@ def retrieve_tag_by_key(key):
     return tag
 
 
+def retrieve_tags_by_keys(keys):
+    """Retrieve tags by given keys."""
+    database = get_db()
+    tags = database.retrieve_tags_by_keys(keys)
+    unknown = set(keys).difference(tag.key for tag in tags)
+    if unknown:
+        raise UnknownEntityException(
+            'Tags with keys {} are unknown.'.format(sorted(unknown)))
+    return tags
+
+
 def retrieve_tag_by_name(name):
     """Retrieve tag by given name."""
     database = get_db()
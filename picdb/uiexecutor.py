@@ -0,0 +1,211 @@
+# coding=utf-8
+"""
+Execution of service calls in the background for the Tk UI.
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import concurrent.futures
+import logging
+from tkinter import ttk
+
+# Number of worker threads shared by all executors.
+WORKERS = 4
+
+_workers = None
+
+
+def _worker_pool():
+    """Provide the thread pool shared by all executors.
+
+    :rtype: concurrent.futures.ThreadPoolExecutor
+    """
+    global _workers  # pylint: disable=W0603
+    if _workers is None:
+        _workers = concurrent.futures.ThreadPoolExecutor(
+            max_workers=WORKERS, thread_name_prefix='picdb-ui-worker')
+    return _workers
+
+
+class TkExecutor:
+    """Run service calls on worker threads and deliver their results on
+    the Tk thread.
+
+    Widgets must only be touched by the Tk thread, so finished requests
+    are picked up by polling with after(). A request supersedes the
+    pending request of the same key: the latter is cancelled if it did
+    not start yet, its result is dropped otherwise. A superseded request
+    already running is not interrupted, it keeps its worker thread, its
+    query and its pooled connection until it finishes.
+    """
+
+    def __init__(self, schedule, busy_changed=None, poll_interval=50,
+                 pool=None):
+        """Initialize executor.
+
+        :param schedule: schedules a callback on the Tk thread after
+            some milliseconds, usually after() of a widget.
+        :type schedule: f(int, callable)
+        :param busy_changed: called with True when requests become
+            pending and with False when all of them are done.
+        :type busy_changed: f(bool)
+        :param poll_interval: milliseconds between polls.
+        :type poll_interval: int
+        :param pool: executes the requests. Defaults to a pool shared by
+            all executors.
+        :type pool: concurrent.futures.Executor
+        """
+        self.logger = logging.getLogger('picdb.ui')
+        self._schedule = schedule
+        self._busy_changed = busy_changed
+        self.poll_interval = poll_interval
+        self._pool = pool
+        self._pending = {}
+        self._polling = False
+        self._busy = False
+
+    @property
+    def busy(self):
+        """True if requests are pending.
+
+        :rtype: bool
+        """
+        return bool(self._pending)
+
+    def submit(self, key, func, on_done, on_error=None):
+        """Call func on a worker thread and on_done with its result on the
+        Tk thread.
+
+        :param key: identifies the request. A pending request of the same
+            key is superseded.
+        :type key: str
+        :param func: function to call without arguments. It must not
+            touch any widget.
+        :type func: callable
+        :param on_done: called with the result of func.
+        :type on_done: f(object)
+        :param on_error: called with the exception raised by func.
+            Exceptions are logged if not given.
+        :type on_error: f(Exception)
+        :return: future of the request.
+        :rtype: concurrent.futures.Future
+        """
+        self._cancel(key)
+        pool = self._pool if self._pool is not None else _worker_pool()
+        future = pool.submit(func)
+        self._pending[key] = (future, on_done, on_error)
+        if not self._polling:
+            self._polling = True
+            self._schedule(self.poll_interval, self._poll)
+        self._update_busy()
+        return future
+
+    def cancel(self, key=None):
+        """Cancel pending request of given key.
+
+        :param key: key of the request. All pending requests are cancelled
+            if None.
+        :type key: str
+        """
+        keys = list(self._pending) if key is None else [key]
+        for key_ in keys:
+            self._cancel(key_)
+        self._update_busy()
+
+    def _cancel(self, key):
+        """Cancel pending request of given key, if any."""
+        request = self._pending.pop(key, None)
+        if request is not None:
+            self.logger.debug('request %s cancelled', key)
+            request[0].cancel()
+
+    def _poll(self):
+        """Deliver results of finished requests."""
+        try:
+            for key, request in list(self._pending.items()):
+                # A callback may have superseded the request meanwhile.
+                if self._pending.get(key) is request and request[0].done():
+                    del self._pending[key]
+                    self._deliver(key, *request)
+        finally:
+            if self._pending:
+                self._schedule(self.poll_interval, self._poll)
+            else:
+                self._polling = False
+            self._update_busy()
+
+    def _deliver(self, key, future, on_done, on_error):
+        """Hand result of a finished request to its callback.
+
+        Exceptions raised by callbacks are logged, they must not stop
+        polling.
+        """
+        exc = future.exception()
+        try:
+            if exc is None:
+                on_done(future.result())
+            elif on_error is not None:
+                on_error(exc)
+            else:
+                self.logger.error('request %s failed: %s', key, exc)
+        except Exception:  # noqa
+            self.logger.exception('callback of request %s failed', key)
+
+    def _update_busy(self):
+        """Inform listener if executor became busy or idle."""
+        if self.busy != self._busy:
+            self._busy = self.busy
+            if self._busy_changed is not None:
+                self._busy_changed(self._busy)
+
+
+class BusyIndicator(ttk.Progressbar):
+    """Indeterminate progress bar, visible only while busy.
+
+    Grid the indicator once to place it; it is hidden at first.
+    """
+
+    def __init__(self, master, **kwargs):
+        super().__init__(master, mode='indeterminate', **kwargs)
+
+    def grid(self, cnf=None, **kwargs):  # pylint: disable=W0221
+        """Place indicator into grid, hidden until busy."""
+        super().grid(cnf or {}, **kwargs)
+        self.grid_remove()
+
+    def show(self, busy):
+        """Show and animate indicator if busy, hide it otherwise.
+
+        :param busy: True if requests are pending.
+        :type busy: bool
+        """
+        if busy:
+            super().grid()
+            self.start()
+        else:
+            self.stop()
+            self.grid_remove()
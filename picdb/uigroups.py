@@ -29,6 +29,7 @@ Series management.
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import functools
 import logging
 import tkinter as tk
 from tkinter import messagebox
@@ -36,7 +37,7 @@ from tkinter import ttk
 
 from .groupservices import retrieve_groups_by_name, delete_group, \
     retrieve_groups_by_name_segment, retrieve_group_by_key, get_all_groups, \
-    save_group as save_group_, create_group
+    save_group as save_group_, create_group, retrieve_groups_by_keys
 from .persistence import UnknownEntityException
 from .selector import Selector
 from .uicommon import tag_all_children
@@ -201,18 +202,18 @@ class GroupFilteredTreeView(FilteredTreeView):
         """
         return self.tree.selected_items()
 
-    def _retrieve_items(self):
-        """Retrieve a bunch of groups from database.
+    def _items_query(self):
+        """Provide a function retrieving a bunch of groups from database.
 
         name_filter_var and limit_var are considered for retrieval.
 
-        :return: groups as selected by filter criteria.
-        :rtype: [Group]
+        :return: function returning groups as selected by filter criteria.
+        :rtype: f() -> [Group]
         """
         name_filter = self.name_filter_var.get()
         limit = self.limit_var.get()
-        groups = retrieve_groups_by_name_segment(name_filter, limit)
-        return groups
+        return functools.partial(retrieve_groups_by_name_segment,
+                                 name_filter, limit)
 
 
 class GroupTree(HierarchicalTreeView):
@@ -246,8 +247,8 @@ class GroupTree(HierarchicalTreeView):
         :rtype: [Group]
         """
         item_ids = self.selection()
-        groups = [retrieve_group_by_key(int(item_id))
-                  for item_id in item_ids]
+        groups = retrieve_groups_by_keys([int(item_id)
+                                          for item_id in item_ids])
         return groups
 
     def _is_less(self, item, key):
@@ -361,22 +362,18 @@ class GroupSelector(Selector):
                          GroupTree.create_instance,
                          **kwargs)
 
-    def selected_items(self):
-        """Get selected groups.
+    def _retrieve_all(self):
+        """Retrieve all groups.
 
-        :return: selected groups
         :rtype: [Group]
         """
-        items = self.right.get_all_items()
-        groups = [retrieve_group_by_key(int(item))
-                  for item in items]
-        return groups
+        return get_all_groups()
 
-    def load_items(self, picture_groups):  # pylint: disable=W0221
-        """Load items into selector.
+    def _retrieve_by_keys(self, keys):
+        """Retrieve groups by given keys.
 
-        :param picture_groups: list of groups already assigned to picture.
-        :type picture_groups: [Group]
+        :param keys: keys of groups.
+        :type keys: [int]
+        :rtype: [Group]
         """
-        groups = get_all_groups()
-        self.init_trees(groups, picture_groups)
+        return retrieve_groups_by_keys(keys)
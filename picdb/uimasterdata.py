@@ -36,6 +36,7 @@ from tkinter import messagebox
 from tkinter import ttk
 
 from .uicommon import Observable
+from .uiexecutor import TkExecutor, BusyIndicator
 
 
 class PicTreeView(ttk.Treeview, Observable):
@@ -315,8 +316,12 @@ class FilteredTreeView(ttk.Frame, Observable):
         self.tree_factory = tree_factory
         self.limit_default = 1000
         self.limit_entry = None
+        self.progress = None
         self._create_widgets()
+        self._create_progress()
+        self.executor = TkExecutor(self.after, self.progress.show)
         self.tree.bind('<<TreeviewSelect>>', self._item_selected)
+        self.bind('<Destroy>', lambda _: self.executor.cancel())
         self.tree.bind(self.tree.EVT_ITEM_DELETED, self._item_deleted)
 
     def _create_widgets(self):
@@ -334,6 +339,13 @@ class FilteredTreeView(ttk.Frame, Observable):
         """Provide a frame for selection of filter criteria."""
         raise NotImplementedError('Please override this method.')
 
+    def _create_progress(self):
+        """Place progress indicator below all other widgets."""
+        columns, rows = self.grid_size()
+        self.progress = BusyIndicator(self)
+        self.progress.grid(row=rows, column=0, columnspan=columns,
+                           sticky=(tk.W, tk.E))
+
     def selected_items(self):
         """Provide list of items selected in tree.
 
@@ -355,18 +367,32 @@ class FilteredTreeView(ttk.Frame, Observable):
         Observable.bind(self, sequence, func, add)
 
     def load_items(self):
-        """Load a bunch of items from database."""
+        """Load a bunch of items from database.
+
+        Items are retrieved in the background, superseding a load still
+        pending.
+        """
+        self.executor.submit('items', self._items_query(), self._show_items)
+
+    def _show_items(self, items):
+        """Replace items in tree view.
+
+        :param items: items to display.
+        :type items: list[Entity]
+        """
         self.tree.clear()
-        items = self._retrieve_items()
         # reverse sort items to speed up insertion into tree
         for item in reversed(sorted(items)):
             self.tree.add_item(item)
 
-    def _retrieve_items(self):
-        """Retrieve items to load into tree view.
+    def _items_query(self):
+        """Provide a function retrieving items to load into tree view.
+
+        Filter criteria are read from the widgets here. The function is
+        called on a worker thread and must not touch any widget.
 
-        :return: select items
-        :rtype: list[Entity]
+        :return: function returning selected items
+        :rtype: f() -> list[Entity]
         """
         raise NotImplementedError('Please override this method.')
 
@@ -38,11 +38,15 @@ import webbrowser
 from PIL import Image, ImageTk
 
 from .commons import get_resource_path
-from .groupservices import retrieve_groups_for_picture, save_group
+from .filterquery import SEARCH_MODES, PATTERN, WORDS
+from .groupservices import retrieve_groups_for_picture, save_group, \
+    add_pictures_to_groups, retrieve_groups_by_keys
 from .persistence import DuplicateException
 from .picture import Picture
 from .pictureservices import save_picture, retrieve_picture_by_path, \
-    retrieve_filtered_pictures, retrieve_picture_by_key, delete_picture
+    retrieve_filtered_pictures, retrieve_picture_by_key, delete_picture, \
+    retrieve_pictures_by_keys, add_tags_to_pictures, transaction
+from .tagservices import retrieve_tags_by_keys
 from .uicommon import tag_all_children, Observable
 from .uigroups import GroupSelector
 from .uimasterdata import PicTreeView, FilteredTreeView
@@ -121,22 +125,30 @@ class PictureManagement(ttk.Frame):
         load_button = ttk.Button(self.control_frame, text='load pictures',
                                  command=self.load_pictures)
         load_button.grid(row=0, column=0, sticky=(tk.W, tk.N))
+        next_button = ttk.Button(self.control_frame, text='next pictures',
+                                 command=self.load_next_pictures)
+        next_button.grid(row=0, column=1, sticky=(tk.W, tk.N))
         add_button = ttk.Button(self.control_frame, text='add picture',
                                 command=self.add_picture)
-        add_button.grid(row=0, column=1, sticky=(tk.W, tk.N))
+        add_button.grid(row=0, column=2, sticky=(tk.W, tk.N))
         import_button = ttk.Button(self.control_frame, text='import pictures',
                                    command=self.import_pictures)
-        import_button.grid(row=0, column=2, sticky=(tk.W, tk.N))
+        import_button.grid(row=0, column=3, sticky=(tk.W, tk.N))
         rst_text = 'reset selection [CMD-R]'
         clear_button = ttk.Button(self.control_frame, text=rst_text,
                                   command=self._reset)
-        clear_button.grid(row=0, column=3, sticky=(tk.W, tk.N))
+        clear_button.grid(row=0, column=4, sticky=(tk.W, tk.N))
 
     def load_pictures(self):
         """Load a bunch of pictures from database."""
         self.clear()
         self.filter_tree.load_items()
 
+    def load_next_pictures(self):
+        """Load the next page of pictures from database."""
+        self.clear()
+        self.filter_tree.load_next_page()
+
     def add_picture(self):
         """Push empty picture to editor."""
         self.clear()
@@ -246,8 +258,12 @@ class PictureFilteredTreeView(FilteredTreeView):
         self.logger = logging.getLogger('picdb.ui')
         self.path_filter_var = tk.StringVar()
         self.limit_var = tk.IntVar()
+        self.descendants_var = tk.BooleanVar()
+        self.search_var = tk.StringVar()
         self.tag_selector = None
         self.group_selector = None
+        # (path, id) of the last picture on the current page
+        self.page_end = None
         super().__init__(master, PictureReferenceTree.create_instance)
         self._set_default_path_filter()
         self.path_filter_entry = None
@@ -282,6 +298,8 @@ class PictureFilteredTreeView(FilteredTreeView):
         self.filter_frame = ttk.Frame(self)
         self.filter_frame.rowconfigure(0, weight=1)
         self.filter_frame.rowconfigure(1, weight=1)
+        self.filter_frame.rowconfigure(2, weight=1)
+        self.filter_frame.rowconfigure(3, weight=1)
         self.filter_frame.columnconfigure(0, weight=0)
         self.filter_frame.columnconfigure(1, weight=1)
         lbl_filter = ttk.Label(self.filter_frame, text='Filter on path')
@@ -297,9 +315,21 @@ class PictureFilteredTreeView(FilteredTreeView):
                                      validate='focusout',
                                      validatecommand=self._validate_limit)
         self.limit_entry.grid(row=1, column=1, sticky=(tk.W,))
+        descendants_check = ttk.Checkbutton(
+            self.filter_frame, text='Include sub-groups and sub-tags',
+            variable=self.descendants_var)
+        descendants_check.grid(row=2, column=1, sticky=(tk.W,))
+        lbl_search = ttk.Label(self.filter_frame, text='Search path as')
+        lbl_search.grid(row=3, column=0, sticky=tk.E)
+        search_box = ttk.Combobox(self.filter_frame,
+                                  textvariable=self.search_var,
+                                  values=SEARCH_MODES, state='readonly',
+                                  width=10)
+        search_box.grid(row=3, column=1, sticky=(tk.W,))
 
     def _set_default_path_filter(self):
         self.path_filter_var.set('%')
+        self.search_var.set(PATTERN)
 
     def selected_items(self):
         """Provide list of pictures selected in tree.
@@ -309,30 +339,91 @@ class PictureFilteredTreeView(FilteredTreeView):
         """
         return self.tree.selected_items()
 
-    def _retrieve_items(self):
-        """Retrieve a bunch of pictures from database.
+    def load_items(self):
+        """Load the first page of pictures from database."""
+        self.page_end = None
+        search = self.search_var.get()
+        self.executor.submit(
+            'items', self._items_query(),
+            lambda pics: self._show_page(pics, None, search))
+
+    def load_next_page(self):
+        """Load the page of pictures following the current one.
 
-        name_filter_var and limit_var are considered for retrieval.
+        The tree keeps the current page if there are no more pictures.
+        Pictures found by words are ranked and not paged, so the first
+        page is loaded again.
+        """
+        if self.page_end is None:
+            self.load_items()
+            return
+        page_end = self.page_end
+        search = self.search_var.get()
+        self.executor.submit(
+            'items', self._items_query(page_end),
+            lambda pics: self._show_page(pics, page_end, search))
+
+    def _items_query(self, after=None):
+        """Provide a function retrieving a page of pictures from database.
+
+        name_filter_var, limit_var and the items selected in the group
+        and tag selectors are considered for retrieval. The page starts
+        behind after.
+
+        :param after: (path, id) of the last picture of the previous page.
+        :type after: (str, int)
+        :return: function returning pictures as selected by filter criteria.
+        :rtype: f() -> [Picture]
         """
         name_filter = self.path_filter_var.get()
         limit = self.limit_var.get()
-        groups = self.group_selector.selected_items()
-        tags = self.tag_selector.selected_items()
-        pics = retrieve_filtered_pictures(name_filter, limit, groups, tags)
-        return pics
+        group_keys = self.group_selector.selected_keys()
+        tag_keys = self.tag_selector.selected_keys()
+        include_descendants = self.descendants_var.get()
+        search = self.search_var.get()
+        if search == WORDS:
+            after = None
+
+        def retrieve():
+            groups = retrieve_groups_by_keys(group_keys)
+            tags = retrieve_tags_by_keys(tag_keys)
+            return retrieve_filtered_pictures(name_filter, limit, groups,
+                                              tags, after,
+                                              include_descendants, search)
+        return retrieve
+
+    def _show_page(self, pics, after, search):
+        """Display a page of pictures and move page_end to its last picture.
+
+        :param pics: pictures retrieved.
+        :type pics: [Picture]
+        :param after: (path, id) of the last picture of the previous page.
+        :type after: (str, int)
+        :param search: search mode the pictures were retrieved with.
+        :type search: str
+        """
+        if not pics and after is not None and search != WORDS:
+            self.logger.info('No more pictures behind %s', repr(after))
+            return
+        self._show_items(pics)
+        if pics and search != WORDS:
+            self.page_end = (pics[-1].path, pics[-1].key)
 
     def _visibility_changed(self, event):
         """Listener is called if visibility of widget changes."""
         self.logger.info(
             'Visibility of PictureFilteredTreeView frame changed: %s',
             str(event.state))
-        self.tag_selector.load_items(self.tag_selector.selected_items())
-        self.group_selector.load_items(self.group_selector.selected_items())
+        self.tag_selector.reload_items()
+        self.group_selector.reload_items()
 
     def clear_selection(self):
         """Clear current selection and reset filters to default."""
         self._set_default_path_filter()
         self.limit_var.set(self.limit_default)
+        self.descendants_var.set(False)
+        self.executor.cancel('items')
+        self.page_end = None
         self.tag_selector.load_items([])
         self.group_selector.load_items([])
         self.tree.clear()
@@ -372,8 +463,7 @@ class PictureReferenceTree(PicTreeView):
         :rtype: list(Picture)
         """
         item_ids = self.selection()
-        pics = [retrieve_picture_by_key(int(pic_id))
-                for pic_id in item_ids]
+        pics = retrieve_pictures_by_keys([int(pic_id) for pic_id in item_ids])
         return pics
 
     def _is_less(self, item, key):
@@ -391,11 +481,7 @@ class PictureReferenceTree(PicTreeView):
         :type items: [Picture]
         """
         for pic in items:
-            groups = retrieve_groups_for_picture(pic)
-            for group_ in groups:
-                group_.remove_picture(pic)
-                save_group(group_)
-                delete_picture(pic)
+            delete_picture(pic)
 
     def _show_selected_pic_in_external_viewer(self):
         """Show selected pictures in external viewer."""
@@ -559,24 +645,26 @@ class PictureMetadataEditor(ttk.Frame, Observable):
         if self.is_mass_assignment():
             tags = self.tag_selector.selected_items()
             groups = self.grp_selector.selected_items()
-            for pic in self.picture_set:
-                for tag in tags:
-                    pic.assign_tag(tag)
-                for group_ in groups:
-                    group_.assign_picture(pic)
-                save_picture(pic)
-            for group_ in groups:
-                save_group(group_)
+            with transaction():
+                add_tags_to_pictures(self.picture_set, tags)
+                add_pictures_to_groups(self.picture_set, groups)
         else:
             self.picture = self.editor.picture
-            if self.picture.key is None:
-                path = self.picture.path
-                save_picture(self.picture)
-                self.picture = retrieve_picture_by_path(path)
-            tags = self.tag_selector.selected_items()
-            self.picture.tags = tags
-            save_picture(self.picture)
-            self._update_groups()
+            try:
+                with transaction():
+                    if self.picture.key is None:
+                        path = self.picture.path
+                        save_picture(self.picture)
+                        self.picture = retrieve_picture_by_path(path)
+                    tags = self.tag_selector.selected_items()
+                    self.picture.tags = tags
+                    save_picture(self.picture)
+                    self._update_groups()
+            except DuplicateException as exc:
+                messagebox.showerror(
+                    title='Database Error',
+                    message='Duplicate picture: {}'.format(exc.duplicate))
+                return
             self.editor.picture = self.picture
             self._call_listeners(self.EVT_ITEM_SAVED, None)
 
@@ -38,10 +38,9 @@ from pkgutil import get_data
 
 import psutil
 
-from .groupservices import number_of_groups
+from .config import get_configuration
 from .persistence import db_params, _TAG_CACHE, _PICTURE_CACHE, _GROUP_CACHE
-from .pictureservices import number_of_pictures
-from .tagservices import number_of_tags
+from .statistics import StatisticsCollector
 
 
 class StatusPanel(ttk.Frame):
@@ -59,6 +58,12 @@ class StatusPanel(ttk.Frame):
         self.cache_stats_tag_var = tk.StringVar()
         self.cache_stats_picture_var = tk.StringVar()
         self.cache_stats_group_var = tk.StringVar()
+        # Counts are retrieved in background, the panel only shows them.
+        self.statistics = StatisticsCollector(
+            get_configuration('ui.statistics_interval', 5))
+        self.statistics_generation = None
+        self.statistics.start()
+        self.bind('<Destroy>', lambda _: self.statistics.stop())
         self.create_widgets()
         self.report_usage()
         self.show_db()
@@ -81,15 +86,13 @@ class StatusPanel(ttk.Frame):
         image = ttk.Label(self, image=photo)
         image.photo = photo
         image.grid(row=0, column=0, rowspan=3, sticky=(tk.W, tk.N))
-        ttk.Label(self, textvariable=self.num_pics_var).grid(
-            row=0, column=1, sticky=(tk.W, tk.N)
-        )
-        ttk.Label(self, textvariable=self.num_groups_var).grid(
-            row=1, column=1, sticky=(tk.W, tk.N)
-        )
-        ttk.Label(self, textvariable=self.num_tags_var).grid(
-            row=2, column=1, sticky=(tk.W, tk.N)
-        )
+        for row, var in enumerate((self.num_pics_var, self.num_groups_var,
+                                   self.num_tags_var)):
+            label = ttk.Label(self, textvariable=var)
+            label.grid(row=row, column=1, sticky=(tk.W, tk.N))
+            # Click for exact counts.
+            label.bind('<Button-1>',
+                       lambda _: self.statistics.request_exact())
         ttk.Label(self, textvariable=self.database_var).grid(
             row=0, column=2, sticky=(tk.W, tk.N)
         )
@@ -100,7 +103,8 @@ class StatusPanel(ttk.Frame):
         ttk.Label(self, textvariable=self.memory_usage_var).grid(
             row=0, column=3, sticky=(tk.W, tk.N)
         )
-        ttk.Label(self, text="Cache stats (hits/misses), size").grid(
+        ttk.Label(self,
+                  text="Cache stats (hits/misses), size/alive, memory").grid(
             row=0, column=4, sticky=(tk.W, tk.N)
         )
         ttk.Label(self, textvariable=self.cache_stats_picture_var).grid(
@@ -143,18 +147,20 @@ class StatusPanel(ttk.Frame):
             self.database_var.set(info)
 
     def data_statistics(self):
-        """Show statistics about data."""
-        pics = "pictures: {}".format(number_of_pictures())
-        groups = "groups: {}".format(number_of_groups())
-        tags = "tags: {}".format(number_of_tags())
-        self.num_pics_var.set(pics)
-        self.num_groups_var.set(groups)
-        self.num_tags_var.set(tags)
-        self.after(5000, self.data_statistics)
+        """Show statistics about data if they changed."""
+        generation = self.statistics.generation
+        if generation != self.statistics_generation:
+            self.statistics_generation = generation
+            counts = self.statistics.counts
+            for name, var in (("pictures", self.num_pics_var),
+                              ("groups", self.num_groups_var),
+                              ("tags", self.num_tags_var)):
+                var.set("{}: {}".format(name, counts.get(name, "?")))
+        self.after(500, self.data_statistics)
 
     def cache_statistics(self):
         """Show cache statistics."""
-        templ = "{:s}: {:d} / {}, {}"
+        templ = "{:s}: {:d} / {}, {}/{}, {:.3f}MB"
         variabless = [
             self.cache_stats_tag_var,
             self.cache_stats_picture_var,
@@ -163,5 +169,7 @@ class StatusPanel(ttk.Frame):
         names = ["tag", "picture", "group"]
         caches = [_TAG_CACHE, _PICTURE_CACHE, _GROUP_CACHE]
         for name, var, cache in zip(names, variabless, caches):
-            var.set(templ.format(name, cache.hits, cache.misses, cache.size))
+            var.set(templ.format(name, cache.hits, cache.misses, cache.size,
+                                 cache.tracked,
+                                 cache.weight / (1024 * 1024)))
         self.after(1000, self.cache_statistics)
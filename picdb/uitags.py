@@ -29,6 +29,7 @@ Tak management.
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS
 # IN THE SOFTWARE.
 
+import functools
 import logging
 import tkinter as tk
 from tkinter import ttk
@@ -36,12 +37,12 @@ from tkinter import messagebox
 
 from .tag import Tag
 from .tagservices import retrieve_tag_by_name, retrieve_tags_by_name_segment, \
-    retrieve_tag_by_key, get_all_tags, delete_tag, save_tag as save_tag_
+    retrieve_tag_by_key, get_all_tags, delete_tag, save_tag as save_tag_, \
+    retrieve_tags_by_keys
 from .uimasterdata import HierarchicalTreeView, FilteredTreeView
 from .selector import Selector
 from .uicommon import tag_all_children
 from .persistence import UnknownEntityException
-from .pictureservices import retrieve_pictures_by_tag
 
 
 class TagManagement(ttk.Frame):
@@ -184,15 +185,15 @@ class TagFilteredTreeView(FilteredTreeView):
         """
         return self.tree.selected_items()
 
-    def _retrieve_items(self):
-        """Retrieve a bunch of tags from database.
+    def _items_query(self):
+        """Provide a function retrieving a bunch of tags from database.
 
         name_filter_var and limit_var are considered for retrieval.
         """
         name_filter = self.name_filter_var.get()
         limit = self.limit_var.get()
-        tags = retrieve_tags_by_name_segment(name_filter, limit)
-        return tags
+        return functools.partial(retrieve_tags_by_name_segment, name_filter,
+                                 limit)
 
 
 class TagTree(HierarchicalTreeView):
@@ -226,8 +227,7 @@ class TagTree(HierarchicalTreeView):
         :rtype: list(Tag)
         """
         item_ids = self.selection()
-        tags = [retrieve_tag_by_key(int(item_id))
-                for item_id in item_ids]
+        tags = retrieve_tags_by_keys([int(item_id) for item_id in item_ids])
         return tags
 
     def _is_less(self, item, key):
@@ -265,10 +265,6 @@ class TagTree(HierarchicalTreeView):
         :type items: [Tag]
         """
         for tag_ in items:
-            pics = retrieve_pictures_by_tag(tag_)
-            for pic in pics:
-                pic.remove_tag(tag_)
-                pic.save()
             delete_tag(tag_)
 
     def _unlink_from_parent(self):
@@ -343,21 +339,18 @@ class TagSelector(Selector):
         super().__init__(master, TagTree.create_instance,
                          TagTree.create_instance, **kwargs)
 
-    def selected_items(self):
-        """Get selected tags.
+    def _retrieve_all(self):
+        """Retrieve all tags.
 
-        :return: selected tags
         :rtype: [Tag]
         """
-        items = self.right.get_all_items()
-        tags = [retrieve_tag_by_key(int(item)) for item in items]
-        return tags
+        return get_all_tags()
 
-    def load_items(self, picture_tags):   # pylint: disable=W0221
-        """Load items into selector.
+    def _retrieve_by_keys(self, keys):
+        """Retrieve tags by given keys.
 
-        :param picture_tags: list of tags already assigned to picture.
-        :type picture_tags: [Tag]
+        :param keys: keys of tags.
+        :type keys: [int]
+        :rtype: [Tag]
         """
-        all_tags = get_all_tags()
-        self.init_trees(all_tags, picture_tags)
+        return retrieve_tags_by_keys(keys)
@@ -33,20 +33,22 @@ Note: Set PYTHONPATH to include picdb if picdb is not installed yet!
 # THE SOFTWARE.
 
 import sys
+from itertools import islice
 from pprint import pprint
 import argparse
 
-import picdb.group
-import picdb.picture
-import picdb.tag
-
 from picdb.picture import Picture
 from picdb.group import Group
 from picdb.tag import Tag
+from picdb import groupservices, pictureservices, tagservices
 from picdb.persistence import UnknownEntityException
 from picdb.config import get_configuration
 from picdb.app import create_db_by_arguments
 
+# Number of pictures read and assigned at once.
+CHUNK_SIZE = 1000
+
+
 def main(argv):
     args = _parse_arguments(argv)
     create_db_by_arguments(args)
@@ -55,27 +57,32 @@ def main(argv):
     try:
         groups = _get_groups(args.groups)
         tags = _get_tags(args.tag)
-        pics = get_pic_list(args.path)
-        if args.verbose:
-            print('Series: {}'.format(groups))
-            print('Tags: {}'.format(tags))
-            _show_selected_pictures(pics, args.verbose)
     except UnknownEntityException as e:
         print('>>> Error: {}'.format(e))
-    else:
+        return
+    if args.verbose:
+        print('Series: {}'.format(groups))
+        print('Tags: {}'.format(tags))
+    count = 0
+    for pics in _chunks(get_pic_list(args.path), CHUNK_SIZE):
+        count += len(pics)
+        if args.verbose:
+            _show_selected_pictures(pics, args.verbose)
         if not args.dry_run:
             add_assignments(pics, groups, tags)
-            print('{} pictures processed.'.format(len(pics)))
+    print('{} pictures processed.'.format(count))
 
 
 def add_assignments(pics: [Picture],
                     groups: [Group],
                     tags: [Tag]):
-    for pic in pics:
-        for g in groups:
-            if pic not in g.pictures: picdb.group.add_picture_to_group(g, pic)
-        for t in tags:
-            if t not in pic.tags: picdb.picture.add_tag_to_picture(pic, t)
+    """Assign all groups and tags to all pictures in one transaction.
+
+    Existing assignments are kept.
+    """
+    with pictureservices.transaction():
+        groupservices.add_pictures_to_groups(pics, groups)
+        pictureservices.add_tags_to_pictures(pics, tags)
 
 
 def get_pic_list(path: str):
@@ -83,10 +90,20 @@ def get_pic_list(path: str):
 
     :param path: path name of pictures with optional wildcards.
     :type path: [str]
-    :return: list of pictures
-    :rtype: [Picture]
+    :return: pictures streamed from database
+    :rtype: iterator of Picture
     """
-    return picdb.picture.retrieve_filtered_pictures(path, None, [], [])
+    return pictureservices.iter_filtered_pictures(path, [], [], CHUNK_SIZE)
+
+
+def _chunks(iterable, size):
+    """Split iterable into lists of given size."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
 
 def _get_groups(names: [str]):
@@ -99,8 +116,11 @@ def _get_groups(names: [str]):
     """
     groups_ = []
     for name in names:
-        groups = picdb.group.retrieve_series_by_name(name)
-        groups_.append(groups)
+        groups = groupservices.retrieve_groups_by_name(name)
+        if not groups:
+            raise UnknownEntityException(
+                'Group with name {} is unknown.'.format(name))
+        groups_.extend(groups)
     return groups_
 
 
@@ -114,7 +134,7 @@ def _get_tags(names: [str]):
     """
     tags = []
     for name in names:
-        tag = picdb.tag.retrieve_tag_by_name(name)
+        tag = tagservices.retrieve_tag_by_name(name)
         tags.append(tag)
     return tags
 
@@ -151,6 +171,12 @@ def _parse_arguments(args):
                         default=get_configuration('db_port'),
                         help='Port of database to use. Overrides '
                              'configuration file.')
+    parser.add_argument('--backend', action='store', dest='backend',
+                        default=get_configuration('db.backend', 'postgresql'),
+                        choices=('postgresql', 'sqlite'),
+                        help='Database engine. For sqlite --db is the path '
+                             'of the database file. Overrides '
+                             'configuration file.')
     parser.add_argument('-g', '--group', action='append', dest='groups',
                         default=[],
                         help='Name of group. Multiple use allowed.')
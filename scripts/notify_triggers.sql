@@ -0,0 +1,67 @@
+-- Change notification for cache invalidation.
+--
+-- Every change of pictures, tags, groups and their assignments sends a
+-- notification on channel picdb_changes. The payload is
+-- <table>:<id> of the entity whose cached state became stale:
+--
+--   pictures:<id>   picture row or its tag assignments changed
+--   tags:<id>       tag row changed
+--   groups:<id>     group row or its picture assignments changed
+--
+-- Running PicDB instances listen on this channel and evict the
+-- corresponding cache entries.
+--
+-- Each change also advances sequence picdb_change_seq. Its value serves
+-- as a cheap marker to validate cache snapshots against.
+
+CREATE SEQUENCE IF NOT EXISTS public.picdb_change_seq;
+
+CREATE OR REPLACE FUNCTION public.picdb_notify_change()
+  RETURNS trigger AS
+$BODY$
+DECLARE
+  rec RECORD;
+BEGIN
+  PERFORM nextval('public.picdb_change_seq');
+  IF TG_OP = 'DELETE' THEN
+    rec := OLD;
+  ELSE
+    rec := NEW;
+  END IF;
+  IF TG_TABLE_NAME = 'picture2tag' THEN
+    PERFORM pg_notify('picdb_changes', 'pictures:' || rec.picture);
+  ELSIF TG_TABLE_NAME = 'picture2group' THEN
+    PERFORM pg_notify('picdb_changes', 'groups:' || rec."group");
+  ELSE
+    PERFORM pg_notify('picdb_changes', TG_TABLE_NAME || ':' || rec.id);
+  END IF;
+  RETURN NULL;
+END;
+$BODY$
+  LANGUAGE plpgsql;
+
+
+DROP TRIGGER IF EXISTS pictures_notify ON public.pictures;
+CREATE TRIGGER pictures_notify
+  AFTER INSERT OR UPDATE OR DELETE ON public.pictures
+  FOR EACH ROW EXECUTE PROCEDURE public.picdb_notify_change();
+
+DROP TRIGGER IF EXISTS tags_notify ON public.tags;
+CREATE TRIGGER tags_notify
+  AFTER INSERT OR UPDATE OR DELETE ON public.tags
+  FOR EACH ROW EXECUTE PROCEDURE public.picdb_notify_change();
+
+DROP TRIGGER IF EXISTS groups_notify ON public.groups;
+CREATE TRIGGER groups_notify
+  AFTER INSERT OR UPDATE OR DELETE ON public.groups
+  FOR EACH ROW EXECUTE PROCEDURE public.picdb_notify_change();
+
+DROP TRIGGER IF EXISTS picture2tag_notify ON public.picture2tag;
+CREATE TRIGGER picture2tag_notify
+  AFTER INSERT OR UPDATE OR DELETE ON public.picture2tag
+  FOR EACH ROW EXECUTE PROCEDURE public.picdb_notify_change();
+
+DROP TRIGGER IF EXISTS picture2group_notify ON public.picture2group;
+CREATE TRIGGER picture2group_notify
+  AFTER INSERT OR UPDATE OR DELETE ON public.picture2group
+  FOR EACH ROW EXECUTE PROCEDURE public.picdb_notify_change();
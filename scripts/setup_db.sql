@@ -151,3 +151,7 @@ CREATE TABLE public.picture2tag
 );
 ALTER TABLE public.picture2tag
 OWNER TO sb;
+
+
+-- Indexes are created by the schema migrations of picdb/migrations.py,
+-- applied on start of PicDB or by: python -m picdb.migrations
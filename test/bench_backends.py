@@ -0,0 +1,110 @@
+# coding=utf-8
+"""Compare latency of typical operations on the database backends.
+
+Each backend gets a database filled with synthetic pictures and tags if
+it is empty. Caches are cleared before each operation, so every call
+reaches the database. A backend which cannot be connected is skipped.
+
+Run: python -m test.bench_backends [pictures] [operations]
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import random
+import sys
+import time
+
+from picdb.persistence import Persistence
+from picdb.picture import Picture
+from .testdb import db_parameters, populate
+
+BACKENDS = ['sqlite', 'postgresql']
+
+
+def _key_lookup(db, keys, tags):
+    db.retrieve_picture_by_key(random.choice(keys))
+
+
+def _filter_page(db, keys, tags):
+    db.retrieve_filtered_pictures('/bench/0%', 100, [],
+                                  [random.choice(tags)])
+
+
+def _substring(db, keys, tags):
+    db.retrieve_filtered_pictures('{:04d}'.format(random.randrange(10000)),
+                                  100, [], [], search='substring')
+
+
+def _add_and_delete(db, keys, tags):
+    path = '/bench/new/{}.jpg'.format(random.random())
+    db.add_picture(Picture(None, 'new', path, ''))
+    db.delete_picture(db.retrieve_picture_by_path(path))
+
+
+OPERATIONS = [('key lookup', _key_lookup),
+              ('filter page', _filter_page),
+              ('substring', _substring),
+              ('add and delete', _add_and_delete)]
+
+
+def bench(db, operation, count):
+    """Average time of operation in milliseconds."""
+    keys = [pic.key for pic in db.retrieve_filtered_pictures(
+        '/bench/%', 1000, [], [])]
+    tags = db.retrieve_all_tags()
+    start = time.perf_counter()
+    for _ in range(count):
+        db.clear_caches()
+        operation(db, keys, tags)
+    return (time.perf_counter() - start) * 1000 / count
+
+
+def main():
+    """Run benchmark and print results."""
+    pictures = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    print('{:>12s} {:>16s} {:>10s}'.format('backend', 'operation',
+                                           'time [ms]'))
+    for backend in BACKENDS:
+        try:
+            db = Persistence(db_parameters(backend))
+        except Exception as exc:  # noqa
+            print('{:>12s} skipped: {}'.format(backend,
+                                               str(exc).splitlines()[0]))
+            continue
+        try:
+            db.migrate()
+            populate(db, pictures)
+            for name, operation in OPERATIONS:
+                print('{:>12s} {:>16s} {:10.3f}'.format(
+                    backend, name, bench(db, operation, count)))
+        finally:
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
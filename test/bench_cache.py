@@ -0,0 +1,86 @@
+# coding=utf-8
+"""Micro benchmark for LRUCache.
+
+Measures the average cost of put and get operations for growing cache
+sizes. The cost per operation shall not depend on the cache size.
+
+Run: python -m test.bench_cache
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import random
+import timeit
+
+from picdb.cache import LRUCache
+
+SIZES = [1000, 10000, 100000, 1000000]
+OPERATIONS = 100000
+
+
+def _filled_cache(size):
+    """Provide a bounded cache filled up to its maximum size."""
+    cache = LRUCache(size)
+    for key in range(size):
+        cache.put(key, key)
+    return cache
+
+
+def bench_get(size):
+    """Average time of a cache hit in microseconds."""
+    cache = _filled_cache(size)
+    keys = [random.randrange(size) for _ in range(OPERATIONS)]
+
+    def run():
+        for key in keys:
+            cache.get(key)
+    return min(timeit.repeat(run, number=1, repeat=3)) / OPERATIONS * 1e6
+
+
+def bench_put(size):
+    """Average time of inserting a new key into a full cache in
+    microseconds. Each put evicts the least recently used entry."""
+    cache = _filled_cache(size)
+    keys = iter(range(size, size + 3 * OPERATIONS))
+
+    def run():
+        for _ in range(OPERATIONS):
+            key = next(keys)
+            cache.put(key, key)
+    return min(timeit.repeat(run, number=1, repeat=3)) / OPERATIONS * 1e6
+
+
+def main():
+    """Run benchmark and print results."""
+    print('{:>10s} {:>12s} {:>12s}'.format('size', 'get [us]', 'put [us]'))
+    for size in SIZES:
+        print('{:10d} {:12.3f} {:12.3f}'.format(
+            size, bench_get(size), bench_put(size)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# coding=utf-8
+"""Compare the INTERSECT filter chain with the parameterized filter.
+
+Each run filters pictures by a random selection of 1, 5 and 20 tags.
+The INTERSECT chain produces new SQL text for every selection which has
+to be prepared and planned, the parameterized filter reuses one prepared
+statement. An empty test database is populated with synthetic pictures
+and tags.
+
+Run: python -m test.bench_filter [path pattern] [runs]
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import random
+import sys
+import time
+
+from picdb.filterquery import PictureFilter
+from picdb.persistence import create_db, get_db
+from .testdb import db_parameters, populate
+
+TAG_COUNTS = [1, 5, 20]
+
+
+def intersect_statement(tag_keys):
+    """Provide the former SQL with one INTERSECT subquery per tag."""
+    stmt = 'SELECT DISTINCT id, identifier, path, description ' \
+           'FROM pictures WHERE "path" LIKE $1'
+    for key in tag_keys:
+        stmt += ' INTERSECT SELECT DISTINCT id, identifier, path, ' \
+                'description FROM pictures, picture2tag WHERE ' \
+                'pictures.id=picture2tag.picture AND ' \
+                'picture2tag.tag={}'.format(key)
+    return stmt + ' ORDER BY path, id'
+
+
+def run_intersect(pooled, path, tags):
+    """Filter by INTERSECT chain, return number of statements prepared."""
+    misses = pooled.statements.misses
+    pooled.prepare(intersect_statement([tag.key for tag in tags]))(path)
+    return pooled.statements.misses - misses
+
+
+def run_parameterized(pooled, path, tags):
+    """Filter by parameterized SQL, return number of statements prepared."""
+    misses = pooled.statements.misses
+    query = PictureFilter(path, tags=tags)
+    pooled.prepare(query.statement)(*query.parameters)
+    return pooled.statements.misses - misses
+
+
+def bench(run, path, tags, count, runs):
+    """Average time of a filter in milliseconds and statements prepared.
+
+    :rtype: (float, int)
+    """
+    db = get_db()
+    with db.transaction():
+        pooled = db._local.pooled
+        pooled.statements.clear()
+        prepared = 0
+        start = time.perf_counter()
+        for _ in range(runs):
+            prepared += run(pooled, path, random.sample(tags, count))
+        elapsed = time.perf_counter() - start
+        pooled.statements.clear()
+    return elapsed * 1000 / runs, prepared
+
+
+def main():
+    """Run benchmark and print results."""
+    path = sys.argv[1] if len(sys.argv) > 1 else '%'
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    create_db(db_parameters())
+    get_db().migrate()
+    populate(get_db())
+    tags = get_db().retrieve_all_tags()
+    print('{:>6s} {:>16s} {:>10s} {:>12s}'.format(
+        'tags', 'filter', 'time [ms]', 'prepared'))
+    for count in TAG_COUNTS:
+        if count > len(tags):
+            print('{:6d} skipped, only {} tags'.format(count, len(tags)))
+            continue
+        for name, run in (('intersect', run_intersect),
+                          ('parameterized', run_parameterized)):
+            elapsed, prepared = bench(run, path, tags, count, runs)
+            print('{:6d} {:>16s} {:10.3f} {:12d}'.format(
+                count, name, elapsed, prepared))
+
+
+if __name__ == '__main__':
+    main()
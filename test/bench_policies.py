@@ -0,0 +1,108 @@
+# coding=utf-8
+"""Replay key traces through the cache eviction policies.
+
+Reports the hit rate of each policy in picdb.cache.POLICIES for every
+trace. A trace is a text file with one cache key per line. Without trace
+files a synthetic trace is generated: a skewed working set of pictures
+used by the editor and selectors, interrupted by broad searches loading
+a thousand pictures each.
+
+Run: python -m test.bench_policies [--size N] [trace_file ...]
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import argparse
+import random
+
+from picdb.cache import LRUCache, POLICIES
+
+
+def synthetic_trace(working_set=1500, accesses=200000, scan_every=20000,
+                    scan_length=1000, seed=42):
+    """Generate a trace of a working set interrupted by scans.
+
+    :return: trace name and list of keys
+    :rtype: (str, [int])
+    """
+    rnd = random.Random(seed)
+    keys = []
+    next_scan_key = working_set
+    for i in range(accesses):
+        if i % scan_every == 0:
+            keys.extend(range(next_scan_key, next_scan_key + scan_length))
+            next_scan_key += scan_length
+        # skewed access: small keys are used more frequently
+        keys.append(int(working_set * rnd.random() ** 2))
+    return 'synthetic', keys
+
+
+def read_trace(path):
+    """Read a trace file with one key per line.
+
+    :return: trace name and list of keys
+    :rtype: (str, [str])
+    """
+    with open(path) as trace_file:
+        return path, [line.strip() for line in trace_file if line.strip()]
+
+
+def replay(keys, size, policy_name):
+    """Replay keys through a cache using get on hit and put on miss.
+
+    :return: hit rate
+    :rtype: float
+    """
+    cache = LRUCache(size, policy=POLICIES[policy_name]())
+    for key in keys:
+        try:
+            cache.get(key)
+        except KeyError:
+            cache.put(key, key)
+    return cache.hits / len(keys)
+
+
+def main():
+    """Replay all traces and print hit rates."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=int, default=1000,
+                        help='Maximum number of cache entries.')
+    parser.add_argument('traces', nargs='*', help='Trace files.')
+    args = parser.parse_args()
+    traces = [read_trace(path) for path in args.traces] or [
+        synthetic_trace()]
+    names = sorted(POLICIES)
+    print('{:30s} {}'.format('trace', ' '.join(
+        '{:>8s}'.format(name) for name in names)))
+    for trace_name, keys in traces:
+        rates = [replay(keys, args.size, name) for name in names]
+        print('{:30s} {}'.format(trace_name, ' '.join(
+            '{:8.2%}'.format(rate) for rate in rates)))
+
+
+if __name__ == '__main__':
+    main()
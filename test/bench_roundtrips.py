@@ -0,0 +1,136 @@
+# coding=utf-8
+"""Count SQL round trips needed to load a filtered list of pictures.
+
+Compares hydrating tags picture by picture, as done before, with the
+batched hydration of Persistence. Caches are cleared before each load.
+An empty test database is populated with synthetic pictures and tags.
+
+Run: python -m test.bench_roundtrips [path pattern] [limit]
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import sys
+
+from picdb.persistence import create_db, get_db, \
+    _TAG_CACHE, _PICTURE_CACHE, _GROUP_CACHE
+from picdb.picture import Picture
+from .testdb import db_parameters, populate
+
+
+class CountingStatement:
+    """Prepared statement counting its executions."""
+
+    def __init__(self, counter, stmt):
+        self._counter = counter
+        self._stmt = stmt
+
+    def __call__(self, *args):
+        self._counter.round_trips += 1
+        return self._stmt(*args)
+
+    def first(self, *args):
+        self._counter.round_trips += 1
+        return self._stmt.first(*args)
+
+
+class CountingConnection:
+    """Connection proxy counting prepares and executions."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.round_trips = 0
+
+    def prepare(self, sql):
+        self.round_trips += 1
+        return CountingStatement(self, self._conn.prepare(sql))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _clear_caches():
+    for cache in (_TAG_CACHE, _PICTURE_CACHE, _GROUP_CACHE):
+        cache.clear()
+
+
+def load_per_picture(db, path, limit):
+    """Load pictures, then tags with one query per picture."""
+    stmt = 'SELECT id, identifier, path, description FROM pictures ' \
+           'WHERE "path" LIKE $1 LIMIT {}'.format(limit)
+    pictures = []
+    for row in db.conn.prepare(stmt)(path):
+        picture = Picture(*row)
+        picture.tags = db.retrieve_tags_for_picture(picture)
+        pictures.append(picture)
+    return pictures
+
+
+def load_batched(db, path, limit):
+    """Load pictures using the batched hydration of Persistence."""
+    return db.retrieve_filtered_pictures(path, limit, [], [])
+
+
+def count(load, path, limit):
+    """Count round trips of load with cold caches.
+
+    :return: number of pictures loaded and round trips.
+    :rtype: (int, int)
+    """
+    db = get_db()
+    _clear_caches()
+    # Run on one pooled connection which counts its round trips.
+    with db.transaction():
+        pooled = db._local.pooled
+        # Let all statements be prepared through the counting connection.
+        pooled.statements.clear()
+        conn = pooled.conn
+        pooled.conn = counter = CountingConnection(conn)
+        try:
+            pictures = load(db, path, limit)
+        finally:
+            pooled.conn = conn
+            pooled.statements.clear()
+    return len(pictures), counter.round_trips
+
+
+def main():
+    """Run benchmark and print results."""
+    path = sys.argv[1] if len(sys.argv) > 1 else '%'
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    create_db(db_parameters())
+    get_db().migrate()
+    populate(get_db())
+    print('{:>12s} {:>10s} {:>12s}'.format('load', 'pictures', 'round trips'))
+    for name, load in (('per picture', load_per_picture),
+                       ('batched', load_batched)):
+        pictures, round_trips = count(load, path, limit)
+        print('{:>12s} {:10d} {:12d}'.format(name, pictures, round_trips))
+
+
+if __name__ == '__main__':
+    main()
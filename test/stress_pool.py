@@ -0,0 +1,114 @@
+# coding=utf-8
+"""Stress test of Persistence with concurrent threads.
+
+Runs a mix of reads on many threads against the test database, and
+checks that all threads get consistent results. Prints the throughput
+for a growing number of threads. Caches are disabled by clearing them
+before each read, so every call reaches the database.
+
+Run: python -m test.stress_pool [threads] [calls per thread]
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import sys
+import threading
+import time
+
+from picdb.persistence import create_db, get_db
+from picdb.picture import Picture
+from .testdb import db_parameters
+
+
+def _prepare_data(db):
+    """Provide a picture known to exist."""
+    path = '/stress/pool.jpg'
+    picture = db.retrieve_picture_by_path(path)
+    if picture is None:
+        db.add_picture(Picture(None, 'stress', path, 'stress test'))
+        picture = db.retrieve_picture_by_path(path)
+    return picture
+
+
+def _worker(db, picture, calls, errors):
+    """Read the picture repeatedly and record inconsistencies."""
+    try:
+        for _ in range(calls):
+            db.clear_caches()
+            found = db.retrieve_picture_by_key(picture.key)
+            if found is None or found.path != picture.path:
+                errors.append('unexpected picture {}'.format(found))
+            db.number_of_pictures()
+    except Exception as exc:  # noqa
+        errors.append(repr(exc))
+
+
+def run(db, picture, threads, calls):
+    """Run threads and measure calls per second.
+
+    :return: calls per second and errors
+    :rtype: (float, [str])
+    """
+    errors = []
+    workers = [threading.Thread(target=_worker,
+                                args=(db, picture, calls, errors))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return threads * calls * 2 / elapsed, errors
+
+
+def main():
+    """Run stress test and print results."""
+    max_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    calls = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    create_db(db_parameters())
+    db = get_db()
+    db.migrate()
+    picture = _prepare_data(db)
+    print('pool size: {}'.format(db.pool.max_size))
+    print('{:>8s} {:>12s} {:>8s}'.format('threads', 'calls/s', 'errors'))
+    threads = 1
+    failed = False
+    while threads <= max_threads:
+        rate, errors = run(db, picture, threads, calls)
+        print('{:8d} {:12.1f} {:8d}'.format(threads, rate, len(errors)))
+        for error in errors[:5]:
+            print('   ', error)
+        failed = failed or bool(errors)
+        threads *= 2
+    print('connections opened: {}'.format(db.pool.size))
+    db.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -27,11 +27,14 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import gc
+
 import pytest
 from hypothesis import given, example, settings
 import hypothesis.strategies as st
 
-from picdb.cache import LRUCache
+from picdb.cache import LRUCache, TwoQueuePolicy, create_policy, LRUPolicy, \
+    NegativeCache
 
 
 class TestLRUCache():
@@ -74,6 +77,138 @@ class TestLRUCache():
         with pytest.raises(KeyError):
             cache.get(0)
 
+    def test_put_promotes_existing_key(self):
+        """Re-putting a key shall make it the most recently used one."""
+        cache = LRUCache(3)
+        for i in range(3):
+            cache.put(i, str(i))
+        cache.put(0, 'new')
+        cache.put(3, '3')
+        assert 0 in cache
+        assert 1 not in cache
+        assert 'new' == cache.get(0)
+
+    def test_contains(self):
+        """Membership test shall not affect statistics."""
+        cache = LRUCache(3)
+        cache.put(1, 'aaa')
+        assert 1 in cache
+        assert 2 not in cache
+        assert 0 == cache.hits
+        assert 0 == cache.misses
+
+    def test_weight_limit(self):
+        """Evict least recently used items when total weight is exceeded."""
+        cache = LRUCache(-1, max_weight=10, weigher=len)
+        cache.put(1, 'aaaa')
+        cache.put(2, 'bbbb')
+        assert 8 == cache.weight
+        cache.get(1)
+        cache.put(3, 'cccc')
+        assert 2 == cache.size
+        assert 8 == cache.weight
+        assert 1 in cache
+        assert 2 not in cache
+
+    def test_reweigh_changed_item(self):
+        """Items changed in place are weighed again on request."""
+        cache = LRUCache(-1, max_weight=10, weigher=len)
+        cache.put(1, [1, 2])
+        item = [1]
+        cache.put(2, item)
+        item.extend(range(8))
+        assert 3 == cache.weight
+        cache.reweigh(2)
+        assert 9 == cache.weight
+        item.append(9)
+        cache.reweigh(2)
+        assert 10 == cache.weight
+        assert 1 not in cache
+        cache.reweigh(3)
+
+    def test_weight_of_replaced_item(self):
+        """Replacing an item shall account for the new weight only."""
+        cache = LRUCache(5, weigher=len)
+        cache.put(1, 'aaaa')
+        cache.put(1, 'aa')
+        assert 2 == cache.weight
+        cache.clear()
+        assert 0 == cache.weight
+
+    def test_heavy_item_is_kept(self):
+        """An item heavier than the budget stays until the next put."""
+        cache = LRUCache(-1, max_weight=3, weigher=len)
+        cache.put(1, 'aaaa')
+        assert 1 in cache
+        cache.put(2, 'b')
+        assert 1 not in cache
+        assert 1 == cache.weight
+
+    def test_peek(self):
+        """Peek shall neither count nor promote."""
+        cache = LRUCache(2)
+        cache.put(1, 'aaa')
+        cache.put(2, 'bbb')
+        assert 'aaa' == cache.peek(1)
+        assert cache.peek(3) is None
+        cache.put(3, 'ccc')
+        assert 1 not in cache
+        assert 0 == cache.hits
+        assert 0 == cache.misses
+
+    def test_discard(self):
+        """Discarded items are gone, unknown keys are ignored."""
+        cache = LRUCache(2, weigher=len)
+        cache.put(1, 'aaa')
+        cache.put(2, 'bb')
+        cache.discard(1)
+        cache.discard(42)
+        assert 1 not in cache
+        assert ['bb'] == cache.values()
+        assert 2 == cache.weight
+        cache.put(3, 'c')
+        cache.put(4, 'd')
+        assert 2 not in cache
+
+    def test_secondary_index(self):
+        """Find items by index, also after replacing and evicting."""
+        cache = LRUCache(2)
+        cache.add_index('upper', str.upper)
+        cache.put(1, 'a')
+        cache.put(2, 'A')
+        assert ['a', 'A'] == sorted(cache.lookup('upper', 'A'), reverse=True)
+        assert 2 == cache.hits
+        cache.put(2, 'b')
+        assert ['a'] == cache.lookup('upper', 'A')
+        assert ['b'] == cache.lookup('upper', 'B')
+        cache.put(3, 'c')
+        assert [] == cache.lookup('upper', 'A')
+        cache.discard(2)
+        assert [] == cache.lookup('upper', 'B')
+        cache.clear()
+        assert [] == cache.lookup('upper', 'C')
+
+    def test_secondary_index_of_mutated_item(self):
+        """Items changed after indexing are not found by their old value."""
+        cache = LRUCache(-1)
+        cache.add_index('name', lambda item: item['name'])
+        item = {'name': 'a'}
+        cache.put(1, item)
+        item['name'] = 'b'
+        assert [] == cache.lookup('name', 'a')
+        cache.put(1, item)
+        assert [item] == cache.lookup('name', 'b')
+
+    def test_generation(self):
+        """Generation changes whenever items are removed."""
+        cache = LRUCache(1)
+        cache.put(1, 'a')
+        generation = cache.generation
+        cache.put(1, 'b')
+        assert generation == cache.generation
+        cache.put(2, 'c')
+        assert generation < cache.generation
+
     def test_clear_cache(self):
         """Test clearing the cache."""
         max_size = 3
@@ -101,6 +236,113 @@ class TestLRUCache():
         assert 1 == cache.misses
 
 
+class TestTwoQueuePolicy():
+    def test_scan_does_not_evict_working_set(self):
+        """Keys accessed again after eviction from probation survive a scan
+        of keys used only once."""
+        cache = LRUCache(4, policy=TwoQueuePolicy())
+        working_set = [1, 2]
+        for key in working_set + [10, 11, 12, 13]:
+            cache.put(key, key)
+        # working set was evicted from probation and is remembered
+        for key in working_set:
+            cache.put(key, key)
+        for key in range(100, 200):
+            cache.put(key, key)
+        for key in working_set:
+            assert key in cache
+        assert 4 == cache.size
+
+    def test_discard_and_clear(self):
+        policy = TwoQueuePolicy()
+        policy.insert(1)
+        policy.insert(2)
+        policy.discard(1)
+        assert 2 == policy.victim()
+        policy.insert(3)
+        policy.clear()
+        policy.insert(4)
+        assert 4 == policy.victim()
+
+
+def test_create_policy():
+    assert isinstance(create_policy('LRU'), LRUPolicy)
+    assert isinstance(create_policy('2q'), TwoQueuePolicy)
+    with pytest.raises(ValueError):
+        create_policy('fifo')
+
+
+class TestNegativeCache():
+    def test_ttl(self):
+        """Keys are forgotten after ttl."""
+        now = [0.0]
+        cache = NegativeCache(10, 5, clock=lambda: now[0])
+        cache.add('a')
+        assert 'a' in cache
+        assert 'b' not in cache
+        now[0] = 4.9
+        assert 'a' in cache
+        now[0] = 5.0
+        assert 'a' not in cache
+        assert 0 == cache.size
+        assert 2 == cache.hits
+
+    def test_bounded(self):
+        """Oldest keys are forgotten first."""
+        cache = NegativeCache(2, 60)
+        for key in range(3):
+            cache.add(key)
+        assert 0 not in cache
+        assert 1 in cache
+        assert 2 in cache
+
+    def test_discard(self):
+        cache = NegativeCache(2, 60)
+        cache.add('a')
+        cache.add('b')
+        cache.discard('a')
+        assert 'a' not in cache
+        cache.clear()
+        assert 'b' not in cache
+
+
+class Item():
+    """Weakly referenceable cache item."""
+
+
+class TestIdentityMap():
+    def test_evicted_item_in_use_is_returned(self):
+        cache = LRUCache(1, identity_map=True)
+        item, other = Item(), Item()
+        cache.put(1, item)
+        cache.put(2, other)
+        assert 1 == cache.size
+        assert 1 in cache
+        assert item is cache.get(1)
+        assert item is cache.peek(1)
+        assert 2 == cache.tracked
+
+    def test_evicted_item_not_in_use_is_collected(self):
+        cache = LRUCache(1, identity_map=True)
+        cache.put(1, Item())
+        cache.put(2, Item())
+        gc.collect()
+        assert 1 not in cache
+        with pytest.raises(KeyError):
+            cache.get(1)
+        assert 1 == cache.tracked
+
+    def test_discard_forgets_item_in_use(self):
+        cache = LRUCache(1, identity_map=True)
+        item = Item()
+        cache.put(1, item)
+        cache.put(2, Item())
+        assert item in cache.values()
+        cache.discard(1)
+        assert 1 not in cache
+        assert item not in cache.values()
+
+
 # Some additional property based testing
 
 @given(key=st.one_of(st.integers(), st.text(), st.booleans()),
@@ -0,0 +1,82 @@
+# coding=utf-8
+"""Tests for picture filter query."""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import pytest
+
+from picdb.entity import Entity
+from picdb.filterquery import PictureFilter, SUBSTRING, WORDS
+
+
+def _entities(*keys):
+    return [Entity(key, 'e{}'.format(key), '') for key in keys]
+
+
+class TestPictureFilter():
+    def test_path_only(self):
+        query = PictureFilter('%jpg')
+        assert 'picture2' not in query.statement
+        assert ('%jpg', None) == query.parameters
+
+    def test_statement_independent_of_number_of_tags(self):
+        one = PictureFilter('%', _entities(1), _entities(2))
+        many = PictureFilter('%', _entities(*range(5)),
+                             _entities(*range(20)))
+        assert one.statement == many.statement
+        assert list(range(20)) == many.parameters[2]
+
+    def test_duplicate_keys_are_dropped(self):
+        query = PictureFilter('%', tags=_entities(3, 1, 3))
+        assert ('%', [1, 3], None) == query.parameters
+
+    def test_page(self):
+        query = PictureFilter('%', tags=_entities(1), after=('/a', 7),
+                              limit=10)
+        assert ('%', [1], '/a', 7, 10) == query.parameters
+        assert '("path", id) > ($3, $4)' in query.statement
+        assert query.statement.endswith('LIMIT $5::bigint')
+
+    def test_trees(self):
+        query = PictureFilter('%', tags=_entities(2, 5),
+                              tag_tree={2: {2, 3, 4}})
+        assert ('%', [2, 2, 2, 5], [2, 3, 4, 5], 2, None) == \
+            query.parameters
+        assert 'count(DISTINCT root) = $4::integer' in query.statement
+        assert query.statement == PictureFilter(
+            '%', tags=_entities(1), tag_tree={}).statement
+
+    def test_substring(self):
+        query = PictureFilter('50%_off', search=SUBSTRING)
+        assert ('%50\\%\\_off%', None) == query.parameters
+        assert 'identifier ILIKE $1' in query.statement
+
+    def test_words_are_ranked_but_not_paged(self):
+        query = PictureFilter('beach sunset', search=WORDS)
+        assert 'ORDER BY ts_rank(' in query.statement
+        with pytest.raises(ValueError):
+            PictureFilter('beach', after=('/a', 1), search=WORDS)
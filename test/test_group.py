@@ -101,3 +101,20 @@ class TestGroup(object):
         g.assign_picture(p1)
         assert p1 in g
         assert p2 not in g
+
+    def test_lazy_pictures(self):
+        """Pictures are loaded once on first access."""
+        p1 = Entity(None, 'p1', '')
+        calls = []
+
+        def loader(group_):
+            calls.append(group_)
+            return [p1]
+        g = Group(1, 'a', 'A', loader=loader)
+        assert not g.pictures_loaded
+        assert not calls
+        assert [p1] == g.pictures
+        assert g.pictures_loaded
+        g.assign_picture(Entity(None, 'p2', ''))
+        assert 2 == len(g)
+        assert [g] == calls
@@ -0,0 +1,59 @@
+# coding=utf-8
+"""Tests for change listener."""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from picdb.listener import ChangeListener, CHANNEL
+
+
+def test_dispatch_ignores_own_backends():
+    changes = []
+    listener = ChangeListener(None, lambda *change: changes.append(change),
+                              ignore_backends={1})
+    listener._dispatch(CHANNEL, 'tags:3', 1)
+    listener._dispatch(CHANNEL, 'tags:4', 2)
+    assert [('tags', 4)] == changes
+
+
+def test_sync_waits_for_own_notification():
+    listener = ChangeListener(None, None, ignore_backends={1})
+    payloads = []
+
+    def send(payload):
+        payloads.append(payload)
+        # Others synchronizing must not satisfy the wait.
+        listener._dispatch(CHANNEL, 'sync:other', 2)
+        assert not listener._sync_seen
+        listener._dispatch(CHANNEL, payload, 1)
+
+    assert listener.sync(send, 1)
+    assert payloads[0].startswith('sync:')
+
+
+def test_sync_times_out():
+    listener = ChangeListener(None, None)
+    assert not listener.sync(lambda payload: None, 0.01)
@@ -0,0 +1,112 @@
+# coding=utf-8
+"""Tests for schema migrations."""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import pytest
+import postgresql.driver.dbapi20 as dbapi
+
+from picdb.migrations import migrate, current_version, latest_version, \
+    Migration, MigrationError, MIGRATIONS
+
+
+class Statement:
+    def __init__(self, conn, sql):
+        self.conn = conn
+        self.sql = sql
+
+    def first(self, *args):
+        if self.sql.startswith('SELECT coalesce'):
+            return max(self.conn.versions, default=0)
+        if self.sql.startswith('SELECT version'):
+            return args[0] if args[0] in self.conn.versions else None
+        return None
+
+    def __call__(self, *args):
+        self.conn.pending.add(args[0])
+
+
+class Connection:
+    """Stands in for a database connection recording versions."""
+
+    def __init__(self, versions=()):
+        self.versions = set(versions)
+        self.pending = set()
+        self.executed = []
+        self.fail = None
+
+    def prepare(self, sql):
+        return Statement(self, sql)
+
+    def execute(self, sql):
+        if sql == self.fail:
+            raise dbapi.Error('failed')
+        self.executed.append(sql)
+
+    def commit(self):
+        self.versions |= self.pending
+        self.pending = set()
+
+    def rollback(self):
+        self.pending = set()
+
+
+def test_migrate_to_latest():
+    conn = Connection()
+    applied = migrate(conn)
+    assert [m.version for m in MIGRATIONS] == [m.version for m in applied]
+    assert latest_version() == current_version(conn)
+    assert [] == migrate(conn)
+
+
+def test_migrate_pending_only():
+    conn = Connection(versions=[1])
+    applied = migrate(conn, target=2)
+    assert [2] == [m.version for m in applied]
+    assert 2 == current_version(conn)
+
+
+def test_failed_migration_is_rolled_back(monkeypatch):
+    monkeypatch.setattr('picdb.migrations.MIGRATIONS', MIGRATIONS + [
+        Migration(latest_version() + 1, 'broken', ['BROKEN'])])
+    conn = Connection()
+    conn.fail = 'BROKEN'
+    with pytest.raises(MigrationError):
+        migrate(conn)
+    assert latest_version() - 1 == current_version(conn)
+
+
+def test_failed_optional_migration_is_skipped(monkeypatch):
+    monkeypatch.setattr('picdb.migrations.MIGRATIONS', [
+        Migration(1, 'optional', ['UNAVAILABLE'], optional=True),
+        Migration(2, 'required', ['REQUIRED'])])
+    conn = Connection()
+    conn.fail = 'UNAVAILABLE'
+    assert [2] == [m.version for m in migrate(conn)]
+    assert {2} == conn.versions
+    conn.fail = None
+    assert [1] == [m.version for m in migrate(conn)]
@@ -28,11 +28,20 @@
 # THE SOFTWARE.
 
 import datetime
+import threading
+import time
 
-from picdb.persistence import create_db, DBParameters, get_db
+import pytest
+
+from picdb.persistence import create_db, get_db, Persistence, \
+    DuplicateException, UnknownEntityException, _TAG_CACHE, _PICTURE_CACHE, \
+    _GROUP_CACHE, _picture_weight
+from picdb.groupservices import retrieve_groups_by_keys
+from picdb.tagservices import retrieve_tags_by_keys
 from picdb.tag import Tag
 from picdb.picture import Picture
 from picdb.group import Group
+from .testdb import db_parameters
 
 
 # Prefixes for test data
@@ -40,7 +49,9 @@ P_TAG = 'UT_T_'
 P_PIC = 'UT_P_'
 P_GRP = 'UT_G_'
 
-create_db(DBParameters('pictest', 'sb', 'sb', '5432'))
+DB_PARAMS = db_parameters()
+create_db(DB_PARAMS)
+get_db().migrate()
 
 
 class TestPersistence(object):
@@ -112,6 +123,314 @@ class TestPersistence(object):
     def test_add_and_retrieve_pictures_for_group(self):
         pass
 
+    def test_cache_coherence_tag_assignment(self):
+        pic = self._new_pic_p()
+        tag = self._new_tag_p()
+        get_db().add_tag_to_picture(pic, tag)
+        assert tag in get_db().retrieve_picture_by_key(pic.key).tags
+        get_db().remove_tag_from_picture(pic, tag)
+        assert tag not in get_db().retrieve_picture_by_key(pic.key).tags
+
+    def test_cache_coherence_delete_tag(self):
+        pic = self._new_pic_p()
+        tag = self._new_tag_p()
+        get_db().add_tag_to_picture(pic, tag)
+        get_db().delete_tag(tag)
+        assert tag not in get_db().retrieve_picture_by_key(pic.key).tags
+        assert [] == get_db().retrieve_pictures_by_tag(tag)
+
+    def test_cache_coherence_update_detached_group(self):
+        group1 = self._new_grp_p()
+        group2 = Group(group1.key, group1.name, 'detached', group1.parent)
+        get_db().update_group(group2)
+        assert 'detached' == get_db().retrieve_group_by_key(
+            group1.key).description
+
+    def test_group_weighed_again_when_pictures_loaded(self):
+        group1 = self._new_grp_p()
+        for _ in range(3):
+            get_db().add_picture_to_group(self._new_pic_p(), group1)
+        _GROUP_CACHE.clear()
+        group2 = get_db().retrieve_group_by_key(group1.key)
+        assert not group2.pictures_loaded
+        weight = _GROUP_CACHE.weight
+        assert 3 == len(group2.pictures)
+        assert weight < _GROUP_CACHE.weight
+        weight = _GROUP_CACHE.weight
+        get_db().add_pictures_to_groups([(self._new_pic_p(), group2)])
+        assert weight < _GROUP_CACHE.weight
+        weight = _GROUP_CACHE.weight
+        get_db().remove_picture_from_group(group2.pictures[0], group2)
+        assert weight > _GROUP_CACHE.weight
+
+    def test_picture_weighed_again_when_tags_change(self):
+        pic = self._new_pic_p()
+        tags = [self._new_tag_p() for _ in range(5)]
+        weight, total = _picture_weight(pic), _PICTURE_CACHE.weight
+        get_db().add_tags_to_pictures([(pic, tag) for tag in tags])
+        assert weight != _picture_weight(pic)
+        assert _picture_weight(pic) - weight == _PICTURE_CACHE.weight - total
+
+    def test_retrieve_picture_by_path_from_cache(self):
+        pic1 = self._new_pic_p()
+        hits = _PICTURE_CACHE.hits
+        pic2 = get_db().retrieve_picture_by_path(pic1.path)
+        assert pic1 is pic2
+        assert hits + 1 == _PICTURE_CACHE.hits
+
+    def test_retrieve_groups_by_name_from_cache(self):
+        group1 = self._new_grp_p()
+        get_db().retrieve_all_groups()
+        groups = get_db().retrieve_groups_by_name(group1.name)
+        assert [group1] == groups
+        assert group1 is groups[0]
+        group2 = self._new_grp_t()
+        group2.name = group1.name
+        group2.parent = group1
+        get_db().add_group(group2)
+        assert 2 == len(get_db().retrieve_groups_by_name(group1.name))
+
+    def test_unknown_path_found_after_add(self):
+        pic1 = self._new_pic_t()
+        assert get_db().retrieve_picture_by_path(pic1.path) is None
+        assert pic1.path in get_db()._unknown['path']
+        get_db().add_picture(pic1)
+        assert get_db().retrieve_picture_by_path(pic1.path) is not None
+
+    def test_hydrate_tags_of_filtered_pictures(self):
+        parent = self._new_tag_p()
+        tag = self._new_tag_t(parent=parent)
+        get_db().add_tag(tag)
+        tag = get_db().retrieve_tag_by_name(tag.name)
+        pic = self._new_pic_p()
+        get_db().add_tag_to_picture(pic, tag)
+        _TAG_CACHE.clear()
+        _PICTURE_CACHE.clear()
+        pics = get_db().retrieve_filtered_pictures(pic.path, None, [], [])
+        assert [tag.name] == [t.name for t in pics[0].tags]
+        assert parent.name == pics[0].tags[0].parent.name
+
+    def test_retrieve_by_keys(self):
+        pic1 = self._new_pic_p()
+        pic2 = self._new_pic_p()
+        _PICTURE_CACHE.discard(pic2.key)
+        pics = get_db().retrieve_pictures_by_keys([pic2.key, -1, pic1.key])
+        assert [pic2.path, pic1.path] == [pic.path for pic in pics]
+        assert pic1 is pics[1]
+        tag = self._new_tag_p()
+        assert [tag] == get_db().retrieve_tags_by_keys([tag.key])
+        group_ = self._new_grp_p()
+        assert [group_] == get_db().retrieve_groups_by_keys([group_.key])
+
+    def test_unknown_keys_reported_despite_duplicates(self):
+        tag = self._new_tag_p()
+        with pytest.raises(UnknownEntityException):
+            retrieve_tags_by_keys([tag.key, tag.key, -1])
+        group_ = self._new_grp_p()
+        with pytest.raises(UnknownEntityException):
+            retrieve_groups_by_keys([group_.key, group_.key, -1])
+
+    def test_prepared_statements_are_reused(self):
+        pic = self._new_pic_p()
+        _PICTURE_CACHE.discard(pic.key)
+        get_db().retrieve_picture_by_key(pic.key)
+        hits, misses = get_db().prepare_hits, get_db().prepare_misses
+        _PICTURE_CACHE.discard(pic.key)
+        get_db().retrieve_picture_by_key(pic.key)
+        assert hits < get_db().prepare_hits
+        assert misses == get_db().prepare_misses
+
+    def test_bulk_assignment(self):
+        pics = [self._new_pic_p(), self._new_pic_p()]
+        tag = self._new_tag_p()
+        group_ = self._new_grp_p()
+        pairs = [(pic, tag) for pic in pics]
+        get_db().add_tags_to_pictures(pairs)
+        get_db().add_tags_to_pictures(pairs)  # duplicates are ignored
+        get_db().add_pictures_to_groups([(pic, group_) for pic in pics])
+        assert set(pics) == set(get_db().retrieve_pictures_by_tag(tag))
+        assert set(pics) == set(get_db().retrieve_pictures_for_group(group_))
+        get_db().remove_tags_from_pictures(pairs[:1])
+        get_db().remove_pictures_from_groups([(pics[0], group_)])
+        assert [pics[1]] == get_db().retrieve_pictures_by_tag(tag)
+        assert [pics[1]] == get_db().retrieve_pictures_for_group(group_)
+        assert tag not in pics[0].tags
+
+    def test_transaction_rolled_back_on_error(self):
+        pic = self._new_pic_t()
+        with pytest.raises(ValueError):
+            with get_db().transaction():
+                get_db().add_picture(pic)
+                raise ValueError()
+        assert get_db().retrieve_picture_by_path(pic.path) is None
+
+    def test_nested_transaction_is_savepoint(self):
+        pic1 = self._new_pic_t()
+        pic2 = self._new_pic_t()
+        with get_db().transaction():
+            get_db().add_picture(pic1)
+            with pytest.raises(DuplicateException):
+                with get_db().transaction():
+                    get_db().add_picture(pic2)
+                    get_db().add_picture(pic2)
+        assert get_db().retrieve_picture_by_path(pic1.path) is not None
+        assert get_db().retrieve_picture_by_path(pic2.path) is None
+
+    def test_rollback_evicts_only_entities_cached_within(self):
+        other = self._new_pic_p()
+        pic = self._new_pic_p()
+        description = pic.description
+        with pytest.raises(DuplicateException):
+            with get_db().transaction():
+                pic.description = 'changed'
+                get_db().update_picture(pic)
+                get_db().add_picture(
+                    Picture(None, other.name, other.path, ''))
+        assert _PICTURE_CACHE.peek(other.key) is other
+        assert _PICTURE_CACHE.peek(pic.key) is None
+        assert description == \
+            get_db().retrieve_picture_by_key(pic.key).description
+
+    def test_duplicate_update_in_transaction(self):
+        other = self._new_pic_p()
+        pic = self._new_pic_p()
+        with pytest.raises(DuplicateException):
+            with get_db().transaction():
+                get_db().update_picture(
+                    Picture(pic.key, pic.name, other.path, ''))
+
+    def test_concurrent_readers(self):
+        pic = self._new_pic_p()
+        found = []
+
+        def read():
+            _PICTURE_CACHE.discard(pic.key)
+            found.append(get_db().retrieve_picture_by_key(pic.key).path)
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [pic.path] * 8 == found
+        assert get_db().pool.size <= get_db().pool.max_size
+
+    def test_iter_filtered_pictures(self):
+        pics = [self._new_pic_p() for _ in range(3)]
+        _PICTURE_CACHE.clear()
+        found = get_db().iter_filtered_pictures('/path/' + P_PIC + '%', [],
+                                                [], chunk_size=2)
+        paths = [pic.path for pic in pics]
+        assert sorted(paths) == [pic.path for pic in found
+                                 if pic.path in paths]
+
+    def test_filtered_pictures_by_page(self):
+        pics = [self._new_pic_p() for _ in range(5)]
+        tag = self._new_tag_p()
+        get_db().add_tags_to_pictures([(pic, tag) for pic in pics])
+        pattern = '/path/' + P_PIC + '%'
+        pages = []
+        after = None
+        while True:
+            page = get_db().retrieve_filtered_pictures(pattern, 2, [], [tag],
+                                                       after)
+            if not page:
+                break
+            pages.append([pic.path for pic in page])
+            after = (page[-1].path, page[-1].key)
+        assert [2, 2, 1] == [len(page) for page in pages]
+        assert sorted(pic.path for pic in pics) == sum(pages, [])
+
+    def test_filter_pictures_by_all_tags_and_groups(self):
+        pic1 = self._new_pic_p()
+        pic2 = self._new_pic_p()
+        tag1 = self._new_tag_p()
+        tag2 = self._new_tag_p()
+        group_ = self._new_grp_p()
+        get_db().add_tags_to_pictures([(pic1, tag1), (pic1, tag2),
+                                       (pic2, tag1)])
+        get_db().add_pictures_to_groups([(pic1, group_), (pic2, group_)])
+        pattern = '/path/' + P_PIC + '%'
+        found = get_db().retrieve_filtered_pictures(pattern, None, [group_],
+                                                    [tag1, tag2, tag1])
+        assert [pic1.path] == [pic.path for pic in found]
+        found = get_db().retrieve_filtered_pictures(pattern, None, [group_],
+                                                    [tag1])
+        assert sorted([pic1.path, pic2.path]) == [pic.path for pic in found]
+
+    def test_filter_pictures_including_descendants(self):
+        root = self._new_tag_p()
+        child = self._new_tag_t(parent=root)
+        get_db().add_tag(child)
+        child = get_db().retrieve_tag_by_name(child.name)
+        grandchild = self._new_tag_t(parent=child)
+        get_db().add_tag(grandchild)
+        grandchild = get_db().retrieve_tag_by_name(grandchild.name)
+        pic = self._new_pic_p()
+        get_db().add_tag_to_picture(pic, grandchild)
+        pattern = '/path/' + P_PIC + '%'
+        assert [] == get_db().retrieve_filtered_pictures(pattern, None, [],
+                                                         [root])
+        found = get_db().retrieve_filtered_pictures(
+            pattern, None, [], [root], include_descendants=True)
+        assert [pic.path] == [p.path for p in found]
+        assert 'tags' in get_db()._trees
+        get_db().delete_tag(grandchild)
+        assert 'tags' not in get_db()._trees
+
+    def test_search_pictures_by_substring_and_words(self):
+        pic = self._new_pic_t(description='sunset at the beach')
+        get_db().add_picture(pic)
+        pic = get_db().retrieve_picture_by_path(pic.path)
+        found = get_db().retrieve_filtered_pictures(pic.name[2:], None, [],
+                                                    [], search='substring')
+        assert [pic.path] == [p.path for p in found]
+        found = get_db().retrieve_filtered_pictures(
+            'beach ' + pic.name, None, [], [], search='words')
+        assert [pic.path] == [p.path for p in found]
+
+    def test_counts_follow_changes(self):
+        counts = get_db().retrieve_counts()
+        pic = self._new_pic_p()
+        assert counts['pictures'] + 1 == get_db().retrieve_counts()['pictures']
+        get_db().delete_picture(pic)
+        assert get_db().retrieve_counts() == \
+            get_db().retrieve_counts(exact=True)
+
+    def test_invalidate_picture_evicts_groups_holding_it(self):
+        parent = self._new_grp_p()
+        child = self._new_grp_p(parent=parent)
+        other = self._new_grp_p()
+        pic = self._new_pic_p()
+        get_db().add_picture_to_group(pic, parent)
+        get_db().add_picture_to_group(self._new_pic_p(), other)
+        assert [pic] == get_db().retrieve_group_by_key(parent.key).pictures
+        assert 1 == len(get_db().retrieve_group_by_key(other.key).pictures)
+        assert parent.key == child.parent.key
+        get_db().invalidate('pictures', pic.key)
+        assert parent.key not in _GROUP_CACHE
+        assert child.key in _GROUP_CACHE
+        assert other.key in _GROUP_CACHE
+
+    def test_invalidate_on_change_of_other_process(self):
+        """Requires triggers from scripts/notify_triggers.sql."""
+        if not get_db().backend.supports_listen:
+            pytest.skip('backend does not notify changes')
+        get_db().start_listener()
+        tag = self._new_tag_p()
+        assert tag.key in _TAG_CACHE
+        other = Persistence(DB_PARAMS)
+        try:
+            other.execute_sql('UPDATE tags SET description=$1 WHERE id=$2',
+                              'changed elsewhere', tag.key)
+        finally:
+            other.close()
+        deadline = time.time() + 5
+        while tag.key in _TAG_CACHE and time.time() < deadline:
+            time.sleep(0.05)
+        assert tag.key not in _TAG_CACHE
+        assert 'changed elsewhere' == get_db().retrieve_tag_by_key(
+            tag.key).description
+
     def _uq_name(self, prefix):
         """Create a unique name with given prefix."""
         dt = datetime.datetime.now()
@@ -129,7 +448,7 @@ class TestPersistence(object):
 
     def _new_grp_t(self, description='', parent=None):
         """Create new transient group."""
-        return Group(None, self._uq_name(P_GRP), description, parent)
+        return Group(None, self._uq_name(P_GRP), description, parent=parent)
 
     def _new_tag_p(self, description='', parent=None):
         """Create new persistent tag."""
@@ -145,7 +464,7 @@ class TestPersistence(object):
 
     def _new_grp_p(self, description='', parent=None):
         """Create new persistent group."""
-        grp = self._new_grp_t()
+        grp = self._new_grp_t(description, parent)
         get_db().add_group(grp)
         groups = get_db().retrieve_groups_by_name(grp.name)
         assert groups is not None
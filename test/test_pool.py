@@ -0,0 +1,110 @@
+# coding=utf-8
+"""Tests for connection pool."""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+
+import threading
+
+import pytest
+
+from picdb.pool import ConnectionPool, PoolTimeoutError
+
+
+class Statement:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def first(self):
+        if self.conn.closed:
+            raise IOError('connection lost')
+        return 1
+
+
+class Connection:
+    """Stands in for a database connection."""
+
+    def __init__(self):
+        self.closed = False
+        self.prepared = 0
+
+    def prepare(self, _):
+        self.prepared += 1
+        return Statement(self)
+
+    def close(self):
+        self.closed = True
+
+
+class TestConnectionPool():
+    def test_reuse_connection(self):
+        pool = ConnectionPool(Connection, 2)
+        with pool.connection() as pooled:
+            conn = pooled.conn
+        with pool.connection() as pooled:
+            assert conn is pooled.conn
+        assert 1 == pool.size
+
+    def test_statement_cache(self):
+        pool = ConnectionPool(Connection, 1)
+        with pool.connection() as pooled:
+            assert pooled.prepare('SELECT 1') is pooled.prepare('SELECT 1')
+            assert 1 == pooled.conn.prepared
+            assert 1 == pooled.statements.hits
+
+    def test_bounded(self):
+        pool = ConnectionPool(Connection, 1, timeout=0.01)
+        pooled = pool.acquire()
+        with pytest.raises(PoolTimeoutError):
+            pool.acquire()
+        pool.release(pooled)
+        assert pooled is pool.acquire()
+
+    def test_wait_for_release(self):
+        pool = ConnectionPool(Connection, 1, timeout=5)
+        pooled = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, (pooled,))
+        timer.start()
+        assert pooled is pool.acquire()
+        timer.join()
+
+    def test_replace_broken_connection(self):
+        pool = ConnectionPool(Connection, 1, check_after=0)
+        with pool.connection() as pooled:
+            broken = pooled.conn
+        broken.closed = True
+        with pool.connection() as pooled:
+            assert broken is not pooled.conn
+        assert 1 == pool.size
+        assert [pooled] == pool.connections
+
+    def test_close(self):
+        pool = ConnectionPool(Connection, 2)
+        with pool.connection() as pooled:
+            conn = pooled.conn
+        pool.close()
+        assert conn.closed
+        assert 0 == pool.size
+        with pytest.raises(PoolTimeoutError):
+            pool.acquire()
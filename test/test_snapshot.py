@@ -0,0 +1,92 @@
+# coding=utf-8
+"""Test cache snapshots."""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+from picdb import snapshot
+from picdb.group import Group
+from picdb.picture import Picture
+from picdb.tag import Tag
+
+
+def _entities():
+    """Provide a small object graph."""
+    parent_tag = Tag(1, 'animals', 'Animals')
+    tag = Tag(2, 'cats', 'Cats', parent_tag)
+    pic1 = Picture(10, 'p1', '/pics/p1.jpg', 'Picture 1')
+    pic1.tags = [tag]
+    pic2 = Picture(11, 'p2', '/pics/p2.jpg', 'Picture 2')
+    parent_group = Group(20, 'holidays', 'Holidays')
+    group_ = Group(21, 'beach', 'Beach', pictures=[pic1, pic2],
+                   parent=parent_group)
+    return tag, pic1, group_
+
+
+def test_dump_and_restore(tmpdir):
+    """Restored entities have the same attributes and references."""
+    path = str(tmpdir.join('cache.snapshot'))
+    tag, pic1, group_ = _entities()
+    snapshot.dump(path, 42, [tag], [pic1], [group_])
+    marker, data = snapshot.read_marker(path)
+    assert 42 == marker
+    tags, pictures, groups = snapshot.restore(data)
+    tags = {t.key: t for t in tags}
+    pictures = {p.key: p for p in pictures}
+    groups = {g.key: g for g in groups}
+    # parents and pictures of groups are included
+    assert {1, 2} == set(tags)
+    assert {10, 11} == set(pictures)
+    assert {20, 21} == set(groups)
+    assert tags[1] is tags[2].parent
+    assert [tags[2]] == pictures[10].tags
+    assert tags[2] is pictures[10].tags[0]
+    assert '/pics/p2.jpg' == pictures[11].path
+    assert groups[20] is groups[21].parent
+    assert [pictures[10], pictures[11]] == groups[21].pictures
+    assert groups[21].pictures[0] is pictures[10]
+
+
+def test_group_pictures_not_loaded(tmpdir):
+    """Pictures of groups not loaded yet are loaded after restore."""
+    path = str(tmpdir.join('cache.snapshot'))
+    pic = Picture(10, 'p1', '/pics/p1.jpg', 'Picture 1')
+    group_ = Group(21, 'beach', 'Beach', loader=lambda g: [])
+    snapshot.dump(path, 42, [], [], [group_])
+    _, data = snapshot.read_marker(path)
+    _, pictures, groups = snapshot.restore(data, lambda g: [pic])
+    assert [] == pictures
+    assert not groups[0].pictures_loaded
+    assert [pic] == groups[0].pictures
+
+
+def test_read_invalid_snapshot(tmpdir):
+    """Missing or foreign files are ignored."""
+    path = tmpdir.join('cache.snapshot')
+    assert (None, None) == snapshot.read_marker(str(path))
+    path.write('no snapshot')
+    assert (None, None) == snapshot.read_marker(str(path))
@@ -0,0 +1,92 @@
+# coding=utf-8
+"""Tests for SQLite backend."""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import sqlite3
+
+import pytest
+
+from picdb.filterquery import _statement, NONE, WORDS
+from picdb.sqlitebackend import translate, Connection, UniqueError
+
+
+def test_translate_arrays_and_placeholders():
+    sql = translate('SELECT id FROM tags WHERE id=ANY($1)')
+    assert 'SELECT id FROM tags WHERE id IN ' \
+           '(SELECT value FROM json_each(?1))' == sql
+
+
+def test_translate_bulk_insert():
+    sql = translate('INSERT INTO picture2tag (picture, tag) '
+                    'SELECT * FROM unnest($1::integer[], $2::integer[]) '
+                    'ON CONFLICT DO NOTHING')
+    assert '::' not in sql
+    assert sql.endswith('WHERE true ON CONFLICT DO NOTHING')
+
+
+def test_savepoint_rolled_back(tmp_path):
+    conn = Connection(str(tmp_path / 'test.db'))
+    conn.execute('CREATE TABLE t (a INTEGER)')
+    conn.prepare('INSERT INTO t VALUES ($1)')(1)
+    savepoint = conn.xact()
+    savepoint.start()
+    conn.prepare('INSERT INTO t VALUES ($1)')(2)
+    savepoint.rollback()
+    conn.commit()
+    assert [(1,)] == conn.prepare('SELECT a FROM t')()
+    assert 1 == conn.prepare('SELECT count(*) FROM t').first()
+    conn.close()
+
+
+def test_only_unique_violation_is_unique_error(tmp_path):
+    conn = Connection(str(tmp_path / 'test.db'))
+    conn.execute('CREATE TABLE t (a INTEGER PRIMARY KEY, '
+                 'parent INTEGER REFERENCES t (a), b TEXT UNIQUE)')
+    conn.prepare('INSERT INTO t VALUES ($1, NULL, $2)')(1, 'x')
+    with pytest.raises(UniqueError):
+        conn.prepare('INSERT INTO t VALUES ($1, NULL, $2)')(2, 'x')
+    with pytest.raises(sqlite3.IntegrityError) as exc_info:
+        conn.prepare('INSERT INTO t VALUES ($1, $2, $3)')(3, 99, 'y')
+    assert not isinstance(exc_info.value, UniqueError)
+    conn.close()
+
+
+def test_words_search(tmp_path):
+    conn = Connection(str(tmp_path / 'test.db'))
+    conn.execute('CREATE TABLE pictures (id INTEGER PRIMARY KEY, '
+                 'identifier TEXT, path TEXT, description TEXT)')
+    insert = conn.prepare('INSERT INTO pictures VALUES ($1, $2, $3, $4)')
+    insert(1, 'Beach', '/a', 'sunset at the beach with friends')
+    insert(2, 'beach', '/b', 'Sunset')
+    insert(3, 'mountains', '/c', None)
+    conn.commit()
+    find = conn.prepare(_statement(NONE, NONE, False, WORDS))
+    assert [2, 1] == [row[0] for row in find('sunset BEACH', None)]
+    assert [3] == [row[0] for row in find('Mountains', None)]
+    assert [] == find('beach mountains', None)
+    conn.close()
@@ -0,0 +1,76 @@
+# coding=utf-8
+"""Tests for statistics collector."""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from picdb.statistics import StatisticsCollector
+
+
+class Counter:
+    """Stands in for the database."""
+
+    def __init__(self):
+        self.counts = {'pictures': 1}
+        self.exact = []
+
+    def __call__(self, exact):
+        self.exact.append(exact)
+        return dict(self.counts)
+
+
+def test_generation_changes_with_counts_only():
+    counter = Counter()
+    collector = StatisticsCollector(count=counter)
+    collector.refresh()
+    generation = collector.generation
+    assert {'pictures': 1} == collector.counts
+    collector.refresh()
+    assert generation == collector.generation
+    counter.counts['pictures'] = 2
+    collector.refresh()
+    assert generation + 1 == collector.generation
+
+
+def test_exact_on_request():
+    counter = Counter()
+    collector = StatisticsCollector(count=counter)
+    collector.refresh()
+    collector.request_exact()
+    collector.refresh()
+    collector.refresh()
+    assert [False, True, False] == counter.exact
+
+
+def test_runs_in_background():
+    counter = Counter()
+    collector = StatisticsCollector(interval=60, count=counter)
+    collector.start()
+    collector.request_exact()
+    collector.stop()
+    collector.join(5)
+    assert not collector.is_alive()
+    assert counter.exact
@@ -0,0 +1,134 @@
+# coding=utf-8
+"""Tests for background execution of service calls."""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import concurrent.futures
+import threading
+
+from picdb.uiexecutor import TkExecutor
+
+
+class Scheduler:
+    """Stands in for after() of a Tk widget."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    def __call__(self, delay, callback):
+        self.callbacks.append(callback)
+
+    def run(self, futures):
+        """Wait for futures, then run scheduled callbacks."""
+        concurrent.futures.wait(futures, 5)
+        while self.callbacks:
+            self.callbacks.pop(0)()
+
+
+def create_executor(scheduler, busy):
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    return TkExecutor(scheduler, busy.append, pool=pool)
+
+
+def test_result_delivered_by_poll():
+    scheduler = Scheduler()
+    busy, results = [], []
+    executor = create_executor(scheduler, busy)
+    future = executor.submit('items', lambda: 42, results.append)
+    assert executor.busy
+    assert [] == results
+    scheduler.run([future])
+    assert [42] == results
+    assert [True, False] == busy
+    assert not executor.busy
+
+
+def test_superseded_request_dropped():
+    scheduler = Scheduler()
+    busy, results = [], []
+    executor = create_executor(scheduler, busy)
+    release = threading.Event()
+    running = executor.submit('items', lambda: release.wait(5) and 1,
+                              results.append)
+    queued = executor.submit('items', lambda: 2, results.append)
+    latest = executor.submit('items', lambda: 3, results.append)
+    assert queued.cancelled()
+    release.set()
+    scheduler.run([running, latest])
+    assert [3] == results
+    assert [True, False] == busy
+
+
+def test_requests_of_other_keys_kept():
+    scheduler = Scheduler()
+    results = []
+    executor = create_executor(scheduler, [])
+    first = executor.submit('tags', lambda: 1, results.append)
+    second = executor.submit('groups', lambda: 2, results.append)
+    scheduler.run([first, second])
+    assert [1, 2] == sorted(results)
+
+
+def test_cancel_all():
+    scheduler = Scheduler()
+    busy, results = [], []
+    executor = create_executor(scheduler, busy)
+    future = executor.submit('items', lambda: 1, results.append)
+    executor.cancel()
+    scheduler.run([future])
+    assert [] == results
+    assert [True, False] == busy
+
+
+def test_error_delivered():
+    scheduler = Scheduler()
+    errors = []
+
+    def fail():
+        raise ValueError('failed')
+
+    executor = create_executor(scheduler, [])
+    future = executor.submit('items', fail, None, errors.append)
+    scheduler.run([future])
+    assert isinstance(errors[0], ValueError)
+
+
+def test_polling_continues_after_failing_callback():
+    scheduler = Scheduler()
+    busy, results = [], []
+
+    def fail(_):
+        raise ValueError('failed')
+
+    executor = create_executor(scheduler, busy)
+    scheduler.run([executor.submit('items', lambda: 1, fail)])
+    assert not executor.busy
+    future = executor.submit('items', lambda: 2, results.append)
+    assert 1 == len(scheduler.callbacks)
+    scheduler.run([future])
+    assert [2] == results
+    assert [True, False, True, False] == busy
@@ -0,0 +1,90 @@
+# coding=utf-8
+"""Database used by tests and benchmarks.
+
+An embedded SQLite database in a temporary directory, unless environment
+variable PICDB_TEST_BACKEND is postgresql. That requires a server with
+database pictest.
+"""
+# Copyright (c) 2016 Stefan Braun
+#
+# Permission is hereby granted, free of charge, to any person obtaining a
+# copy of this software and
+# associated documentation files (the "Software"), to deal in the Software
+# without restriction,
+# including without limitation the rights to use, copy, modify, merge,
+# publish, distribute,
+# sublicense, and/or sell copies of the Software, and to permit persons to
+# whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+#  all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#  IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS
+# FOR A PARTICULAR PURPOSE
+# AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+#  LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import os
+import random
+import tempfile
+
+from picdb.persistence import DBParameters
+from picdb.picture import Picture
+from picdb.tag import Tag
+
+
+def db_parameters(backend=None):
+    """Provide parameters of database to test with.
+
+    :param backend: postgresql or sqlite, None for the one of environment
+    :type backend: str
+    :rtype: DBParameters
+    """
+    if backend is None:
+        backend = os.environ.get('PICDB_TEST_BACKEND', 'sqlite')
+    if backend == 'postgresql':
+        return DBParameters('pictest', 'sb', 'sb', '5432')
+    path = os.path.join(tempfile.mkdtemp(prefix='picdb'), 'pictest.db')
+    return DBParameters(path, None, None, None, backend)
+
+
+def populate(db, pictures=10000, tags=50, tags_per_picture=3):
+    """Fill an empty database with synthetic pictures and tags.
+
+    Nothing is added if there are pictures already.
+
+    :param db: persistence
+    :type db: Persistence
+    :param pictures: number of pictures
+    :type pictures: int
+    :param tags: number of tags
+    :type tags: int
+    :param tags_per_picture: number of tags assigned to each picture
+    :type tags_per_picture: int
+    """
+    if db.number_of_pictures():
+        return
+    random.seed(pictures)
+    with db.transaction():
+        for index in range(tags):
+            db.add_tag(Tag(None, 'bench tag {}'.format(index), '', None))
+        for index in range(pictures):
+            name = 'pic{:07d}.jpg'.format(index)
+            db.add_picture(Picture(None, name,
+                                   '/bench/{:03d}/{}'.format(index % 100,
+                                                             name),
+                                   'synthetic picture {}'.format(index)))
+    all_tags = db.retrieve_all_tags()
+    pairs = [(picture, tag)
+             for picture in db.retrieve_filtered_pictures('/bench/%', None,
+                                                          [], [])
+             for tag in random.sample(all_tags, tags_per_picture)]
+    db.add_tags_to_pictures(pairs)